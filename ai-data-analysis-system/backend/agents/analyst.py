@@ -1,5 +1,6 @@
 import json
 from core.state import AgentState
+from services.llm import llm_service
 
 def analyst_node(state: AgentState):
     """
@@ -11,13 +12,13 @@ def analyst_node(state: AgentState):
     metrics = state.get("model_metrics", {})
     cleaning_report = state.get("cleaning_report", "N/A")
     task = state.get("task", "Data Analysis")
-    logs = state.get("logs", [])
 
     best_model = metrics.get("best_model_name", "Unknown")
     best_accuracy = metrics.get("best_accuracy", 0)
     task_type = metrics.get("task_type", "unknown")
     metric_name = metrics.get("metric_name", "Score")
     all_scores = metrics.get("all_model_scores", {})
+    subsampled = metrics.get("subsampled_scores", {})
     target_col = metrics.get("target_column", "Unknown")
     num_features = metrics.get("num_features", 0)
     num_samples = metrics.get("num_samples", 0)
@@ -25,8 +26,15 @@ def analyst_node(state: AgentState):
 
     # Build a ranked model comparison string
     sorted_models = sorted(all_scores.items(), key=lambda x: x[1], reverse=True)
+
+    def subsample_note(name):
+        if name not in subsampled:
+            return ""
+        fate = "then refit on all rows" if name == best_model else "eliminated early"
+        return f" (scored on a {subsampled[name]}-row subsample, {fate})"
+
     model_ranking_str = "\n".join(
-        f"  {i+1}. {name}: {score:.4f}" for i, (name, score) in enumerate(sorted_models)
+        f"  {i+1}. {name}: {score:.4f}{subsample_note(name)}" for i, (name, score) in enumerate(sorted_models)
     )
 
     # Top features string
@@ -36,8 +44,6 @@ def analyst_node(state: AgentState):
     # Try LLM-generated summary
     summary = None
     try:
-        from langchain_ollama import OllamaLLM
-        llm = OllamaLLM(model="llama3.2:1b")
         prompt = f"""
 You are an expert data scientist writing an executive summary report.
 
@@ -62,7 +68,7 @@ Write a concise, professional executive summary (200-300 words) that covers:
 
 Use clear headings and bullet points. Be specific with numbers.
 """
-        summary = llm.invoke(prompt)
+        summary = llm_service.complete(prompt)
         print("[AnalystAgent] LLM-generated summary produced.")
     except Exception as e:
         print(f"[AnalystAgent] LLM unavailable, using structured template: {e}")
@@ -104,5 +110,5 @@ Use clear headings and bullet points. Be specific with numbers.
 
     return {
         "analysis_result": summary,
-        "logs": logs + [f"AnalystAgent generated executive summary. Recommended: {best_model} ({metric_name}: {best_accuracy})"]
+        "logs": [f"AnalystAgent generated executive summary. Recommended: {best_model} ({metric_name}: {best_accuracy})"]
     }
@@ -1,48 +1,141 @@
+import os
+import numpy as np
 import pandas as pd
-from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import LabelEncoder
 from core.state import AgentState
+from services.artifacts import artifact_store, STREAMING_CHUNK_ROWS
+from services.encoding import (
+    CATEGORICAL_MAX_UNIQUES, apply_encodings, categorical_columns, fit_encodings,
+    numeric_spec, text_spec, value_flags,
+)
+from services.sketches import QuantileSketch, FrequencySketch
+from core.tracing import tracer
+
+
+def clean_dataframe(df: pd.DataFrame) -> tuple[pd.DataFrame, dict]:
+    """
+    In-memory cleaning: median/mode imputation, category codes for
+    low-cardinality text columns and lossless numeric downcasting, all driven
+    by the returned encodings so they can be reapplied at inference time.
+    """
+    with tracer.span("fit_encodings", rows=len(df)):
+        encodings = fit_encodings(df)
+    with tracer.span("impute", rows=len(df)):
+        return apply_encodings(df, encodings), encodings
+
+
+def clean_csv_streaming(source: str, destination: str, chunk_rows: int = STREAMING_CHUNK_ROWS) -> tuple[tuple, dict]:
+    """
+    Out-of-core cleaning in two passes over source, holding one chunk at a time.
+
+    Pass 1 decides each column's type over the whole file and sketches it:
+    numeric columns feed a QuantileSketch (plus range and integrality for the
+    downcast), the others a FrequencySketch. The encodings are built from the
+    sketches and pass 2 applies them chunk by chunk, appending to destination.
+
+    Tolerance against clean_dataframe: vocabularies, category codes and modes
+    are identical (a column is only encoded while its sketch is exact);
+    imputed medians are exact for columns with up to 4096 values and otherwise
+    within about 0.5% of rank of the true median. A sketched median is always
+    an observed value, so an integer column whose exact median falls between
+    two integers stays integral here. Modes of columns with more than 10k
+    distinct values are heavy-hitter estimates.
+    """
+    numeric, quantiles, flags, counts, recount = {}, {}, {}, {}, []
+    rows, columns = 0, []
+
+    # Pass 1: column types and sketches. Everything is read as text so the
+    # type of a column is decided over all chunks, like a single read_csv.
+    with tracer.span("sketch") as span:
+        for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=str):
+            if not columns:
+                columns = list(chunk.columns)
+                numeric = {col: True for col in columns}
+                quantiles = {col: QuantileSketch() for col in columns}
+                flags = {col: [True, True] for col in columns}
+                counts = {col: FrequencySketch() for col in columns}
+            for col in columns:
+                raw = chunk[col]
+                if numeric[col]:
+                    values = pd.to_numeric(raw, errors="coerce")
+                    if values.isna().sum() == raw.isna().sum():
+                        values = values.dropna().to_numpy(dtype=np.float64)
+                        quantiles[col].update(values)
+                        integral, float32_exact = value_flags(values)
+                        flags[col][0] &= integral
+                        flags[col][1] &= float32_exact
+                        continue
+                    numeric[col] = False
+                    if rows:
+                        # Text showed up after numeric chunks that were never
+                        # counted, so this column gets a counting pass below
+                        recount.append(col)
+                if col not in recount:
+                    counts[col].update(raw)
+            rows += len(chunk)
+
+        if recount:
+            for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=str, usecols=recount):
+                for col in recount:
+                    counts[col].update(chunk[col])
+        span.set(rows=rows)
+
+    specs = {}
+    for col in columns:
+        if numeric[col]:
+            sketch = quantiles[col]
+            specs[col] = numeric_spec(sketch.median(), sketch.min, sketch.max, *flags[col])
+        else:
+            sketch = counts[col]
+            exact = not sketch.overflowed and sketch.distinct < CATEGORICAL_MAX_UNIQUES
+            specs[col] = text_spec(sketch.mode(), sketch.vocabulary() if exact else None)
+    encodings = {"columns": specs}
+
+    # Pass 2: impute and encode chunk by chunk
+    with tracer.span("impute", rows=rows):
+        for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows, dtype=str)):
+            cleaned = apply_encodings(chunk, encodings)
+            cleaned.to_csv(destination, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+    return (rows, len(columns)), encodings
+
 
 def cleaner_node(state: AgentState):
     """
     Automated Data Cleaning Agent. Handles NaNs and encoders structurally.
+    Datasets the PrivacyAgent left on disk are cleaned out of core.
     """
     print("[CleanerAgent] Executing automated data cleaning...")
-    masked_csv = state.get("masked_csv_path")
-    logs = state.get("logs", [])
-    
-    if not masked_csv:
-        return {"logs": logs + ["CleanerAgent found no data."]}
-        
-    df = pd.read_csv(masked_csv)
-    original_shape = df.shape
-    
-    # 1. Impute NaNs
-    numeric_cols = df.select_dtypes(include='number').columns
-    string_cols = df.select_dtypes(exclude='number').columns
-    
-    if not numeric_cols.empty:
-        num_imputer = SimpleImputer(strategy='median')
-        df[numeric_cols] = num_imputer.fit_transform(df[numeric_cols])
-        
-    if not string_cols.empty:
-        str_imputer = SimpleImputer(strategy='most_frequent')
-        df[string_cols] = str_imputer.fit_transform(df[string_cols])
-        
-    # 2. Encode Categoricals (Limit to low cardinality to preserve matrix)
-    encoders_used = []
-    for col in string_cols:
-        if df[col].nunique() < 20: # simple threshold for categoricals
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col].astype(str))
-            encoders_used.append(col)
-            
-    # Overwrite secure proxy proxy file with cleaned matrix
-    df.to_csv(masked_csv, index=False)
-    
+    data_ref = state.get("data_ref")
+
+    if not data_ref:
+        return {"logs": ["CleanerAgent found no data."]}
+
+    source_path = artifact_store.path(data_ref)
+    if source_path:
+        print("[CleanerAgent] Large dataset, cleaning in two chunked passes")
+        cleaned_path = os.path.join(state["workspace_dir"], "cleaned.csv")
+        original_shape, encodings = clean_csv_streaming(source_path, cleaned_path)
+        # Read back with the learned dtypes so downstream frames stay compact
+        dtypes = {col: spec["dtype"] for col, spec in encodings["columns"].items() if spec["kind"] == "numeric"}
+        dtypes.update({col: "int8" for col in categorical_columns(encodings)})
+        cleaned_ref = artifact_store.put_file(state["run_id"], "cleaned", cleaned_path, dtypes=dtypes)
+        method = "Chunked Sketch Imputation/Encoding"
+    else:
+        # apply_encodings builds a new frame; the shared artifact is not modified
+        df = artifact_store.get(data_ref)
+        original_shape = df.shape
+        df, encodings = clean_dataframe(df)
+        # Publish the cleaned matrix for downstream nodes
+        cleaned_ref = artifact_store.put(state["run_id"], "cleaned", df)
+        method = "Categorical Codes/Downcasting"
+
+    encoders_used = categorical_columns(encodings)
+
     report = f"Data cleaned. Original shape: {original_shape}. Imputed NaNs (Median/Mode). Encoded Categoricals: {encoders_used}"
-    
+
     return {
+        "data_ref": cleaned_ref,
         "cleaning_report": report,
-        "logs": logs + [f"CleanerAgent structured dataset via Scikit-Learn Imputation/Encoding."]
+        "encodings": encodings,
+        "logs": [f"CleanerAgent structured dataset via {method}."]
     }
@@ -1,15 +1,42 @@
 import pandas as pd
 import numpy as np
 import json
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.svm import SVC, SVR
+import math
+import time
+from sklearn.model_selection import train_test_split
+from sklearn.ensemble import (
+    RandomForestClassifier, GradientBoostingClassifier, RandomForestRegressor, GradientBoostingRegressor,
+    HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+)
+from sklearn.linear_model import LogisticRegression, LinearRegression, SGDClassifier, SGDRegressor
+from sklearn.svm import SVC, SVR, LinearSVC, LinearSVR
 from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import PCA
+from sklearn.kernel_approximation import Nystroem
+from sklearn.pipeline import make_pipeline
 from sklearn.metrics import accuracy_score, r2_score
 from core.state import AgentState
+from core.events import emit_event
+from core.tracing import tracer
+from services.automl import search_candidates, AUTOML_SEARCH, AUTOML_HALVING_ROWS
+from services.model_cache import model_cache, dataset_fingerprint, candidate_config
+from services.model_registry import model_registry, model_name
+from services.artifacts import artifact_store
+from services.llm import llm_service
+from services.chart_data import lttb, CHART_MAX_POINTS
+from services.estimators import SampledKNeighborsClassifier, SampledKNeighborsRegressor
+
+# Training-set sizes above which a candidate is swapped for a scalable equivalent
+HIST_GB_MIN_ROWS = 10_000
+KERNEL_APPROX_MIN_ROWS = 20_000
+LINEAR_SVM_MIN_ROWS = 200_000
+APPROX_KNN_MIN_ROWS = 50_000
+FOREST_SUBSAMPLE_MIN_ROWS = 100_000
+FOREST_MAX_SAMPLES = 100_000
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
 
 def _detect_target_and_task(df: pd.DataFrame, task_hint: str = "") -> tuple[str, str]:
     """
@@ -21,8 +48,6 @@ def _detect_target_and_task(df: pd.DataFrame, task_hint: str = "") -> tuple[str,
 
     # Try LLM-based selection first
     try:
-        from langchain_ollama import OllamaLLM
-        llm = OllamaLLM(model="llama3.2:1b", format="json")
         columns_info = {col: str(df[col].dtype) for col in df.columns}
         prompt = f"""
         Given a dataset with these columns and types: {json.dumps(columns_info)}
@@ -34,7 +59,7 @@ def _detect_target_and_task(df: pd.DataFrame, task_hint: str = "") -> tuple[str,
         
         Return EXACTLY JSON: {{"target": "column_name", "task_type": "classification_or_regression"}}
         """
-        result = json.loads(llm.invoke(prompt))
+        result = json.loads(llm_service.complete(prompt, format="json"))
         candidate = result.get("target", "")
         if candidate in df.columns:
             target_col = candidate
@@ -66,26 +91,153 @@ def _detect_target_and_task(df: pd.DataFrame, task_hint: str = "") -> tuple[str,
     return target_col, task_type
 
 
+def build_candidates(task_type: str) -> tuple[dict, str, str]:
+    """Candidate models for the task type, with the CV scoring and its display name."""
+    if task_type == "classification":
+        candidates = {
+            "Random Forest Classifier": RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1),
+            "Gradient Boosting Classifier": GradientBoostingClassifier(n_estimators=100, random_state=42),
+            "Support Vector Machine (SVC)": SVC(kernel='rbf', random_state=42),
+            "K-Nearest Neighbors": KNeighborsClassifier(n_neighbors=5),
+            "Logistic Regression": LogisticRegression(max_iter=1000, random_state=42),
+            "Decision Tree Classifier": DecisionTreeClassifier(random_state=42),
+        }
+        scoring = "accuracy"
+        metric_name = "Accuracy"
+    else:
+        candidates = {
+            "Random Forest Regressor": RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
+            "Gradient Boosting Regressor": GradientBoostingRegressor(n_estimators=100, random_state=42),
+            "Support Vector Regressor (SVR)": SVR(kernel='rbf'),
+            "K-Nearest Neighbors Regressor": KNeighborsRegressor(n_neighbors=5),
+            "Linear Regression": LinearRegression(),
+            "Decision Tree Regressor": DecisionTreeRegressor(random_state=42),
+        }
+        scoring = "r2"
+        metric_name = "R² Score"
+    return candidates, scoring, metric_name
+
+
+def scale_candidates(candidates: dict, task_type: str, n_rows: int, n_features: int) -> tuple[dict, list[dict]]:
+    """
+    Swaps candidates that do not scale to n_rows (exact kernel SVMs, exact
+    KNN, sklearn's GradientBoosting, full-bootstrap forests) for scalable
+    equivalents. Returns the new candidate set and one entry per substitution.
+    """
+    classification = task_type == "classification"
+    # original name -> (substitute name, estimator, row threshold that triggered it)
+    swaps = {}
+
+    if n_rows >= HIST_GB_MIN_ROWS:
+        if classification:
+            swaps["Gradient Boosting Classifier"] = ("Hist Gradient Boosting Classifier",
+                HistGradientBoostingClassifier(max_iter=100, random_state=42), HIST_GB_MIN_ROWS)
+        else:
+            swaps["Gradient Boosting Regressor"] = ("Hist Gradient Boosting Regressor",
+                HistGradientBoostingRegressor(max_iter=100, random_state=42), HIST_GB_MIN_ROWS)
+
+    if n_rows >= LINEAR_SVM_MIN_ROWS:
+        if classification:
+            swaps["Support Vector Machine (SVC)"] = ("Linear SVM (SGD)",
+                SGDClassifier(loss="hinge", max_iter=20, tol=1e-3, random_state=42), LINEAR_SVM_MIN_ROWS)
+        else:
+            swaps["Support Vector Regressor (SVR)"] = ("Linear SVR (SGD)",
+                SGDRegressor(loss="epsilon_insensitive", max_iter=20, tol=1e-3, random_state=42), LINEAR_SVM_MIN_ROWS)
+    elif n_rows >= KERNEL_APPROX_MIN_ROWS:
+        if classification:
+            swaps["Support Vector Machine (SVC)"] = ("Kernel-Approx. SVM (Nystroem + LinearSVC)",
+                make_pipeline(Nystroem(n_components=300, random_state=42), LinearSVC(random_state=42)),
+                KERNEL_APPROX_MIN_ROWS)
+        else:
+            swaps["Support Vector Regressor (SVR)"] = ("Kernel-Approx. SVR (Nystroem + LinearSVR)",
+                make_pipeline(Nystroem(n_components=300, random_state=42),
+                              LinearSVR(loss="squared_epsilon_insensitive", dual=False, random_state=42)),
+                KERNEL_APPROX_MIN_ROWS)
+
+    if n_rows >= APPROX_KNN_MIN_ROWS:
+        # Bounded random index, projected to a few dimensions where a KD-tree stays fast
+        projection = PCA(n_components=min(10, n_features), random_state=42)
+        if classification:
+            swaps["K-Nearest Neighbors"] = ("Approx. K-Nearest Neighbors",
+                make_pipeline(projection, SampledKNeighborsClassifier(n_neighbors=5, algorithm="kd_tree", random_state=42)),
+                APPROX_KNN_MIN_ROWS)
+        else:
+            swaps["K-Nearest Neighbors Regressor"] = ("Approx. K-Nearest Neighbors Regressor",
+                make_pipeline(projection, SampledKNeighborsRegressor(n_neighbors=5, algorithm="kd_tree", random_state=42)),
+                APPROX_KNN_MIN_ROWS)
+
+    if n_rows >= FOREST_SUBSAMPLE_MIN_ROWS:
+        max_samples = FOREST_MAX_SAMPLES / n_rows
+        if classification:
+            swaps["Random Forest Classifier"] = ("Random Forest Classifier (subsampled)",
+                RandomForestClassifier(n_estimators=100, max_samples=max_samples, random_state=42, n_jobs=-1),
+                FOREST_SUBSAMPLE_MIN_ROWS)
+        else:
+            swaps["Random Forest Regressor"] = ("Random Forest Regressor (subsampled)",
+                RandomForestRegressor(n_estimators=100, max_samples=max_samples, random_state=42, n_jobs=-1),
+                FOREST_SUBSAMPLE_MIN_ROWS)
+
+    scaled, substitutions = {}, []
+    for name, model in candidates.items():
+        if name not in swaps:
+            scaled[name] = model
+            continue
+        substitute, estimator, threshold = swaps[name]
+        scaled[substitute] = estimator
+        substitutions.append({
+            "original": name,
+            "substitute": substitute,
+            "reason": f"{n_rows} training rows >= {threshold}",
+        })
+    return scaled, substitutions
+
+
+def _test_plot(y_pred: np.ndarray) -> dict:
+    """Predictions over the whole test set, reduced to CHART_MAX_POINTS with LTTB."""
+    values = np.asarray(y_pred, dtype=np.float64)
+    keep = lttb(np.arange(len(values), dtype=np.float64), values, CHART_MAX_POINTS)
+    return {
+        "sample": keep.tolist(),
+        "predicted": [round(float(p), 4) for p in values[keep]],
+    }
+
+
+def _register_model(state: AgentState, target_col: str, task_type: str, feature_cols: list[str],
+                    scaler, model, model_metrics: dict, cache_key: str):
+    """Publishes the winning pipeline to the model registry; serving is optional, the analysis is not."""
+    try:
+        with tracer.span("register"):
+            manifest = model_registry.register(
+                model_name(state.get("csv_file_path"), target_col), scaler, model, feature_cols,
+                state.get("encodings"), state.get("masked_columns") or [], target_col, task_type,
+                model_metrics, source_key=cache_key,
+            )
+    except Exception as e:
+        print(f"[ModelerAgent] Could not register the model for serving: {e}")
+        return None
+    return {"model_id": manifest["model_id"], "version": manifest["version"]}
+
+
 def modeler_node(state: AgentState):
     """
     Auto-ML Modeler Agent. Benchmarks multiple Scikit-Learn models against the
     cleaned dataset, selects the best one, and reports accuracy/R² scores.
     """
     print("[ModelerAgent] Starting automated model selection and benchmarking...")
-    masked_csv = state.get("masked_csv_path")
+    data_ref = state.get("data_ref")
     task = state.get("task", "")
-    logs = state.get("logs", [])
 
-    if not masked_csv:
+    if not data_ref:
         return {
             "model_metrics": {"error": "No data available for modeling."},
-            "logs": logs + ["ModelerAgent: No dataset found."]
+            "logs": ["ModelerAgent: No dataset found."]
         }
 
-    df = pd.read_csv(masked_csv)
+    df = artifact_store.get(data_ref)
 
     # --- Step 1: Detect target column and task type ---
-    target_col, task_type = _detect_target_and_task(df, task)
+    with tracer.span("detect_target", rows=len(df)):
+        target_col, task_type = _detect_target_and_task(df, task)
 
     # Ensure we only use numeric columns for features
     feature_cols = [c for c in df.select_dtypes(include='number').columns if c != target_col]
@@ -94,7 +246,37 @@ def modeler_node(state: AgentState):
         return {
             "model_metrics": {"error": "No numeric feature columns available after cleaning."},
             "target_column": target_col,
-            "logs": logs + ["ModelerAgent: Insufficient numeric features for modeling."]
+            "logs": ["ModelerAgent: Insufficient numeric features for modeling."]
+        }
+
+    # --- Repeat analyses of the same data reuse the cached benchmark ---
+    start = time.perf_counter()
+    n_train = len(df) - math.ceil(len(df) * TEST_SIZE)  # rows train_test_split keeps
+    candidates, scoring, metric_name = build_candidates(task_type)
+    candidates, substitutions = scale_candidates(candidates, task_type, n_train, len(feature_cols))
+    config = candidate_config(candidates, search=AUTOML_SEARCH, halving_rows=AUTOML_HALVING_ROWS,
+                              test_size=TEST_SIZE, split_seed=SPLIT_SEED)
+    with tracer.span("cache_lookup", rows=len(df)):
+        cache_key = model_cache.key(dataset_fingerprint(df[feature_cols + [target_col]]), target_col, task_type, config)
+        cached = model_cache.get(cache_key)
+    if cached is not None:
+        model_metrics = {**cached["model_metrics"], "cache": {
+            "status": "hit",
+            "key": cache_key[:12],
+            "seconds": round(time.perf_counter() - start, 2),
+            "original_seconds": cached["seconds"],
+        }}
+        model_metrics["registry"] = _register_model(state, target_col, task_type, cached["feature_cols"],
+                                                     cached["scaler"], cached["model"], model_metrics, cache_key)
+        print(f"[ModelerAgent] Cache hit {cache_key[:12]}: {model_metrics['best_model_name']}")
+        return {
+            "model_metrics": model_metrics,
+            "target_column": target_col,
+            "logs": [
+                f"ModelerAgent reused the cached benchmark for this dataset "
+                f"(saved {cached['seconds']}s). Best: {model_metrics['best_model_name']} "
+                f"({metric_name}: {model_metrics['best_accuracy']})"
+            ]
         }
 
     X = df[feature_cols].values
@@ -106,61 +288,43 @@ def modeler_node(state: AgentState):
 
     # --- Step 3: Train/Test split ---
     X_train, X_test, y_train, y_test = train_test_split(
-        X_scaled, y, test_size=0.2, random_state=42
+        X_scaled, y, test_size=TEST_SIZE, random_state=SPLIT_SEED
     )
 
-    # --- Step 4: Define candidate models ---
-    if task_type == "classification":
-        candidates = {
-            "Random Forest Classifier": RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1),
-            "Gradient Boosting Classifier": GradientBoostingClassifier(n_estimators=100, random_state=42),
-            "Support Vector Machine (SVC)": SVC(kernel='rbf', random_state=42),
-            "K-Nearest Neighbors": KNeighborsClassifier(n_neighbors=5),
-            "Logistic Regression": LogisticRegression(max_iter=1000, random_state=42),
-            "Decision Tree Classifier": DecisionTreeClassifier(random_state=42),
-        }
-        scoring = "accuracy"
-        metric_name = "Accuracy"
-    else:
-        candidates = {
-            "Random Forest Regressor": RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
-            "Gradient Boosting Regressor": GradientBoostingRegressor(n_estimators=100, random_state=42),
-            "Support Vector Regressor (SVR)": SVR(kernel='rbf'),
-            "K-Nearest Neighbors Regressor": KNeighborsRegressor(n_neighbors=5),
-            "Linear Regression": LinearRegression(),
-            "Decision Tree Regressor": DecisionTreeRegressor(random_state=42),
-        }
-        scoring = "r2"
-        metric_name = "R² Score"
+    # --- Step 4: Candidate models, adapted to the data size above ---
+    for sub in substitutions:
+        print(f"  [{sub['original']}] replaced by {sub['substitute']} ({sub['reason']})")
 
-    # --- Step 5: Benchmark all models ---
-    all_scores = {}
-    best_model_name = None
-    best_score = -float('inf')
-    best_model = None
+    # --- Step 5: Benchmark all models (parallel CV, halving on large data) ---
+    def report_score(name, result):
+        if result["error"]:
+            print(f"  [{name}] Failed: {result['error']}")
+        else:
+            print(f"  [{name}] CV {metric_name} on {result['rows']} rows: {result['score']:.4f}")
+        # The folds ran in parallel worker processes: the span covers them in
+        # wall-clock time and cpu_seconds is their summed fit time
+        tracer.record(f"cv:{name}", result["wall_seconds"], rows=result["rows"], error=result["error"],
+                      partial=result["partial"], cpu_seconds=result["fit_seconds"])
+        emit_event({"type": "model_score", "model": name, "score": round(result["score"], 4),
+                    "metric_name": metric_name, "rows": result["rows"], "partial": result["partial"],
+                    "fit_seconds": result["fit_seconds"], "error": result["error"]})
 
-    for name, model in candidates.items():
-        try:
-            # Use cross-validation for robust scoring (3-fold for speed)
-            n_folds = min(3, len(X_train)) if len(X_train) >= 3 else 2
-            cv_scores = cross_val_score(model, X_train, y_train, cv=n_folds, scoring=scoring)
-            mean_score = float(np.mean(cv_scores))
-            all_scores[name] = round(mean_score, 4)
-
-            if mean_score > best_score:
-                best_score = mean_score
-                best_model_name = name
-                best_model = model
-
-            print(f"  [{name}] CV {metric_name}: {mean_score:.4f}")
-        except Exception as e:
-            print(f"  [{name}] Failed: {e}")
-            all_scores[name] = 0.0
+    # Use cross-validation for robust scoring (3-fold for speed)
+    n_folds = min(3, len(X_train)) if len(X_train) >= 3 else 2
+    with tracer.span("search", rows=len(y_train), candidates=len(candidates)):
+        cv_results, best_model_name, search_report = search_candidates(
+            candidates, X_train, y_train, cv=n_folds, scoring=scoring, on_result=report_score
+        )
+    best_model = candidates.get(best_model_name)
+    all_scores = {name: round(cv_results[name]["score"], 4) for name in candidates if name in cv_results}
+    # Halving scored these on a subsample only: their scores don't compare with full-data ones
+    subsampled = {name: cv_results[name]["rows"] for name in all_scores if cv_results[name]["rows"] < len(y_train)}
 
     # --- Step 6: Refit best model on full training set and evaluate on test ---
     if best_model is not None:
-        best_model.fit(X_train, y_train)
-        y_pred = best_model.predict(X_test)
+        with tracer.span("refit", rows=len(X_train), model=best_model_name):
+            best_model.fit(X_train, y_train)
+            y_pred = best_model.predict(X_test)
 
         if task_type == "classification":
             test_score = float(accuracy_score(y_test, y_pred))
@@ -170,7 +334,7 @@ def modeler_node(state: AgentState):
         test_score = round(test_score, 4)
     else:
         test_score = 0.0
-        y_pred = []
+        y_pred = np.array([])
 
     # --- Step 7: Extract feature importances ---
     feature_importances = {}
@@ -199,22 +363,40 @@ def modeler_node(state: AgentState):
         "task_type": task_type,
         "metric_name": metric_name,
         "all_model_scores": all_scores,
+        "subsampled_scores": subsampled,
+        "search": search_report,
+        "substitutions": substitutions,
         "feature_importances": feature_importances,
         "target_column": target_col,
         "num_features": len(feature_cols),
         "num_samples": len(df),
-        "test_plot": {
-            "predicted": [round(float(p), 4) for p in y_pred[:30]]
-        }
+        "test_plot": _test_plot(y_pred)
     }
 
     print(f"[ModelerAgent] BEST Model: {best_model_name} | Test {metric_name}: {test_score}")
 
+    # A search cut short by the time budget is not worth reusing
+    elapsed = round(time.perf_counter() - start, 2)
+    model_metrics["cache"] = {"status": "miss", "key": cache_key[:12], "seconds": elapsed}
+    if best_model is not None and not search_report["budget_exhausted"]:
+        model_cache.put(cache_key, {
+            "model_metrics": model_metrics,
+            "scaler": scaler,
+            "model": best_model,
+            "feature_cols": feature_cols,
+            "seconds": elapsed,
+        })
+    if best_model is not None:
+        model_metrics["registry"] = _register_model(state, target_col, task_type, feature_cols,
+                                                    scaler, best_model, model_metrics, cache_key)
+
     return {
         "model_metrics": model_metrics,
         "target_column": target_col,
-        "logs": logs + [
-            f"ModelerAgent benchmarked {len(candidates)} models. "
+        "logs": [
+            f"ModelerAgent benchmarked {len(all_scores)}/{len(candidates)} models "
+            f"({search_report['mode']} search, {search_report['seconds']}s, "
+            f"{len(substitutions)} scalable substitutes). "
             f"Best: {best_model_name} ({metric_name}: {test_score})"
         ]
     }
@@ -1,4 +1,5 @@
 from core.state import AgentState
+from services.uploads import load_profile
 
 def orchestrator_node(state: AgentState):
     """
@@ -13,11 +14,17 @@ def orchestrator_node(state: AgentState):
     if not csv_file_path:
         csv_file_path = "mock_data.csv" 
     
-    current_logs = state.get("logs", [])
-    if current_logs is None:
-        current_logs = []
+    # Plan from the profile recorded at upload time instead of reading the file
+    profile = load_profile(csv_file_path)
+    logs = ["Orchestrator identified task and located dataset."]
+    if profile:
+        logs.append(
+            f"Orchestrator planned from upload profile: {profile['rows']} rows x "
+            f"{len(profile['columns'])} columns ({profile['bytes'] / 1e6:.1f} MB)."
+        )
         
     return {
         "csv_file_path": csv_file_path,
-        "logs": current_logs + ["Orchestrator identified task and located dataset."]
+        "dataset_profile": profile,
+        "logs": logs
     }
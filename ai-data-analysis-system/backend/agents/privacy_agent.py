@@ -2,6 +2,9 @@ import pandas as pd
 import os
 from core.state import AgentState
 from services.privacy import privacy_service
+from services.artifacts import artifact_store, STREAMING_THRESHOLD_BYTES, STREAMING_CHUNK_ROWS
+from services.pii_detection import summarize_report
+from core.tracing import tracer
 
 def privacy_node(state: AgentState):
     """
@@ -19,26 +22,36 @@ def privacy_node(state: AgentState):
             "Email": ["alice@email.com", "bob@email.com", "charlie@email.com", "david@email.com", "eve@email.com"],
             "TransactionAmount": [150.0, 200.0, 50.0, 120.0, 75.0]
         })
+    elif os.path.getsize(csv_file_path) > STREAMING_THRESHOLD_BYTES:
+        df = None
     else:
-        df = pd.read_csv(csv_file_path)
+        with tracer.span("read_csv") as span:
+            df = pd.read_csv(csv_file_path)
+            span.set(rows=len(df))
         
-    # Mask data using Presidio wrapper
-    masked_df = privacy_service.mask_dataframe(df)
-    
-    # Save masked data for downstream nodes
-    os.makedirs("uploads", exist_ok=True)
-    masked_csv_path = "uploads/masked_temp.csv"
-    masked_df.to_csv(masked_csv_path, index=False)
+    if df is None:
+        # Too large to hold in memory: mask chunk by chunk into the run workspace
+        print(f"[PrivacyAgent] Large dataset, masking in chunks of {STREAMING_CHUNK_ROWS} rows")
+        masked_path = os.path.join(state["workspace_dir"], "masked.csv")
+        preview_df, scan_report = privacy_service.mask_csv(csv_file_path, masked_path, STREAMING_CHUNK_ROWS)
+        data_ref = artifact_store.put_file(state["run_id"], "masked", masked_path)
+    else:
+        # Mask data using Presidio wrapper
+        masked_df, scan_report = privacy_service.mask_dataframe_with_report(df)
+        
+        # Hand the masked frame to downstream nodes in memory
+        data_ref = artifact_store.put(state["run_id"], "masked", masked_df)
+        preview_df = masked_df.head()
     
     # Generate snippet for preview
-    masked_preview = masked_df.head().to_json(orient="records")
+    masked_preview = preview_df.to_json(orient="records")
     
-    current_logs = state.get("logs", [])
-    if current_logs is None:
-        current_logs = []
-        
     return {
-        "masked_csv_path": masked_csv_path,
+        "data_ref": data_ref,
         "masked_data_preview": masked_preview,
-        "logs": current_logs + ["PrivacyAgent encrypted sensitive 'PERSON' and 'EMAIL' columns via Presidio Engine."]
+        "masked_columns": [r["column"] for r in scan_report if r["pii"]],
+        "logs": [
+            "PrivacyAgent encrypted sensitive 'PERSON' and 'EMAIL' columns via Presidio Engine.",
+            f"PrivacyAgent PII scan: {summarize_report(scan_report)}",
+        ]
     }
@@ -1,55 +1,75 @@
 import pandas as pd
 import json
-from langchain_ollama import OllamaLLM
 from core.state import AgentState
+from services.artifacts import artifact_store
+from services.llm import llm_service
+from services.chart_data import build_chart
+from core.tracing import tracer
 
-def visualizer_node(state: AgentState):
+def chart_mapping_prompt(task: str, columns: list) -> str:
+    # Depends only on the task and the schema, so repeat schemas hit the LLM cache
+    return f"""
+        Task: "{task}"
+        Columns: {columns}
+        Determine the best X-Axis (xKey) and Y-Axis (yKey) columns for a primary EDA plot,
+        and whether yKey should be averaged ("mean") or totalled ("sum") per xKey.
+        Return EXACTLY JSON: {{"xKey": "col", "yKey": "col", "type": "bar_chart", "agg": "mean"}}
+        """
+
+def eda_chart_node(state: AgentState):
     """
-    The Visualizer Agent dynamically prompts Ollama to determine the ideal 
-    data mapping for the primary EDA chart, and constructs 2 additional 
-    charts based on the Auto-ML Modeler bounds (Importances & Regression diffs).
+    EDA branch of the Visualizer. Prompts Ollama for the ideal data mapping
+    of the primary exploratory chart, then aggregates the full dataset for
+    it (only the two mapped columns are loaded). Needs only the cleaned data,
+    so it runs alongside the ModelerAgent.
     """
     task = state.get("task", "")
-    masked_csv = state.get("masked_csv_path")
-    metrics = state.get("model_metrics", {})
-    logs = state.get("logs", [])
-    
-    print("[VisualizerAgent] Generating Array of AutoML Configurations...")
-    df = pd.read_csv(masked_csv)
-    columns = df.columns.tolist()
-    
-    configs = []
-    
+    data_ref = state.get("data_ref")
+    encodings = state.get("encodings") or {"columns": {}}
+
+    print("[EDAAgent] Mapping the exploratory chart...")
+    # The cleaner's encodings list every column, so the schema needs no data read
+    columns = list(encodings["columns"]) or artifact_store.get(data_ref).columns.tolist()
+
     # ---------------------------------------------
     # Chart 1: Contextual EDA Plot (LLM Selected)
     # ---------------------------------------------
     try:
-        llm = OllamaLLM(model="llama3.2:1b", format="json")
-        prompt = f"""
-        Task: "{task}"
-        Columns: {columns}
-        Determine the best X-Axis (xKey) and Y-Axis (yKey) columns for a primary EDA plot.
-        Return EXACTLY JSON: {{"xKey": "col", "yKey": "col", "type": "bar_chart"}}
-        """
-        mapping = json.loads(llm.invoke(prompt))
+        mapping = json.loads(llm_service.complete(chart_mapping_prompt(task, columns), format="json"))
         xKey = mapping.get("xKey")
         yKey = mapping.get("yKey")
         chart_type = mapping.get("type", "bar_chart")
+        agg = mapping.get("agg", "mean")
         if xKey not in columns: xKey = columns[0]
         if yKey not in columns: yKey = columns[1] if len(columns) > 1 else columns[0]
     except Exception:
         xKey = columns[0]
         yKey = columns[1] if len(columns) > 1 else columns[0]
         chart_type = "bar_chart"
-        
-    viz_df = df.head(15).copy()
-    configs.append({
-        "type": chart_type,
-        "title": f"Exploratory Distribution: {yKey} vs {xKey}",
-        "data": viz_df.to_dict(orient="records"),
-        "xKey": xKey,
-        "yKey": yKey
-    })
+        agg = "mean"
+
+    df = artifact_store.get(data_ref, columns=list(dict.fromkeys([xKey, yKey])))
+    categories = {col: spec["categories"] for col, spec in encodings["columns"].items()
+                  if spec["kind"] == "categorical"}
+    with tracer.span("build_chart", rows=len(df), chart=chart_type):
+        config = build_chart(df, xKey, yKey, chart_type, agg, categories)
+    config["title"] = f"Exploratory Distribution: {config['title']}"
+
+    return {
+        "recharts_configs": [config],
+        "logs": [f"EDAAgent aggregated {len(df)} rows of {yKey} vs {xKey} into {len(config['data'])} chart points."]
+    }
+
+def visualizer_node(state: AgentState):
+    """
+    The Visualizer Agent constructs the charts based on the Auto-ML Modeler
+    bounds (Importances & Regression diffs). The exploratory chart comes from
+    the EDA branch.
+    """
+    metrics = state.get("model_metrics", {})
+    
+    print("[VisualizerAgent] Generating Array of AutoML Configurations...")
+    configs = []
 
     # ---------------------------------------------
     # Chart 2: Feature Importances Top-N
@@ -72,7 +92,9 @@ def visualizer_node(state: AgentState):
     test_plot = metrics.get("test_plot", {})
     if test_plot:
         predicted = test_plot.get("predicted", [])
-        avp_data = [{"sample": str(i), "predicted_value": float(pred)} for i, pred in enumerate(predicted)]
+        # LTTB-downsampled by the modeler; the sample numbers are positions in the test set
+        samples = test_plot.get("sample") or range(len(predicted))
+        avp_data = [{"sample": str(i), "predicted_value": float(pred)} for i, pred in zip(samples, predicted)]
         configs.append({
             "type": "line_chart",
             "title": "Predictive Testing Trend bounds",
@@ -83,5 +105,5 @@ def visualizer_node(state: AgentState):
 
     return {
         "recharts_configs": configs,
-        "logs": logs + [f"VisualizerAgent assembled {len(configs)} complex ML Visualizations."]
+        "logs": [f"VisualizerAgent assembled {len(configs)} complex ML Visualizations."]
     }
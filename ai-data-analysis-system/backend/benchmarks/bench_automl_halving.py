@@ -0,0 +1,75 @@
+"""
+Successive halving against full cross-validation on synthetic datasets shaped
+like well-known public ones. For each shape it reports the search wall time of
+both modes, the speedup and whether halving picked the same winner.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_automl_halving --scale 1.0
+--scale multiplies every row count (full CV with SVC grows quadratically, so
+start small).
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.datasets import make_classification, make_regression
+
+from agents.modeler import build_candidates
+from services.automl import search_candidates
+
+# name, task, rows, features, informative, classes
+SHAPES = [
+    ("adult-like", "classification", 48_842, 14, 6, 2),
+    ("higgs-like", "classification", 100_000, 28, 10, 2),
+    ("covertype-like", "classification", 100_000, 54, 12, 7),
+    ("california-like", "regression", 20_640, 8, 6, None),
+    ("year-msd-like", "regression", 100_000, 90, 20, None),
+]
+
+
+def make_shape(task: str, rows: int, features: int, informative: int, classes, seed: int = 0):
+    if task == "classification":
+        return make_classification(rows, features, n_informative=informative, n_classes=classes,
+                                   n_clusters_per_class=2, flip_y=0.05, random_state=seed)
+    X, y = make_regression(rows, features, n_informative=informative, noise=10.0, random_state=seed)
+    # A little non-linearity so the model ranking is not trivially linear
+    y = y + 25 * np.sin(X[:, 0]) * X[:, 1]
+    return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=0.2)
+    parser.add_argument("--cores", type=int, default=None)
+    parser.add_argument("--only", nargs="*", help="Subset of shape names")
+    args = parser.parse_args()
+
+    print(f"{'dataset':>16} | {'rows':>7} | {'full CV':>8} | {'halving':>8} | speedup | winner (full / halving)")
+    same = 0
+    shapes = [s for s in SHAPES if not args.only or s[0] in args.only]
+    for name, task, rows, features, informative, classes in shapes:
+        rows = max(3000, int(rows * args.scale))
+        X, y = make_shape(task, rows, features, informative, classes)
+        # The modeler searches on its 80% training split
+        X, y = X[: int(rows * 0.8)], y[: int(rows * 0.8)]
+        candidates, scoring, _ = build_candidates(task)
+
+        timings, winners, scores = {}, {}, {}
+        for mode in ("full", "halving"):
+            start = time.perf_counter()
+            results, winner, _ = search_candidates(candidates, X, y, cv=3, scoring=scoring, mode=mode,
+                                                   budget_seconds=0, cores=args.cores)
+            timings[mode] = time.perf_counter() - start
+            winners[mode] = winner
+            scores[mode] = results
+        same += winners["full"] == winners["halving"]
+        # How much worse, on full CV, is the model halving picked
+        regret = scores["full"][winners["full"]]["score"] - scores["full"][winners["halving"]]["score"]
+        print(f"{name:>16} | {len(y):>7} | {timings['full']:7.1f}s | {timings['halving']:7.1f}s | "
+              f"{timings['full'] / timings['halving']:6.1f}x | {winners['full']} / {winners['halving']}"
+              f"{'' if regret == 0 else f' (regret {regret:.4f})'}")
+    print(f"same winner on {same}/{len(shapes)} datasets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Wall time of the ModelerAgent's CV benchmark: the previous sequential
+cross_val_score loop against services.automl.evaluate_candidates at several
+core budgets. Scores must be identical; only the schedule changes.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_automl_parallel --rows 20000 --cores 1 8 32
+"""
+import argparse
+import time
+
+import numpy as np
+from sklearn.datasets import make_classification, make_regression
+from sklearn.model_selection import cross_val_score
+
+from agents.modeler import build_candidates
+from services.automl import evaluate_candidates
+
+
+def sequential(candidates: dict, X, y, cv: int, scoring: str) -> dict:
+    """The loop modeler_node used to run."""
+    scores = {}
+    for name, model in candidates.items():
+        scores[name] = float(np.mean(cross_val_score(model, X, y, cv=cv, scoring=scoring)))
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--task", choices=["classification", "regression"], default="classification")
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    if args.task == "classification":
+        X, y = make_classification(args.rows, args.features, n_informative=8, random_state=0)
+    else:
+        X, y = make_regression(args.rows, args.features, n_informative=8, noise=5.0, random_state=0)
+    candidates, scoring, _ = build_candidates(args.task)
+    print(f"{args.task}: {args.rows} rows x {args.features} features, {len(candidates)} candidates x 3 folds")
+
+    start = time.perf_counter()
+    expected = sequential(candidates, X, y, 3, scoring)
+    baseline = time.perf_counter() - start
+    print(f"{'sequential':>12} | {baseline:7.1f} s")
+
+    for cores in args.cores:
+        start = time.perf_counter()
+        finished = []
+        results = evaluate_candidates(candidates, X, y, cv=3, scoring=scoring, cores=cores,
+                                      on_result=lambda name, _: finished.append((name, time.perf_counter() - start)))
+        elapsed = time.perf_counter() - start
+        for name, result in results.items():
+            assert abs(result["score"] - expected[name]) < 1e-9, (name, result["score"], expected[name])
+        first_name, first_at = finished[0]
+        print(f"{f'{cores} cores':>12} | {elapsed:7.1f} s | {baseline / elapsed:4.1f}x | "
+              f"first score after {first_at:.1f} s ({first_name})")
+    print("scores identical to the sequential loop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Fit + predict time and test score of the ModelerAgent candidates from 10k to
+5M rows: the original candidate set against the size-aware one produced by
+scale_candidates. Originals are only run up to --original-max-rows, since
+SVC/KNN/GradientBoosting do not finish in reasonable time beyond that.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_candidates_scaling --rows 10000 100000 1000000 5000000
+"""
+import argparse
+import time
+
+from sklearn.base import clone
+from sklearn.datasets import make_classification, make_regression
+from sklearn.metrics import get_scorer
+
+from agents.modeler import build_candidates, scale_candidates
+
+# Scoring is on at most this many held-out rows, so predict cost stays comparable
+MAX_TEST_ROWS = 100_000
+
+
+def time_candidate(model, X_train, y_train, X_test, y_test, scorer) -> tuple[float, float]:
+    start = time.perf_counter()
+    fitted = clone(model).fit(X_train, y_train)
+    score = scorer(fitted, X_test, y_test)
+    return time.perf_counter() - start, score
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--task", choices=["classification", "regression"], default="classification")
+    parser.add_argument("--original-max-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        if args.task == "classification":
+            X, y = make_classification(rows, args.features, n_informative=10, random_state=0)
+        else:
+            X, y = make_regression(rows, args.features, n_informative=10, noise=5.0, random_state=0)
+        split = int(rows * 0.8)
+        X_train, y_train = X[:split], y[:split]
+        X_test, y_test = X[split:split + MAX_TEST_ROWS], y[split:split + MAX_TEST_ROWS]
+
+        originals, scoring, metric_name = build_candidates(args.task)
+        scaled, substitutions = scale_candidates(originals, args.task, len(X_train), args.features)
+        scorer = get_scorer(scoring)
+        swapped = {sub["original"]: sub["substitute"] for sub in substitutions}
+
+        print(f"\n{rows} rows ({len(substitutions)} substitutions), {metric_name}")
+        total_original = total_scaled = 0.0
+        run_originals = rows <= args.original_max_rows
+        for name, model in originals.items():
+            substitute = swapped.get(name, name)
+            scaled_s, scaled_score = time_candidate(scaled[substitute], X_train, y_train, X_test, y_test, scorer)
+            total_scaled += scaled_s
+            line = f"  {substitute:>42} | {scaled_s:8.1f} s | {scaled_score:.4f}"
+            if substitute != name and run_originals:
+                original_s, original_score = time_candidate(model, X_train, y_train, X_test, y_test, scorer)
+                total_original += original_s
+                line += f"  <- {name}: {original_s:8.1f} s | {original_score:.4f}"
+            elif substitute != name:
+                line += f"  <- {name}: skipped"
+            elif run_originals:
+                total_original += scaled_s
+            print(line)
+        if run_originals:
+            print(f"  total: original set {total_original:.1f} s, size-aware set {total_scaled:.1f} s")
+        else:
+            print(f"  total: size-aware set {total_scaled:.1f} s (original set not run)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+EDA chart payload size and build time as the dataset grows: the old
+head(15)-of-every-column payload versus the aggregated chart data, for a
+group-by, a histogram and an LTTB line series.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_chart_payload --max-rows 5000000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.chart_data import build_chart
+
+
+def make_frame(rows: int, extra_columns: int = 20, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "segment": rng.integers(0, 4, rows).astype("int8"),
+        "amount": rng.lognormal(3, 1, rows),
+        "t": np.arange(rows, dtype=np.float64),
+        "signal": np.sin(np.arange(rows) / max(rows / 20, 1)) + rng.normal(0, 0.1, rows),
+    })
+    for i in range(extra_columns):
+        df[f"f{i}"] = rng.normal(size=rows)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-rows", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    categories = {"segment": ["corporate", "public", "retail", "sme"]}
+    charts = [("segment", "amount", "bar_chart"), ("amount", "amount", "bar_chart"), ("t", "signal", "line_chart")]
+    rows = 10_000
+    while rows <= args.max_rows:
+        df = make_frame(rows)
+        head_bytes = len(json.dumps(df.head(15).to_dict(orient="records")))
+        cells = []
+        for x, y, kind in charts:
+            start = time.perf_counter()
+            config = build_chart(df[[x, y]] if x != y else df[[x]], x, y, kind, categories=categories)
+            elapsed = time.perf_counter() - start
+            cells.append(f"{kind[:4]} {x:>7}: {len(json.dumps(config['data'])):6d} B {elapsed * 1000:6.0f} ms")
+        print(f"{rows:>9} rows | head(15) {head_bytes:5d} B | " + " | ".join(cells))
+        rows *= 10
+
+
+if __name__ == "__main__":
+    main()
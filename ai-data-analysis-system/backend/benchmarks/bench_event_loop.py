@@ -0,0 +1,95 @@
+"""
+Measures GET / latency on a running server while a heavy analysis streams over
+/ws, to check that agent work no longer stalls the event loop.
+
+Start the server first (from ai-data-analysis-system/backend):
+    uvicorn main:app --port 8000
+then:
+    python -m benchmarks.bench_event_loop --rows 300000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import websockets
+
+
+def make_dataset(path: str, rows: int, features: int = 12):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(rows, features))
+    df = pd.DataFrame(X, columns=[f"f{i}" for i in range(features)])
+    df["label"] = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    df.to_csv(path, index=False)
+
+
+def _get_latency_ms(url: str) -> float:
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=30) as response:
+        response.read()
+    return (time.perf_counter() - start) * 1000
+
+
+async def probe(url: str, stop: asyncio.Event, interval: float) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        # Requests go out from a thread so a stalled server, not this client, sets the latency
+        latencies.append(await asyncio.to_thread(_get_latency_ms, url))
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run_analysis(ws_url: str, csv_path: str) -> float:
+    start = time.perf_counter()
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        await ws.send(json.dumps({"task": "Predict label", "csv_file_path": csv_path}))
+        while json.loads(await ws.recv())["type"] != "done":
+            pass
+    return time.perf_counter() - start
+
+
+def summarize(name: str, latencies: list[float]):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:>14} | n={len(ordered):>4} | p50 {statistics.median(ordered):8.1f} ms | "
+          f"p99 {p99:8.1f} ms | max {ordered[-1]:8.1f} ms")
+
+
+async def main_async(args):
+    health_url = args.http_url.rstrip("/") + "/"
+    idle = [_get_latency_ms(health_url) for _ in range(50)]
+
+    with tempfile.TemporaryDirectory(dir=args.data_dir) as workdir:
+        csv_path = os.path.abspath(os.path.join(workdir, "heavy.csv"))
+        make_dataset(csv_path, args.rows)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(health_url, stop, args.interval))
+        analysis_s = await run_analysis(args.ws_url, csv_path)
+        stop.set()
+        loaded = await probe_task
+
+    print(f"analysis wall time: {analysis_s:.1f} s ({args.rows} rows)")
+    summarize("idle", idle)
+    summarize("during run", loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--http-url", default="http://localhost:8000")
+    parser.add_argument("--ws-url", default="ws://localhost:8000/ws")
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--interval", type=float, default=0.05)
+    parser.add_argument("--data-dir", default="uploads",
+                        help="Where to write the test CSV; must be readable by the server")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+LLM time per analysis against the Ollama stub: the old per-call OllamaLLM
+with sequential blocking calls, the shared LLMService on a new schema
+(target detection and chart mapping in flight together), and a repeat
+schema served from the prompt cache. The cache and dedupe behaviour itself
+is covered by tests/test_llm_cache.py.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_llm_cache --latency 0.5 --runs 5
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.ollama_stub import OllamaStub, serve
+from services.llm import LLMService, PromptCache
+
+
+def prompts(schema: dict, task: str) -> tuple[str, str, str]:
+    target = f"""
+        Given a dataset with these columns and types: {json.dumps(schema)}
+        And the user's analysis task: "{task}"
+        Return EXACTLY JSON: {{"target": "column_name", "task_type": "classification_or_regression"}}
+        """
+    chart = f"""
+        Task: "{task}"
+        Columns: {list(schema)}
+        Return EXACTLY JSON: {{"xKey": "col", "yKey": "col", "type": "bar_chart"}}
+        """
+    summary = f"Write an executive summary for {task} on columns {list(schema)}."
+    return target, chart, summary
+
+
+def per_call_clients(base_url: str, target: str, chart: str, summary: str):
+    # What the agents did before: a new client and a blocking call each
+    from langchain_ollama import OllamaLLM
+    OllamaLLM(model="llama3.2:1b", format="json", base_url=base_url).invoke(target)
+    OllamaLLM(model="llama3.2:1b", format="json", base_url=base_url).invoke(chart)
+    OllamaLLM(model="llama3.2:1b", base_url=base_url).invoke(summary)
+
+
+def shared_service(service: LLMService, target: str, chart: str, summary: str):
+    # The visualizer's branch runs alongside the modeler's, as in the pipeline
+    visualizer = threading.Thread(target=service.complete, args=(chart,), kwargs={"format": "json"})
+    visualizer.start()
+    service.complete(target, format="json")
+    visualizer.join()
+    service.complete(summary)
+
+
+def measure(label: str, fn, runs: int):
+    before = OllamaStub.requests
+    start = time.perf_counter()
+    for i in range(runs):
+        fn(i)
+    per_run = (time.perf_counter() - start) / runs
+    print(f"{label:>22} | {per_run * 1000:7.0f} ms per analysis | "
+          f"{(OllamaStub.requests - before) / runs:.1f} LLM calls per analysis")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    server, base_url = serve(latency=args.latency)
+    with tempfile.TemporaryDirectory() as workdir:
+        service = LLMService(base_url=base_url, cache=PromptCache(os.path.join(workdir, "llm.db")))
+
+        def schema(i):
+            return {f"col_{i}_{j}": "float64" for j in range(8)}
+
+        measure("per-call clients", lambda i: per_call_clients(base_url, *prompts(schema(i), "predict")), args.runs)
+        measure("shared, new schema", lambda i: shared_service(service, *prompts(schema(i), "predict")), args.runs)
+        measure("shared, repeat schema", lambda i: shared_service(service, *prompts(schema(i), "predict")), args.runs)
+        print("cache:", service.cache.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
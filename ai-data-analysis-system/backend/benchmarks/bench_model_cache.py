@@ -0,0 +1,47 @@
+"""
+Cold versus repeated ModelerAgent runs on the same cleaned dataset: the
+second run should be served from the fitted-model cache.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_model_cache --rows 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--features", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # The cache location is read at import time
+        os.environ["MODEL_CACHE_DIR"] = cache_dir
+        from agents.modeler import modeler_node
+        from services.artifacts import artifact_store
+        from services.model_cache import model_cache
+
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(args.rows, args.features))
+        df = pd.DataFrame(X, columns=[f"f{i}" for i in range(args.features)])
+        df["label"] = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype("int8")
+        ref = artifact_store.put("bench", "cleaned", df)
+
+        for attempt, task in enumerate(["Predict label", "Which factors drive label?"]):
+            start = time.perf_counter()
+            metrics = modeler_node({"task": task, "data_ref": ref, "logs": []})["model_metrics"]
+            elapsed = time.perf_counter() - start
+            print(f"run {attempt + 1}: {elapsed:7.2f} s | cache {metrics['cache']['status']} | "
+                  f"{metrics['best_model_name']} ({metrics['best_accuracy']})")
+        print("cache:", model_cache.stats())
+        artifact_store.release("bench")
+
+
+if __name__ == "__main__":
+    main()
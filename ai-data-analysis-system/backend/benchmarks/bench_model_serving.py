@@ -0,0 +1,75 @@
+"""
+Online prediction throughput and latency of a registered model, one predict
+call per request versus the MicroBatcher, with many concurrent clients each
+sending a single row.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_model_serving --requests 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from services.encoding import fit_encodings, apply_encodings
+from services.model_registry import ModelRegistry, predict_frame
+
+
+def make_model(registry: ModelRegistry, rows: int, features: int):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(rows, features)), columns=[f"f{i}" for i in range(features)])
+    df["segment"] = rng.choice(["retail", "sme", "corporate"], rows)
+    encodings = fit_encodings(df)
+    feature_cols = list(df.columns)
+    X = apply_encodings(df, encodings).values
+    y = (X[:, 0] + X[:, 1] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=100, random_state=0).fit(scaler.transform(X), y)
+    registry.register("bench", scaler, model, feature_cols, encodings, [], "label", "classification",
+                      {"best_model_name": "Random Forest Classifier"})
+    return df
+
+
+async def run(label: str, predict_one, requests: list, concurrency: int):
+    latencies = []
+    queue = iter(requests)
+
+    async def client():
+        for row in queue:
+            start = time.perf_counter()
+            await predict_one(row)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    print(f"{label:>10} | {len(requests) / elapsed:8.0f} req/s | "
+          f"p50 {p50:7.1f} ms | p95 {p95:7.1f} ms | p99 {p99:7.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--features", type=int, default=12)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        registry = ModelRegistry(root)
+        df = make_model(registry, 20_000, args.features)
+        bundle = registry.load("bench")
+        requests = [df.iloc[[i % len(df)]].reset_index(drop=True) for i in range(args.requests)]
+
+        await run("single", lambda row: asyncio.to_thread(predict_frame, bundle, row), requests, args.concurrency)
+        await run("batched", lambda row: registry.predict("bench", row), requests, args.concurrency)
+        print("batching:", registry.stats()["batching"])
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
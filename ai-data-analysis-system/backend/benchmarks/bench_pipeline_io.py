@@ -0,0 +1,93 @@
+"""
+Compares the per-run data handoff I/O of the old CSV round-trips with the
+in-memory ArtifactStore.
+
+Old: Privacy reads the upload and writes masked_temp.csv, Cleaner reads and
+rewrites it, Modeler and Visualizer each read it again.
+New: Privacy reads the upload once; every later handoff is an ArtifactStore
+put/get (optionally forced to spill to Parquet with --budget-mb).
+
+The agents' own compute is left out so the difference is purely handoff cost.
+
+Usage (from ai-data-analysis-system/backend):
+    python -m benchmarks.bench_pipeline_io --size-mb 1024
+    python -m benchmarks.bench_pipeline_io --size-mb 1024 --budget-mb 256
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.artifacts import ArtifactStore
+
+
+def write_csv(path: str, size_mb: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    chunk_rows = 200_000
+    written = 0
+    header = True
+    while written < size_mb * 1024 * 1024:
+        chunk = pd.DataFrame({
+            "Email": [f"user_{i}@example.com" for i in rng.integers(0, 1_000_000, chunk_rows)],
+            "Region": rng.choice(["north", "south", "east", "west"], chunk_rows),
+            "Age": rng.integers(18, 90, chunk_rows),
+            "Income": rng.normal(50_000, 15_000, chunk_rows).round(2),
+            "Score": rng.random(chunk_rows),
+            "Label": rng.integers(0, 2, chunk_rows),
+        })
+        chunk.to_csv(path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        written = os.path.getsize(path)
+
+
+def legacy_handoff(csv_path: str, workdir: str) -> float:
+    start = time.perf_counter()
+    masked_path = os.path.join(workdir, "masked_temp.csv")
+    df = pd.read_csv(csv_path)                 # PrivacyAgent ingest
+    df.to_csv(masked_path, index=False)        # PrivacyAgent handoff
+    df = pd.read_csv(masked_path)              # CleanerAgent
+    df.to_csv(masked_path, index=False)        # CleanerAgent handoff
+    pd.read_csv(masked_path)                   # ModelerAgent
+    pd.read_csv(masked_path)                   # VisualizerAgent
+    return time.perf_counter() - start
+
+
+def artifact_handoff(csv_path: str, store: ArtifactStore) -> float:
+    start = time.perf_counter()
+    df = pd.read_csv(csv_path)                 # PrivacyAgent ingest
+    ref = store.put("bench", "masked", df)
+    cleaned = store.get(ref).copy()            # CleanerAgent
+    ref = store.put("bench", "cleaned", cleaned)
+    store.get(ref)                             # ModelerAgent
+    store.get(ref)                             # VisualizerAgent
+    store.release("bench")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--budget-mb", type=int, default=None,
+                        help="ArtifactStore memory budget; small values force Parquet spills")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "input.csv")
+        print(f"Generating ~{args.size_mb} MB CSV...")
+        write_csv(csv_path, args.size_mb)
+        print(f"Input: {os.path.getsize(csv_path) / 1e6:.0f} MB")
+
+        budget = (args.budget_mb or 64 * 1024) * 1024 * 1024
+        store = ArtifactStore(root=os.path.join(workdir, "artifacts"), memory_budget_bytes=budget)
+
+        legacy_s = legacy_handoff(csv_path, workdir)
+        new_s = artifact_handoff(csv_path, store)
+        print(f"CSV round-trips : {legacy_s:8.2f} s")
+        print(f"ArtifactStore   : {new_s:8.2f} s  ({legacy_s / new_s:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
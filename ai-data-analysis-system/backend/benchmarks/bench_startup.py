@@ -0,0 +1,85 @@
+"""
+Measures server cold start with eager vs lazy Presidio engine construction.
+
+Each mode starts a fresh uvicorn process and records how long it takes until
+GET / answers (the app can serve health checks) and until GET /ready answers
+200 (the analyzer is loaded).
+
+  eager - the analyzer is built before the server starts, like the old
+          import-time PrivacyService()
+  lazy  - the server starts immediately, the analyzer loads in the background
+
+Usage (from ai-data-analysis-system/backend):
+    python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SERVER_SCRIPT = """
+import sys, uvicorn
+if sys.argv[1] == "eager":
+    from services.privacy import privacy_service
+    privacy_service.warm_up()
+import main
+uvicorn.run(main.app, host="127.0.0.1", port=int(sys.argv[2]), log_level="warning")
+"""
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return 0
+
+
+def measure(mode: str, port: int, timeout: float) -> tuple[float, float]:
+    env = dict(os.environ, PRIVACY_WARMUP="1")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", SERVER_SCRIPT, mode, str(port)], env=env)
+    first_response = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if first_response is None and _status(f"http://127.0.0.1:{port}/") == 200:
+                first_response = time.perf_counter() - start
+            if first_response is not None and _status(f"http://127.0.0.1:{port}/ready") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return first_response, ready
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} | {'first / (s)':>12} | {'/ready (s)':>11}")
+    for mode in ("eager", "lazy"):
+        firsts, readies = [], []
+        for _ in range(args.runs):
+            first, ready = measure(mode, args.port, args.timeout)
+            if first is None or ready is None:
+                print(f"{mode:>6} | server did not become ready within {args.timeout}s")
+                break
+            firsts.append(first)
+            readies.append(ready)
+        if firsts:
+            print(f"{mode:>6} | {statistics.median(firsts):>12.2f} | {statistics.median(readies):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compares the in-memory and chunked CleanerAgent paths on a synthetic CSV with
+missing values: peak traced memory, wall time, and how far the streaming
+output is from the in-memory one (category codes and dtypes must match
+exactly, imputed medians within the documented rank tolerance).
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_streaming_cleaner --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from agents.cleaner import clean_dataframe, clean_csv_streaming
+from services.encoding import categorical_columns
+
+
+def make_dataset(path: str, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "amount": rng.lognormal(3, 1, rows).round(2),
+        "age": rng.integers(18, 90, rows).astype(float),
+        "score": rng.normal(size=rows),
+        "segment": rng.choice(["retail", "sme", "corporate", "public"], rows, p=[0.5, 0.3, 0.15, 0.05]),
+        "country": rng.choice([f"C{i:02d}" for i in range(15)], rows),
+        "customer": [f"cust_{i}" for i in rng.integers(0, rows // 3 + 1, rows)],
+    })
+    for col in df.columns:
+        df.loc[rng.random(rows) < 0.05, col] = np.nan
+    df.to_csv(path, index=False)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def median_rank_error(column: pd.Series, approx: float) -> float:
+    values = column.dropna().to_numpy()
+    # Ties: any rank between the first and last occurrence of approx counts as exact
+    low, high = (values < approx).mean(), (values <= approx).mean()
+    return max(low - 0.5, 0.5 - high, 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, "source.csv")
+        streamed = os.path.join(workdir, "cleaned.csv")
+        make_dataset(source, args.rows)
+        print(f"dataset: {args.rows} rows, {os.path.getsize(source) / 1e6:.0f} MB on disk")
+
+        def in_memory():
+            df, encodings = clean_dataframe(pd.read_csv(source))
+            df.to_csv(os.path.join(workdir, "in_memory.csv"), index=False)
+            return df, encodings
+
+        (expected, expected_encodings), mem_s, mem_peak = measure(in_memory)
+        (_, streamed_encodings), stream_s, stream_peak = measure(
+            lambda: clean_csv_streaming(source, streamed, args.chunk_rows))
+        expected_encoded = categorical_columns(expected_encodings)
+        streamed_encoded = categorical_columns(streamed_encodings)
+
+        print(f"{'in-memory':>10} | {mem_s:6.2f} s | peak {mem_peak / 1e6:8.1f} MB")
+        print(f"{'streaming':>10} | {stream_s:6.2f} s | peak {stream_peak / 1e6:8.1f} MB")
+
+        original = pd.read_csv(source)
+        actual = pd.read_csv(streamed)
+        assert expected_encoded == streamed_encoded, (expected_encoded, streamed_encoded)
+        for col, spec in expected_encodings["columns"].items():
+            assert spec.get("dtype") == streamed_encodings["columns"][col].get("dtype"), col
+        for col in expected.columns:
+            if col in expected_encoded or not pd.api.types.is_numeric_dtype(original[col]):
+                same = expected[col].astype(str).to_numpy() == actual[col].astype(str).to_numpy()
+                present = original[col].notna().to_numpy()
+                assert same[present].all(), col
+                if not same.all():
+                    # Only allowed past FrequencySketch capacity, where the mode is estimated
+                    assert original[col].nunique() > 10_000, col
+                    print(f"  mode   {col:>8}: heavy-hitter estimate "
+                          f"({expected[col][~present].iloc[0]} vs {actual[col][~present].iloc[0]})")
+                continue
+            fill = actual[col][original[col].isna()].iloc[0]
+            exact = expected[col][original[col].isna()].iloc[0]
+            print(f"  median {col:>8}: exact {exact:.4f} | sketch {fill:.4f} | "
+                  f"rank error {median_rank_error(original[col], fill):.4%}")
+        print("category codes, exact modes and dtypes identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost of the tracing layer: one span enter/exit with tracing on and off, and
+a real pipeline step (clean_dataframe, which opens two spans) timed both
+ways. A run opens about 40 spans.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_tracing --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from agents.cleaner import clean_dataframe
+from core.tracing import tracer
+
+
+def per_span_us(n: int) -> float:
+    # Inside a node span, like every sub-step of the pipeline
+    with tracer.span("node", agent="Bench"):
+        start = time.perf_counter()
+        for _ in range(n):
+            with tracer.span("bench") as span:
+                span.set(rows=1)
+        return (time.perf_counter() - start) / n * 1e6
+
+
+def clean_ms(df: pd.DataFrame, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        clean_dataframe(df)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--spans", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "amount": np.where(rng.random(args.rows) < 0.05, np.nan, rng.lognormal(3, 1, args.rows)),
+        "segment": rng.choice(["retail", "sme", "corporate", None], args.rows),
+        "age": rng.integers(18, 90, args.rows),
+    })
+
+    for enabled in (False, True):
+        tracer.enabled = enabled
+        span_cost = per_span_us(args.spans)
+        step = clean_ms(df, args.repeat)
+        print(f"tracing {'on ' if enabled else 'off'}: {span_cost:6.2f} us per span | "
+              f"clean_dataframe({args.rows} rows) best of {args.repeat}: {step:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Bytes on the wire and encode time for the events of a typical /ws run under
+each protocol of services/wire.py: legacy JSON text frames, analysis.v2+json
+(column-wise charts, zlib past the threshold) and analysis.v2+msgpack.
+
+Run from ai-data-analysis-system/backend:
+    python -m benchmarks.bench_wire --rows 200000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_chart_payload import make_frame
+from services.chart_data import build_chart, lttb
+from services.wire import PROTOCOL_JSON, PROTOCOL_V2_JSON, PROTOCOL_V2_MSGPACK, columnar, decode, encode, msgpack
+
+
+def run_events(rows: int) -> list[dict]:
+    """Roughly the events one analysis streams, with real chart payloads."""
+    df = make_frame(rows, extra_columns=0)
+    categories = {"segment": ["corporate", "public", "retail", "sme"]}
+    events = [{"type": "run_started", "run_id": "0" * 32}]
+    for agent in ("Orchestrator", "PrivacyAgent", "CleanerAgent", "ModelerAgent", "EDAAgent",
+                  "AnalystAgent", "VisualizerAgent"):
+        events.append({"type": "agent_state", "agent": agent, "status": "loading",
+                       "description": f"{agent} is working..."})
+        events.append({"type": "agent_state", "agent": agent, "status": "done",
+                       "description": f"{agent} finished.", "started_ms": 10.0, "finished_ms": 250.0,
+                       "duration_ms": 240.0})
+    for i, name in enumerate(["Random Forest", "Gradient Boosting", "Logistic Regression", "SVM",
+                              "KNN", "Decision Tree", "Extra Trees", "Ridge"]):
+        events.append({"type": "model_score", "model": name, "score": 0.8 + i / 100, "metric_name": "Accuracy",
+                       "rows": rows, "partial": False, "fit_seconds": 1.5, "error": None})
+    events.append({"type": "visualization_array", "configs": [
+        build_chart(df, "segment", "amount", "bar_chart", categories=categories),
+        build_chart(df, "amount", "amount", "bar_chart"),
+        build_chart(df, "t", "signal", "line_chart"),
+    ]})
+    y = df["signal"].to_numpy()
+    keep = lttb(np.arange(len(y), dtype=np.float64), y, 200)
+    events.append({"type": "visualization_array", "configs": [{
+        "type": "line_chart", "title": "Actual vs predicted", "xKey": "sample", "yKey": "actual",
+        "data": [{"sample": int(i), "actual": round(float(y[i]), 4), "predicted": round(float(y[i]) * 0.97, 4)}
+                 for i in keep],
+    }]})
+    events.append({"type": "conclusion", "text": "The strongest driver of the target is amount. " * 40})
+    events.append({"type": "timeline", "agents": {}, "critical_path": ["Orchestrator", "ModelerAgent"],
+                   "total_ms": 5000.0})
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    events = run_events(args.rows)
+    protocols = [PROTOCOL_JSON, PROTOCOL_V2_JSON] + ([PROTOCOL_V2_MSGPACK] if msgpack is not None else [])
+    baseline = None
+    for protocol in protocols:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            frames = [encode(event, protocol) for event in events]
+        encode_ms = (time.perf_counter() - start) / args.repeat * 1000
+        size = sum(len(f.encode()) if isinstance(f, str) else len(f) for f in frames)
+        binary = sum(not isinstance(f, str) for f in frames)
+        for event, frame in zip(events, frames):
+            expected = event if protocol == PROTOCOL_JSON else columnar(event)
+            assert decode(frame) == expected, f"{protocol} round trip changed a {event['type']} event"
+        baseline = baseline or size
+        print(f"{protocol:>20}: {size:7d} B ({size / baseline:5.1%}) in {len(frames)} frames "
+              f"({binary} binary), encode {encode_ms:6.2f} ms/run")
+
+
+if __name__ == "__main__":
+    main()
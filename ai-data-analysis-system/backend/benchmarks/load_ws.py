@@ -0,0 +1,100 @@
+"""
+Load test: many simultaneous /ws analyses against a running server.
+
+Each session analyses its own CSV with a distinct row count, so a session that
+receives another run's data shows up as a num_samples mismatch in its
+model_report. Reports throughput, latency percentiles and correctness.
+
+Start the server first (from ai-data-analysis-system/backend):
+    uvicorn main:app --port 8000
+then:
+    python -m benchmarks.load_ws --sessions 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import websockets
+
+
+def make_dataset(path: str, rows: int, seed: int):
+    rng = np.random.default_rng(seed)
+    x1 = rng.normal(size=rows)
+    x2 = rng.normal(size=rows)
+    pd.DataFrame({
+        "Email": [f"user_{seed}_{i}@example.com" for i in range(rows)],
+        "Feature1": x1,
+        "Feature2": x2,
+        "Segment": rng.choice(["a", "b", "c"], rows),
+        "Label": (x1 + x2 > 0).astype(int),
+    }).to_csv(path, index=False)
+
+
+async def run_session(url: str, csv_path: str, expected_rows: int) -> dict:
+    start = time.perf_counter()
+    result = {"expected_rows": expected_rows, "ok": False, "error": None}
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"task": "Predict Label", "csv_file_path": csv_path}))
+        while True:
+            event = json.loads(await ws.recv())
+            if event["type"] == "model_report":
+                result["num_samples"] = event.get("num_samples")
+            elif event["type"] == "error":
+                result["error"] = event.get("message")
+            elif event["type"] == "done":
+                break
+    result["seconds"] = time.perf_counter() - start
+    result["ok"] = result["error"] is None and result.get("num_samples") == expected_rows
+    return result
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory(dir=args.data_dir) as workdir:
+        jobs = []
+        for i in range(args.sessions):
+            rows = args.base_rows + i * 7
+            path = os.path.abspath(os.path.join(workdir, f"load_{i}.csv"))
+            make_dataset(path, rows, seed=i)
+            jobs.append((path, rows))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(run_session(args.url, path, rows) for path, rows in jobs),
+            return_exceptions=True,
+        )
+        elapsed = time.perf_counter() - start
+
+    finished = [r for r in results if isinstance(r, dict)]
+    failures = [r for r in results if not isinstance(r, dict) or not r["ok"]]
+    latencies = sorted(r["seconds"] for r in finished)
+
+    print(f"sessions      : {args.sessions}")
+    print(f"wall time     : {elapsed:.2f} s")
+    print(f"throughput    : {len(finished) / elapsed * 60:.1f} analyses/min")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"latency p50   : {statistics.median(latencies):.2f} s")
+        print(f"latency p95   : {p95:.2f} s")
+    print(f"correct       : {args.sessions - len(failures)}/{args.sessions}")
+    for failure in failures:
+        print(f"  FAILED: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--base-rows", type=int, default=2000)
+    parser.add_argument("--data-dir", default="uploads",
+                        help="Where to write the test CSVs; must be readable by the server")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
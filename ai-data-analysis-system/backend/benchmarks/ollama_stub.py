@@ -0,0 +1,91 @@
+"""
+Minimal stand-in for the Ollama HTTP API (POST /api/generate), so the LLM
+layer can be exercised without a model. Every generation sleeps for a fixed
+latency and answers the agents' prompts with plausible output:
+
+* target detection: the last column of the schema,
+* chart mapping: the first two columns,
+* anything else: a short plain-text summary.
+
+Run standalone and point the backend at it:
+    python -m benchmarks.ollama_stub --port 11500 --latency 0.5
+    OLLAMA_BASE_URL=http://127.0.0.1:11500 uvicorn main:app
+"""
+import argparse
+import ast
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def answer(prompt: str) -> str:
+    schema = re.search(r"columns and types: (\{.*?\})\n", prompt)
+    if schema:
+        target = list(json.loads(schema.group(1)))[-1]
+        return json.dumps({"target": target, "task_type": "classification"})
+    columns = re.search(r"Columns: (\[.*?\])\n", prompt)
+    if columns:
+        names = ast.literal_eval(columns.group(1))
+        return json.dumps({"xKey": names[0], "yKey": names[min(1, len(names) - 1)], "type": "bar_chart"})
+    return "Executive summary: the recommended model performed best on the held-out data."
+
+
+class OllamaStub(BaseHTTPRequestHandler):
+    latency = 0.5
+    requests = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        with OllamaStub._lock:
+            OllamaStub.requests += 1
+        time.sleep(self.latency)
+        message = {
+            "model": body.get("model"),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": answer(body.get("prompt", "")),
+            "done": True,
+            "done_reason": "stop",
+        }
+        if body.get("stream", True):
+            # The client reads newline-delimited JSON chunks
+            payload = (json.dumps(message) + "\n").encode()
+            content_type = "application/x-ndjson"
+        else:
+            payload = json.dumps(message).encode()
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port: int = 0, latency: float = 0.5) -> tuple[ThreadingHTTPServer, str]:
+    """Starts the stub on a background thread; returns the server and its base URL."""
+    OllamaStub.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", port), OllamaStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    server, url = serve(args.port, args.latency)
+    print(f"Ollama stub listening on {url} ({args.latency}s per generation)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,33 @@
+"""
+Progress events emitted while a run is streaming.
+
+run_analysis_stream binds a sink (event loop + queue) for each run; nodes and
+the services they call can then emit_event() from any thread and the event is
+forwarded to that run's WebSocket.
+"""
+import asyncio
+from contextvars import ContextVar
+from typing import Optional
+
+_event_sink: ContextVar[Optional[tuple]] = ContextVar("event_sink", default=None)
+
+
+def bind_event_sink(loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+    """Binds the sink in the current context. Returns a token for unbind."""
+    return _event_sink.set((loop, queue))
+
+
+def unbind_event_sink(token):
+    _event_sink.reset(token)
+
+
+def emit_event(event: dict):
+    """
+    Queues an event for the current run. A no-op outside of a run.
+    Safe to call from worker threads as long as the context was propagated.
+    """
+    sink = _event_sink.get()
+    if sink is None:
+        return
+    loop, queue = sink
+    loop.call_soon_threadsafe(queue.put_nowait, event)
@@ -1,8 +1,17 @@
 import asyncio
+import contextvars
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import TypedDict, Optional, AsyncGenerator
 from langgraph.graph import StateGraph, END
 
 from core.state import AgentState
+from core.events import bind_event_sink, unbind_event_sink, emit_event
+from core.tracing import tracer
+from services.artifacts import artifact_store
+from services.runs import run_manager, RunQueueFull
 
 # Import agent nodes
 from agents.orchestrator import orchestrator_node
@@ -10,26 +19,83 @@ from agents.privacy_agent import privacy_node
 from agents.cleaner import cleaner_node
 from agents.modeler import modeler_node
 from agents.analyst import analyst_node
-from agents.visualizer import visualizer_node
+from agents.visualizer import eda_chart_node, visualizer_node
+
+# The agents are blocking pandas/sklearn code, so they run on a bounded pool
+# instead of the event loop that serves every WebSocket and HTTP request
+NODE_WORKERS = int(os.getenv("NODE_WORKERS", "4"))
+_node_pool = ThreadPoolExecutor(max_workers=NODE_WORKERS, thread_name_prefix="agent-node")
+
+# perf_counter() at the start of the current run; node timings are relative to it
+_run_started: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("run_started", default=None)
+
+def _ms_since(origin: float, now: float) -> float:
+    return round((now - origin) * 1000, 1)
+
+def _offloaded(name: str, node_fn):
+    """
+    Wraps a synchronous agent node so it runs on the node pool and reports
+    real start / finish progress events for the current run.
+    """
+    def traced(state: AgentState):
+        # Root span of the node; the sub-steps inside inherit its agent
+        with tracer.span("node", agent=name):
+            return node_fn(state)
+
+    async def run_node(state: AgentState):
+        start = time.perf_counter()
+        origin = _run_started.get() or start
+        emit_event({"type": "agent_state", "agent": name, "status": "processing",
+                    "started_ms": _ms_since(origin, start)})
+        loop = asyncio.get_running_loop()
+        # Propagate the run's context so the node can emit events too
+        ctx = contextvars.copy_context()
+        try:
+            result = await loop.run_in_executor(_node_pool, ctx.run, traced, state)
+        except Exception as e:
+            end = time.perf_counter()
+            emit_event({"type": "agent_state", "agent": name, "status": "failed", "error": str(e),
+                        "started_ms": _ms_since(origin, start), "finished_ms": _ms_since(origin, end),
+                        "duration_ms": _ms_since(start, end)})
+            raise
+        end = time.perf_counter()
+        emit_event({"type": "agent_state", "agent": name, "status": "completed",
+                    "started_ms": _ms_since(origin, start), "finished_ms": _ms_since(origin, end),
+                    "duration_ms": _ms_since(start, end)})
+        return result
+    return run_node
+
+# Each agent and the agents whose output it needs. Agents with no path between
+# them run concurrently: the EDA chart only needs the cleaned data, the
+# narrative and the model charts only need the model results.
+#
+#   Orchestrator -> PrivacyAgent -> CleanerAgent -+-> ModelerAgent -+-> AnalystAgent ----+
+#                                                 |                 +-> VisualizerAgent -+-> END
+#                                                 +-> EDAAgent --------------------------+
+PIPELINE = {
+    "Orchestrator": (orchestrator_node, []),
+    "PrivacyAgent": (privacy_node, ["Orchestrator"]),
+    "CleanerAgent": (cleaner_node, ["PrivacyAgent"]),
+    "ModelerAgent": (modeler_node, ["CleanerAgent"]),
+    "EDAAgent": (eda_chart_node, ["CleanerAgent"]),
+    "AnalystAgent": (analyst_node, ["ModelerAgent"]),
+    "VisualizerAgent": (visualizer_node, ["ModelerAgent"]),
+}
 
 # Build the Graph
 workflow = StateGraph(AgentState)
-
-workflow.add_node("Orchestrator", orchestrator_node)
-workflow.add_node("PrivacyAgent", privacy_node)
-workflow.add_node("CleanerAgent", cleaner_node)
-workflow.add_node("ModelerAgent", modeler_node)
-workflow.add_node("AnalystAgent", analyst_node)
-workflow.add_node("VisualizerAgent", visualizer_node)
+for name, (node_fn, _) in PIPELINE.items():
+    workflow.add_node(name, _offloaded(name, node_fn))
 
 # Define edges
 workflow.set_entry_point("Orchestrator")
-workflow.add_edge("Orchestrator", "PrivacyAgent")
-workflow.add_edge("PrivacyAgent", "CleanerAgent")
-workflow.add_edge("CleanerAgent", "ModelerAgent")
-workflow.add_edge("ModelerAgent", "AnalystAgent")
-workflow.add_edge("AnalystAgent", "VisualizerAgent")
-workflow.add_edge("VisualizerAgent", END)
+for name, (_, needs) in PIPELINE.items():
+    if needs:
+        # A list waits for every upstream agent
+        workflow.add_edge(needs[0] if len(needs) == 1 else needs, name)
+# Join: the run ends once every branch has finished
+_sinks = [name for name in PIPELINE if not any(name in needs for _, needs in PIPELINE.values())]
+workflow.add_edge(_sinks, END)
 
 # Compile
 app = workflow.compile()
@@ -37,53 +103,142 @@ app = workflow.compile()
 async def run_analysis_stream(task: str, csv_file_path: str = None) -> AsyncGenerator[dict, None]:
     """
     Runs the compiled LangGraph and yields streaming status dicts for the frontend WebSocket.
+    Each call is an isolated run with its own id and workspace; when all run
+    slots are taken it waits in the RunManager queue first.
     """
-    state: AgentState = {
-        "task": task,
-        "csv_file_path": csv_file_path,
-        "masked_data_preview": None,
-        "analysis_result": None,
-        "recharts_config": None,
-        "logs": []
-    }
-    
-    # Run the graph asynchronously and stream the state updates
-    async for output in app.astream(state):
-        node_name = list(output.keys())[0]
-        
-        # Yield the current processing status
+    run_id = uuid.uuid4().hex
+    if run_manager.saturated:
+        yield {"type": "queued", "run_id": run_id, "position": run_manager.waiting + 1}
+
+    try:
+        async with run_manager.slot(run_id) as workspace_dir:
+            yield {"type": "run_started", "run_id": run_id}
+            state: AgentState = {
+                "task": task,
+                "run_id": run_id,
+                "workspace_dir": workspace_dir,
+                "csv_file_path": csv_file_path,
+                "data_ref": None,
+                "masked_data_preview": None,
+                "analysis_result": None,
+                "recharts_config": None,
+                "logs": []
+            }
+            try:
+                async for event in _stream_graph(state):
+                    yield event
+            finally:
+                # Frames only live as long as their run
+                artifact_store.release(run_id)
+    except RunQueueFull as e:
+        yield {"type": "error", "run_id": run_id, "message": f"Server busy, try again later ({e})."}
+
+async def _stream_graph(state: AgentState) -> AsyncGenerator[dict, None]:
+    """
+    Runs the graph in a background task and yields the progress events emitted
+    by the nodes interleaved with the artifacts of each finished node.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for output in app.astream(state):
+                queue.put_nowait(output)
+        finally:
+            queue.put_nowait(done)
+
+    # The task copies the context at creation, so the sink is bound only for it
+    token = bind_event_sink(loop, queue)
+    trace_token = tracer.bind_run(state["run_id"])
+    started_token = _run_started.set(time.perf_counter())
+    try:
+        graph_task = asyncio.create_task(pump())
+    finally:
+        _run_started.reset(started_token)
+        trace = tracer.unbind_run(trace_token)
+        unbind_event_sink(token)
+
+    timings = {}
+
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if "type" in item:
+                # An event emitted by a node (agent_state, model_score, ...)
+                if item["type"] == "agent_state" and "finished_ms" in item:
+                    timings[item["agent"]] = {k: item[k] for k in ("started_ms", "finished_ms", "duration_ms")}
+                yield item
+                continue
+            for node_name, update in item.items():
+                for event in _artifact_events(node_name, update or {}):
+                    yield event
+        # Surface graph errors to the caller
+        await graph_task
         yield {
-            "type": "agent_state",
-            "agent": node_name,
-            "status": "processing",
+            "type": "timeline",
+            "agents": timings,
+            "critical_path": critical_path(timings),
+            "total_ms": max((t["finished_ms"] for t in timings.values()), default=0.0),
         }
-        
-        # Simulate processing delay to allow the frontend "thinking" UI state to be readable
-        await asyncio.sleep(1)
-        
-        # Yield specific artifacts when specific agents complete
-        if node_name == "ModelerAgent":
-            metrics = output[node_name].get("model_metrics", {})
-            yield {
-                "type": "model_report",
-                "best_model_name": metrics.get("best_model_name", "Unknown"),
-                "best_accuracy": metrics.get("best_accuracy", 0),
-                "task_type": metrics.get("task_type", "unknown"),
-                "metric_name": metrics.get("metric_name", "Score"),
-                "all_model_scores": metrics.get("all_model_scores", {}),
-                "target_column": metrics.get("target_column", ""),
-                "num_features": metrics.get("num_features", 0),
-                "num_samples": metrics.get("num_samples", 0),
-            }
+    finally:
+        if not graph_task.done():
+            graph_task.cancel()
+        # Failed and abandoned runs are written too; they are the ones worth a look
+        trace_path = tracer.save_run(trace)
+        if trace_path:
+            print(f"[Tracing] Run trace written to {trace_path}")
 
-        if node_name == "AnalystAgent":
-            yield {
-                "type": "conclusion",
-                "text": output[node_name].get("analysis_result", "")
-            }
-            
-        if node_name == "VisualizerAgent":
-            yield {
-                "type": "visualization_array",
-                "configs": output[node_name].get("recharts_configs", [])
-            }
+def critical_path(timings: dict) -> list[str]:
+    """
+    The chain of agents that set the run's wall time: starting from the last
+    agent to finish, repeatedly step to the upstream agent that finished last.
+    """
+    if not timings:
+        return []
+    node = max(timings, key=lambda n: timings[n]["finished_ms"])
+    path = [node]
+    while True:
+        needs = [n for n in PIPELINE[node][1] if n in timings]
+        if not needs:
+            break
+        node = max(needs, key=lambda n: timings[n]["finished_ms"])
+        path.append(node)
+    return path[::-1]
+
+def _artifact_events(node_name: str, update: dict):
+    # Yield specific artifacts when specific agents complete
+    if node_name == "ModelerAgent":
+        metrics = update.get("model_metrics", {})
+        yield {
+            "type": "model_report",
+            "best_model_name": metrics.get("best_model_name", "Unknown"),
+            "best_accuracy": metrics.get("best_accuracy", 0),
+            "task_type": metrics.get("task_type", "unknown"),
+            "metric_name": metrics.get("metric_name", "Score"),
+            "all_model_scores": metrics.get("all_model_scores", {}),
+            "subsampled_scores": metrics.get("subsampled_scores", {}),
+            "target_column": metrics.get("target_column", ""),
+            "num_features": metrics.get("num_features", 0),
+            "num_samples": metrics.get("num_samples", 0),
+            "search": metrics.get("search"),
+            "substitutions": metrics.get("substitutions", []),
+            "cache": metrics.get("cache"),
+            "registry": metrics.get("registry"),
+        }
+
+    if node_name == "AnalystAgent":
+        yield {
+            "type": "conclusion",
+            "text": update.get("analysis_result", "")
+        }
+        
+    if node_name in ("EDAAgent", "VisualizerAgent"):
+        # Each branch streams its own charts as soon as it finishes
+        yield {
+            "type": "visualization_array",
+            "configs": update.get("recharts_configs", [])
+        }
@@ -1,15 +1,27 @@
-from typing import TypedDict, Optional
+import operator
+from typing import Annotated, TypedDict, Optional
 
 class AgentState(TypedDict):
     task: str
+    run_id: str
+    # Scratch directory owned by this run only
+    workspace_dir: Optional[str]
     csv_file_path: Optional[str]
-    masked_csv_path: Optional[str]
+    # Schema / row count sniffed while the file was uploaded
+    dataset_profile: Optional[dict]
+    # ArtifactStore reference of the current working DataFrame
+    data_ref: Optional[str]
     masked_data_preview: Optional[str]
+    # Columns the PrivacyAgent replaced with tokens
+    masked_columns: Optional[list[str]]
     cleaning_report: Optional[str]
+    # Imputation values, dtypes and category maps learned by the cleaner
+    encodings: Optional[dict]
     model_metrics: Optional[dict]
     target_column: Optional[str]
     best_model_name: Optional[str]
     best_accuracy: Optional[float]
     analysis_result: Optional[str]
-    recharts_configs: list[dict]
-    logs: list[str]
+    # Written by parallel branches: nodes return only their new items, which are appended
+    recharts_configs: Annotated[list[dict], operator.add]
+    logs: Annotated[list[str], operator.add]
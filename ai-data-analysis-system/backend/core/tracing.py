@@ -0,0 +1,336 @@
+"""
+Spans for the pipeline: one per agent node and one per sub-step inside it
+(read_csv, pii_scan, analyze, impute, each model's CV, each LLM call, ...).
+
+    with tracer.span("read_csv") as s:
+        df = pd.read_csv(path)
+        s.set(rows=len(df))
+
+A span records its duration, the rows it processed (when the step sets
+them), whether it raised, and the peak resident memory of the process while
+it was open. That peak is process-wide: with concurrent runs or branches it
+includes their allocations too. It is sampled every TRACE_MEMORY_SAMPLE_MS by
+one background thread that only runs while spans are open.
+
+Spans are aggregated per (agent, span) into the Prometheus text served on
+/metrics. When TRACE_DIR is set, every run additionally writes
+TRACE_DIR/<run_id>.json in the Chrome trace event format, which opens in
+chrome://tracing or https://ui.perfetto.dev.
+
+With TRACING=0, span() hands out a shared no-op object and nothing is
+recorded.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+# Per-run Chrome trace files; empty disables them
+TRACE_DIR = os.getenv("TRACE_DIR", "")
+TRACE_MEMORY_SAMPLE_MS = float(os.getenv("TRACE_MEMORY_SAMPLE_MS", "20"))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+try:
+    # Kept open: a pread is far cheaper than opening the file for every span
+    _STATM_FD = os.open("/proc/self/statm", os.O_RDONLY)
+except OSError:
+    _STATM_FD = None
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (the peak so far where /proc is missing, 0 on Windows)."""
+    if _STATM_FD is not None:
+        return int(os.pread(_STATM_FD, 128, 0).split()[1]) * _PAGE_SIZE
+    try:
+        import resource
+    except ImportError:  # Windows: no memory figures
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class Span:
+    __slots__ = ("name", "agent", "parent", "attrs", "rows", "error", "thread",
+                 "start", "end", "peak_rss", "_token", "_tracer")
+
+    def __init__(self, tracer, name: str, agent: str = None, rows: int = None, attrs: dict = None):
+        self._tracer = tracer
+        self.name = name
+        self.agent = agent
+        self.rows = rows
+        self.attrs = attrs or {}
+        self.parent = None
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.start = self.end = None
+        self.peak_rss = 0
+        self._token = None
+
+    def set(self, rows: int = None, **attrs):
+        if rows is not None:
+            self.rows = rows
+        self.attrs.update(attrs)
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        if self.agent is None and self.parent is not None:
+            self.agent = self.parent.agent
+        self._token = _current_span.set(self)
+        self.peak_rss = current_rss()
+        self._tracer._sampler.watch(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        self._tracer._sampler.unwatch(self)
+        self.peak_rss = max(self.peak_rss, current_rss())
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self._tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    rows = None
+
+    def set(self, rows: int = None, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_run_trace: ContextVar[Optional["RunTrace"]] = ContextVar("run_trace", default=None)
+
+
+class MemorySampler:
+    """Raises peak_rss of every open span to the RSS seen every interval."""
+
+    def __init__(self, interval_ms: float = TRACE_MEMORY_SAMPLE_MS):
+        self.interval = interval_ms / 1000
+        self._open = set()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._parked = False
+
+    def watch(self, span: Span):
+        with self._wakeup:
+            self._open.add(span)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-memory", daemon=True)
+                self._thread.start()
+            elif self._parked:
+                self._parked = False
+                self._wakeup.notify()
+
+    def unwatch(self, span: Span):
+        with self._wakeup:
+            self._open.discard(span)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                # Idle between runs instead of polling /proc
+                while not self._open:
+                    self._parked = True
+                    self._wakeup.wait()
+                spans = list(self._open)
+            rss = current_rss()
+            for span in spans:
+                if rss > span.peak_rss:
+                    span.peak_rss = rss
+            time.sleep(self.interval)
+
+
+class RunTrace:
+    """The finished spans of one run, exported as a Chrome trace."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        threads = {}
+        events = []
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        for span in spans:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            args = {"agent": span.agent, "rows": span.rows,
+                    "peak_rss_mb": round(span.peak_rss / 2**20, 1) if span.peak_rss else None, **span.attrs}
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name, "cat": span.agent or "run", "ph": "X", "pid": pid, "tid": tid,
+                "ts": round((span.start - self.origin) * 1e6, 1), "dur": round(span.seconds * 1e6, 1),
+                "args": {k: v for k, v in args.items() if v is not None},
+            })
+        for name, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"run_id": self.run_id}}
+
+    def write(self, directory: str = TRACE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.chrome_trace(), fh, default=str)
+        os.replace(tmp, path)
+        return path
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class SpanMetrics:
+    """Per (agent, span) aggregates in the Prometheus text exposition format."""
+
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, span: Span):
+        key = (span.agent or "", span.name)
+        seconds = span.seconds
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets),
+                                              "errors": 0, "rows": 0, "peak_rss": 0}
+            series["count"] += 1
+            series["sum"] += seconds
+            # Per-bucket counts here; prometheus() makes them cumulative
+            bucket = bisect.bisect_left(self.buckets, seconds)
+            if bucket < len(self.buckets):
+                series["buckets"][bucket] += 1
+            series["errors"] += span.error is not None
+            series["rows"] += span.rows or 0
+            series["peak_rss"] = max(series["peak_rss"], span.peak_rss)
+
+    def prometheus(self) -> str:
+        with self._lock:
+            items = sorted((key, {**s, "buckets": list(s["buckets"])}) for key, s in self._series.items())
+        lines = [
+            "# HELP analysis_span_duration_seconds Time spent in each pipeline step.",
+            "# TYPE analysis_span_duration_seconds histogram",
+        ]
+        for (agent, name), s in items:
+            labels = f'agent="{_label(agent)}",span="{_label(name)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, s["buckets"]):
+                cumulative += count
+                lines.append(f'analysis_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'analysis_span_duration_seconds_bucket{{{labels},le="+Inf"}} {s["count"]}')
+            lines.append(f"analysis_span_duration_seconds_sum{{{labels}}} {s['sum']:.6f}")
+            lines.append(f"analysis_span_duration_seconds_count{{{labels}}} {s['count']}")
+        for metric, kind, help_text, field in (
+            ("analysis_span_rows_total", "counter", "Rows processed by each pipeline step.", "rows"),
+            ("analysis_span_errors_total", "counter", "Pipeline steps that raised.", "errors"),
+            ("analysis_span_peak_rss_bytes", "gauge", "Highest process RSS seen during each pipeline step.",
+             "peak_rss"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for (agent, name), s in items:
+                lines.append(f'{metric}{{agent="{_label(agent)}",span="{_label(name)}"}} {s[field]}')
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    def __init__(self, enabled: bool = TRACING_ENABLED, trace_dir: str = TRACE_DIR,
+                 sample_ms: float = TRACE_MEMORY_SAMPLE_MS):
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.metrics = SpanMetrics()
+        self._sampler = MemorySampler(sample_ms)
+
+    def span(self, name: str, agent: str = None, rows: int = None, **attrs):
+        """A span for the enclosed block; agent defaults to the enclosing span's."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, agent, rows, attrs)
+
+    def record(self, name: str, seconds: float, rows: int = None, error: str = None, **attrs):
+        """
+        Records a step that was timed elsewhere (e.g. in a worker process) as
+        a span ending now. It has no memory figure.
+        """
+        if not self.enabled:
+            return
+        span = Span(self, name, rows=rows, attrs=attrs)
+        span.error = error
+        parent = _current_span.get()
+        span.parent = parent
+        span.agent = parent.agent if parent is not None else None
+        span.end = time.perf_counter()
+        span.start = span.end - seconds
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        self.metrics.observe(span)
+        trace = _run_trace.get()
+        if trace is not None:
+            trace.add(span)
+
+    def bind_run(self, run_id: str):
+        """
+        Collects the spans of the current context, and of tasks and threads
+        that copy it, into a new RunTrace. Returns a token for unbind_run.
+        """
+        if not self.enabled:
+            return None
+        return _run_trace.set(RunTrace(run_id))
+
+    def unbind_run(self, token) -> Optional[RunTrace]:
+        """Unbinds the run's trace and returns it; spans already bound elsewhere keep landing in it."""
+        if token is None:
+            return None
+        trace = _run_trace.get()
+        _run_trace.reset(token)
+        return trace
+
+    def save_run(self, trace: Optional[RunTrace]) -> Optional[str]:
+        """Writes the trace to trace_dir, when set, and returns the path."""
+        if trace is None or not self.trace_dir:
+            return None
+        try:
+            return trace.write(self.trace_dir)
+        except OSError as e:
+            print(f"[Tracing] Could not write the trace of run {trace.run_id}: {e}")
+            return None
+
+    def prometheus(self) -> str:
+        return self.metrics.prometheus()
+
+
+tracer = Tracer()
@@ -1,12 +1,58 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 import json
 import asyncio
 import os
-import shutil
+import pandas as pd
 from core.graph import run_analysis_stream
+from core.tracing import tracer
+from services.privacy import privacy_service
+from services.runs import run_manager
+from services.model_cache import model_cache
+from services.model_registry import model_registry, ModelNotFound
+from services.llm import llm_service
+from services.wire import negotiate, EventSender, SlowClient
+from services.uploads import (
+    UPLOAD_DIR, MAX_UPLOAD_BYTES, UploadTooLarge, UploadOffsetMismatch, safe_filename,
+    stream_to_disk, upload_file_chunks, save_profile, resumable_uploads,
+)
+
+# Load the Presidio analyzer in the background at startup so the first
+# analysis does not pay for it. Set PRIVACY_WARMUP=0 to load on first use only.
+PRIVACY_WARMUP = os.getenv("PRIVACY_WARMUP", "1") == "1"
+
+async def _warm_up_privacy():
+    try:
+        await asyncio.to_thread(privacy_service.warm_up)
+    except Exception as e:
+        print(f"Privacy engine warm-up failed, will retry on first use: {e}")
 
-app = FastAPI(title="AI Data Analysis System Orchestrator")
+# Resumable uploads untouched for this long are abandoned
+PARTIAL_UPLOAD_TTL_SECONDS = int(os.getenv("PARTIAL_UPLOAD_TTL_SECONDS", "86400"))
+
+async def _sweep_partial_uploads(interval_seconds: int = 600):
+    while True:
+        removed = resumable_uploads.cleanup_stale(PARTIAL_UPLOAD_TTL_SECONDS)
+        if removed:
+            print(f"Removed {removed} abandoned partial uploads")
+        await asyncio.sleep(interval_seconds)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_task = asyncio.create_task(_warm_up_privacy()) if PRIVACY_WARMUP else None
+    sweeper_tasks = [
+        asyncio.create_task(run_manager.sweep_forever()),
+        asyncio.create_task(_sweep_partial_uploads()),
+    ]
+    yield
+    for task in sweeper_tasks:
+        task.cancel()
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+
+app = FastAPI(title="AI Data Analysis System Orchestrator", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,22 +62,184 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-os.makedirs("uploads", exist_ok=True)
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+def _too_large(request: Request) -> bool:
+    length = request.headers.get("content-length")
+    return length is not None and length.isdigit() and int(length) > MAX_UPLOAD_BYTES
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    file_location = f"uploads/{file.filename}"
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
-    return {"info": f"file '{file.filename}' saved at '{file_location}'", "path": file_location}
+async def upload_file(request: Request, file: UploadFile = File(...)):
+    if _too_large(request):
+        raise HTTPException(status_code=413, detail="Upload too large")
+    file_location = os.path.join(UPLOAD_DIR, safe_filename(file.filename))
+    try:
+        sniffer = await stream_to_disk(upload_file_chunks(file), file_location)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    profile = sniffer.finish()
+    await asyncio.to_thread(save_profile, file_location, profile)
+    return {"info": f"file '{file.filename}' saved at '{file_location}'", "path": file_location, "schema": profile}
+
+@app.put("/upload/stream")
+async def upload_stream(request: Request, filename: str):
+    """Raw request body upload, streamed straight to disk (no multipart spooling)"""
+    if _too_large(request):
+        raise HTTPException(status_code=413, detail="Upload too large")
+    file_location = os.path.join(UPLOAD_DIR, safe_filename(filename))
+    try:
+        sniffer = await stream_to_disk(request.stream(), file_location)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    profile = sniffer.finish()
+    await asyncio.to_thread(save_profile, file_location, profile)
+    return {"path": file_location, "schema": profile}
+
+@app.get("/upload/resumable/{upload_id}")
+async def resumable_offset(upload_id: str):
+    """Where a resumable upload should continue from"""
+    try:
+        return {"upload_id": upload_id, "offset": resumable_uploads.offset(upload_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.put("/upload/resumable/{upload_id}")
+async def resumable_append(request: Request, upload_id: str, offset: int = 0,
+                           filename: str = "upload.csv", final: bool = False):
+    """
+    Appends the request body at the given offset. Send final=true with the last
+    chunk to get the stored path and schema back.
+    """
+    try:
+        new_offset = await resumable_uploads.append(upload_id, offset, request.stream())
+        if not final:
+            return {"upload_id": upload_id, "offset": new_offset}
+        file_location, profile = await resumable_uploads.complete(upload_id, filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError:
+        # Removed as stale, or completed by a concurrent request
+        raise HTTPException(status_code=404, detail=f"Unknown upload '{upload_id}'")
+    except UploadOffsetMismatch as e:
+        return JSONResponse({"upload_id": upload_id, "offset": e.expected, "detail": str(e)}, status_code=409)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"upload_id": upload_id, "path": file_location, "schema": profile}
 
 @app.get("/")
 async def root():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the Presidio analyzer is loaded, 503 before"""
+    body = {
+        "ready": privacy_service.is_ready,
+        "analyzer_loaded": privacy_service.is_ready,
+        "analyzer_load_seconds": privacy_service.analyzer_load_seconds,
+    }
+    return JSONResponse(body, status_code=200 if privacy_service.is_ready else 503)
+
+@app.get("/runs")
+async def runs_stats():
+    """Active / queued analyses"""
+    return run_manager.stats()
+
+@app.get("/privacy/ledger")
+async def ledger_stats():
+    """Memory footprint and hit-rate of the masking ledger"""
+    return privacy_service.masking_ledger.stats()
+
+@app.get("/models/cache")
+async def model_cache_stats():
+    """Size and hit-rate of the fitted-model cache"""
+    return await asyncio.to_thread(model_cache.stats)
+
+@app.get("/llm")
+async def llm_stats():
+    """Ollama calls made and prompt-cache hit-rate"""
+    return await asyncio.to_thread(llm_service.stats)
+
+@app.get("/metrics")
+async def metrics():
+    """Per-agent / per-step span timings, rows and peak memory in the Prometheus text format"""
+    return PlainTextResponse(tracer.prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/models")
+async def list_models():
+    """Registered models with their latest version"""
+    return await asyncio.to_thread(model_registry.list_models)
+
+@app.get("/models/serving")
+async def serving_stats():
+    """Warm models and how well requests are being batched"""
+    return model_registry.stats()
+
+@app.get("/models/{model_id}")
+async def model_versions(model_id: str):
+    try:
+        return {"model_id": model_id, "versions": await asyncio.to_thread(model_registry.versions, model_id)}
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_id}'")
+
+@app.post("/models/{model_id}/predict")
+async def predict(model_id: str, payload: dict, version: int = None):
+    """
+    Scores {"rows": [{column: value, ...}, ...]} of raw (unmasked, uncleaned)
+    data. Concurrent requests are micro-batched into one predict call.
+    """
+    rows = payload.get("rows")
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(status_code=422, detail="Expected a non-empty 'rows' list")
+    try:
+        bundle, predictions = await model_registry.predict(model_id, pd.DataFrame(rows), version)
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_id}'")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"model_id": bundle["model_id"], "version": bundle["version"], "predictions": predictions}
+
+@app.post("/models/{model_id}/predict_csv")
+async def predict_csv(request: Request, model_id: str, version: int = None):
+    """
+    Batch scoring: the raw request body is a CSV, streamed to disk; the
+    response streams the same rows back with a 'prediction' column.
+    """
+    if _too_large(request):
+        raise HTTPException(status_code=413, detail="Upload too large")
+    try:
+        bundle = await asyncio.to_thread(model_registry.load, model_id, version)
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown model '{model_id}'")
+    path = os.path.join(UPLOAD_DIR, safe_filename("score.csv"))
+    try:
+        await stream_to_disk(request.stream(), path)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # Fail before streaming starts rather than halfway through the response
+    header = await asyncio.to_thread(pd.read_csv, path, nrows=0)
+    missing = [col for col in bundle["feature_cols"] if col not in header.columns]
+    if missing:
+        os.remove(path)
+        raise HTTPException(status_code=422, detail=f"Missing feature columns: {missing}")
+
+    def scored_chunks():
+        # Runs on Starlette's thread pool, one chunk in memory at a time
+        try:
+            yield from model_registry.predict_csv(bundle, path)
+        finally:
+            os.remove(path)
+
+    return StreamingResponse(scored_chunks(), media_type="text/csv", headers={
+        "X-Model-Version": f"{bundle['model_id']} v{bundle['version']}",
+    })
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
+    # Clients that ask for no subprotocol keep getting JSON text frames
+    protocol = negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=protocol)
+    sender = EventSender(websocket, protocol)
     try:
         while True:
             data = await websocket.receive_text()
@@ -42,8 +250,14 @@ async def websocket_endpoint(websocket: WebSocket):
             
             # Stream events from the LangGraph pipeline
             async for event in run_analysis_stream(task, csv_file_path):
-                await websocket.send_text(json.dumps(event))
+                await sender.send(event)
             
-            await websocket.send_text(json.dumps({"type": "done"}))
+            await sender.send({"type": "done"})
+            await sender.flush()
+            print(f"WebSocket run sent: {sender.stats()}")
     except WebSocketDisconnect:
         print("Client disconnected from WebSocket")
+    except SlowClient as e:
+        print(f"Dropped slow WebSocket client: {e}")
+    finally:
+        await sender.close()
@@ -0,0 +1,151 @@
+"""
+In-memory artifact store for handing DataFrames between agents.
+
+Each pipeline run parses its CSV once; the frames produced by the agents are
+kept here keyed by run id and passed through AgentState as string references.
+When the resident frames exceed the memory budget, the oldest ones are spilled
+to Parquet in the run's workspace and transparently read back on the next get().
+
+Datasets above STREAMING_THRESHOLD_MB never become a single frame: agents
+process them in chunks of STREAMING_CHUNK_ROWS and register the resulting CSV
+in the workspace as a file artifact (put_file / path).
+"""
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from core.tracing import tracer
+
+# Spill files go into the per-run workspace directories
+ARTIFACT_DIR = os.getenv("RUN_WORKSPACE_DIR", "uploads/runs")
+ARTIFACT_MEMORY_BUDGET_MB = int(os.getenv("ARTIFACT_MEMORY_BUDGET_MB", "2048"))
+STREAMING_THRESHOLD_BYTES = int(os.getenv("STREAMING_THRESHOLD_MB", "1024")) * 1024 * 1024
+STREAMING_CHUNK_ROWS = int(os.getenv("STREAMING_CHUNK_ROWS", "200000"))
+
+
+class ArtifactStore:
+    def __init__(self, root: str = ARTIFACT_DIR, memory_budget_bytes: int = ARTIFACT_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.root = root
+        self.memory_budget_bytes = memory_budget_bytes
+        self._lock = threading.Lock()
+        # ref -> (DataFrame, size in bytes), oldest first
+        self._frames = OrderedDict()
+        # ref -> spill file path
+        self._spilled = {}
+        # ref -> (CSV path, column dtypes) for artifacts produced out of core
+        self._files = {}
+        self._resident_bytes = 0
+
+    @staticmethod
+    def make_ref(run_id: str, name: str) -> str:
+        return f"{run_id}/{name}"
+
+    def put(self, run_id: str, name: str, df: pd.DataFrame) -> str:
+        """
+        Stores df for the run and returns its reference. Consumers must treat
+        the frame as read-only and put() a new artifact for their output.
+        """
+        ref = self.make_ref(run_id, name)
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._drop(ref)
+            self._frames[ref] = (df, size)
+            self._resident_bytes += size
+            self._spill_over_budget(keep=ref)
+        return ref
+
+    def put_file(self, run_id: str, name: str, path: str, dtypes: dict = None) -> str:
+        """
+        Registers a CSV written by a streaming agent and returns its reference.
+        dtypes, if given, are applied whenever the file is read back by get().
+        """
+        ref = self.make_ref(run_id, name)
+        with self._lock:
+            self._drop(ref)
+            self._files[ref] = (path, dtypes)
+        return ref
+
+    def path(self, ref: str):
+        """The CSV behind a file artifact, or None for in-memory frames."""
+        with self._lock:
+            entry = self._files.get(ref)
+        return entry[0] if entry else None
+
+    def get(self, ref: str, columns: list = None) -> pd.DataFrame:
+        """columns, if given, projects the frame; on-disk artifacts then only read those."""
+        with self._lock:
+            if ref in self._frames:
+                self._frames.move_to_end(ref)
+                df = self._frames[ref][0]
+                return df if columns is None else df[columns]
+            path, dtypes = self._files.get(ref) or (self._spilled.get(ref), None)
+        if path is None:
+            raise KeyError(f"Unknown artifact: {ref}")
+        reader = "read_" + (path.rsplit(".", 1)[-1] if path.endswith((".csv", ".parquet")) else "pickle")
+        with tracer.span(reader) as span:
+            if path.endswith(".csv"):
+                df = pd.read_csv(path, dtype=dtypes, usecols=columns)
+            elif path.endswith(".parquet"):
+                df = pd.read_parquet(path, columns=columns)
+            else:
+                df = pd.read_pickle(path)
+            span.set(rows=len(df))
+        # usecols keeps file order; callers get the order they asked for
+        return df if columns is None else df[columns]
+
+    def release(self, run_id: str):
+        """Drops every artifact of a finished run, in memory and on disk."""
+        prefix = f"{run_id}/"
+        with self._lock:
+            for ref in [r for r in list(self._frames) + list(self._spilled) + list(self._files) if r.startswith(prefix)]:
+                self._drop(ref)
+        shutil.rmtree(os.path.join(self.root, run_id), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "resident_artifacts": len(self._frames),
+                "resident_bytes": self._resident_bytes,
+                "spilled_artifacts": len(self._spilled),
+                "file_artifacts": len(self._files),
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+    def _drop(self, ref: str):
+        if ref in self._frames:
+            _, size = self._frames.pop(ref)
+            self._resident_bytes -= size
+        # File artifacts live in the run workspace and go away with it
+        self._files.pop(ref, None)
+        path = self._spilled.pop(ref, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def _spill_over_budget(self, keep: str):
+        # Oldest frames go to disk first; the frame just stored stays resident
+        for ref in list(self._frames):
+            if self._resident_bytes <= self.memory_budget_bytes:
+                break
+            if ref == keep:
+                continue
+            df, size = self._frames.pop(ref)
+            self._spilled[ref] = self._write_spill(ref, df)
+            self._resident_bytes -= size
+            print(f"[ArtifactStore] Spilled {ref} ({size / 1e6:.1f} MB) to disk")
+
+    def _write_spill(self, ref: str, df: pd.DataFrame) -> str:
+        base = os.path.join(self.root, ref)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        try:
+            df.to_parquet(base + ".parquet", index=False)
+            return base + ".parquet"
+        except Exception:
+            # Mixed-type object columns have no Arrow equivalent
+            df.to_pickle(base + ".pkl")
+            return base + ".pkl"
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,222 @@
+"""
+Parallel, budget-aware model search for the ModelerAgent.
+
+Every (candidate, CV fold) pair is an independent fit, so all of them are
+scheduled at once on a joblib (loky) process pool sized by AUTOML_CORES.
+The core budget is shared out explicitly to avoid oversubscription: with W
+pool workers each fit gets AUTOML_CORES // W threads, both for estimators
+with their own n_jobs and for BLAS/OpenMP inside the workers. Fold results
+come back as they finish and a candidate is reported as soon as its last
+fold is in.
+
+On large training sets (AUTOML_HALVING_ROWS and up) the search switches to
+successive halving: all candidates are cross-validated on HALVING_MIN_ROWS
+rows, the best 1/eta move on to eta times more rows, and so on until one is
+left or the rows reach the full training set. Most candidates are dropped
+on small subsamples; the winner is then refit on the full training set by
+the modeler. Both modes stop at the AUTOML_BUDGET_SECONDS wall-clock budget
+and return the best model found so far.
+"""
+import math
+import os
+import time
+from multiprocessing import TimeoutError as PoolTimeoutError
+from typing import Callable
+
+import numpy as np
+from joblib import Parallel, delayed, parallel_config
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import check_cv
+
+# 0 means every core of the machine
+AUTOML_CORES = int(os.getenv("AUTOML_CORES", "0")) or os.cpu_count() or 1
+# "auto" picks halving from AUTOML_HALVING_ROWS training rows; "full" or "halving" force a mode
+AUTOML_SEARCH = os.getenv("AUTOML_SEARCH", "auto")
+AUTOML_HALVING_ROWS = int(os.getenv("AUTOML_HALVING_ROWS", "50000"))
+# 0 disables the budget
+AUTOML_BUDGET_SECONDS = float(os.getenv("AUTOML_BUDGET_SECONDS", "900"))
+HALVING_ETA = 3
+HALVING_MIN_ROWS = 2000
+
+
+def _fit_and_score(name: str, fold: int, estimator, X, y, train, test, scorer) -> tuple[str, int, float, float, str, float]:
+    # Wall-clock start too, comparable across the pool's processes
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        estimator.fit(X[train], y[train])
+        score = float(scorer(estimator, X[test], y[test]))
+        error = None
+    except Exception as e:
+        score, error = 0.0, str(e)
+    return name, fold, score, time.perf_counter() - start, error, started
+
+
+def _limit_inner_jobs(estimator, threads: int):
+    # Only estimators that ask for parallelism; None already means one job
+    params = estimator.get_params()
+    inner = {key: threads for key, value in params.items()
+             if (key == "n_jobs" or key.endswith("__n_jobs")) and value is not None}
+    if inner:
+        estimator.set_params(**inner)
+    return estimator
+
+
+def evaluate_candidates(candidates: dict, X, y, cv: int, scoring: str, cores: int = None,
+                        on_result: Callable[[str, dict], None] = None, deadline: float = None) -> dict[str, dict]:
+    """
+    Cross-validates every candidate and returns {name: result} with the mean
+    score, fold scores, summed fit seconds, wall-clock seconds from its first
+    fold's start to its last fold's end, row count and the error of a failed
+    fit (scored 0.0, like before). on_result(name, result) is called
+    from the calling thread as each candidate completes, in completion order.
+
+    deadline is a time.monotonic() timestamp: once it passes, outstanding fits
+    are abandoned; candidates with only some folds done are scored on those
+    (partial=True) and candidates without any are left out. With a single
+    worker the check happens between fits.
+    """
+    cores = cores or AUTOML_CORES
+    first = next(iter(candidates.values()))
+    splits = list(check_cv(cv, y, classifier=is_classifier(first)).split(X, y))
+    scorer = get_scorer(scoring)
+
+    n_tasks = len(candidates) * len(splits)
+    workers = max(1, min(cores, n_tasks))
+    inner_threads = max(1, cores // workers)
+
+    tasks = [
+        delayed(_fit_and_score)(name, fold, _limit_inner_jobs(clone(estimator), inner_threads), X, y, train, test, scorer)
+        for name, estimator in candidates.items()
+        for fold, (train, test) in enumerate(splits)
+    ]
+
+    pending = {name: {} for name in candidates}
+    results = {}
+    timeout = None if deadline is None else max(1.0, deadline - time.monotonic())
+    with parallel_config(backend="loky", inner_max_num_threads=inner_threads):
+        outputs = Parallel(n_jobs=workers, return_as="generator_unordered", timeout=timeout)(tasks)
+        try:
+            for name, fold, score, seconds, error, started in outputs:
+                pending[name][fold] = (score, seconds, error, started)
+                if len(pending[name]) == len(splits):
+                    results[name] = _summarize(pending.pop(name), len(y))
+                    if on_result is not None:
+                        on_result(name, results[name])
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+        except (TimeoutError, PoolTimeoutError):
+            # A fit outlived the budget; joblib has already stopped the pool
+            pass
+        finally:
+            # Abandons whatever is still queued or running
+            outputs.close()
+
+    # Out of time: candidates with some folds done still count, flagged partial
+    for name, folds in pending.items():
+        if folds:
+            results[name] = _summarize(folds, len(y), partial=True)
+            if on_result is not None:
+                on_result(name, results[name])
+    return results
+
+
+def _summarize(folds: dict, rows: int, partial: bool = False) -> dict:
+    scores = [folds[i][0] for i in sorted(folds)]
+    errors = [folds[i][2] for i in sorted(folds) if folds[i][2]]
+    return {
+        "score": 0.0 if errors else float(np.mean(scores)),
+        "fold_scores": scores,
+        "fit_seconds": round(sum(f[1] for f in folds.values()), 3),
+        "wall_seconds": round(max(f[3] + f[1] for f in folds.values()) - min(f[3] for f in folds.values()), 3),
+        "rows": rows,
+        "error": errors[0] if errors else None,
+        "partial": partial,
+    }
+
+
+def _ranked(results: dict, order: list[str]) -> list[str]:
+    # Failed fits last; ties keep the candidate order, like the sequential loop
+    finished = [name for name in order if name in results]
+    return sorted(finished, key=lambda n: (results[n]["error"] is None, results[n]["score"]), reverse=True)
+
+
+def successive_halving(candidates: dict, X, y, cv: int, scoring: str, eta: int = HALVING_ETA,
+                       min_rows: int = HALVING_MIN_ROWS, cores: int = None,
+                       on_result: Callable[[str, dict], None] = None, deadline: float = None,
+                       random_state: int = 42) -> tuple[dict, list[dict]]:
+    """
+    Successive halving over nested random subsamples of (X, y): min_rows,
+    eta times that, and so on, the last possible round being all of it.
+    Stops once one candidate is left. Returns the latest result of every
+    candidate (with the rows it was scored on, fewer than len(y) unless it
+    reached the last round) and one report entry per round.
+    """
+    n = len(y)
+    n_rounds = 1 + max(0, math.ceil(math.log(n / min_rows) / math.log(eta) - 1e-9))
+    order = np.random.default_rng(random_state).permutation(n)
+    alive = list(candidates)
+    results, rounds = {}, []
+
+    for i in range(n_rounds):
+        rows = min(n, min_rows * eta ** i)
+        subset = np.sort(order[:rows])
+        start = time.perf_counter()
+        round_results = evaluate_candidates({name: candidates[name] for name in alive}, X[subset], y[subset],
+                                            cv, scoring, cores, on_result, deadline)
+        results.update(round_results)
+        ranking = _ranked(round_results, alive)
+        keep = max(1, math.ceil(len(alive) / eta))
+        rounds.append({
+            "rows": rows,
+            "candidates": alive,
+            "promoted": ranking[:keep],
+            "seconds": round(time.perf_counter() - start, 2),
+        })
+        if not ranking or any(r["partial"] for r in round_results.values()) or len(round_results) < len(alive):
+            break
+        alive = ranking[:keep]
+        if len(alive) == 1:
+            break
+    return results, rounds
+
+
+def search_candidates(candidates: dict, X, y, cv: int, scoring: str, mode: str = None,
+                      budget_seconds: float = None, cores: int = None,
+                      on_result: Callable[[str, dict], None] = None) -> tuple[dict, str, dict]:
+    """
+    Runs the model search and returns (results, winner name or None, report).
+    The winner is the best candidate among those scored on the most rows.
+    """
+    mode = mode or AUTOML_SEARCH
+    if mode == "auto":
+        mode = "halving" if len(y) >= AUTOML_HALVING_ROWS else "full"
+    budget_seconds = AUTOML_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    deadline = time.monotonic() + budget_seconds if budget_seconds else None
+
+    start = time.perf_counter()
+    if mode == "halving":
+        results, rounds = successive_halving(candidates, X, y, cv, scoring, cores=cores,
+                                             on_result=on_result, deadline=deadline)
+    else:
+        results = evaluate_candidates(candidates, X, y, cv, scoring, cores, on_result, deadline)
+        rounds = [{"rows": len(y), "candidates": list(candidates), "seconds": round(time.perf_counter() - start, 2)}]
+
+    winner = None
+    if results:
+        most_rows = max(r["rows"] for r in results.values())
+        top = {name: r for name, r in results.items() if r["rows"] == most_rows}
+        ranking = _ranked(top, list(candidates))
+        if top[ranking[0]]["error"] is None:
+            winner = ranking[0]
+
+    report = {
+        "mode": mode,
+        "rounds": rounds,
+        "seconds": round(time.perf_counter() - start, 2),
+        "budget_seconds": budget_seconds or None,
+        "budget_exhausted": deadline is not None and time.monotonic() > deadline,
+        "skipped": [name for name in candidates if name not in results],
+    }
+    return results, winner, report
@@ -0,0 +1,172 @@
+"""
+Chart payloads computed over the whole dataset instead of its first rows.
+
+Whatever the input size, a chart is reduced to at most CHART_MAX_POINTS
+records that carry only the plotted columns:
+
+* bar charts over a categorical or low-cardinality x are a group-by (mean or
+  sum of y, plus the row count), keeping the CHART_MAX_GROUPS largest groups;
+* bar charts over a continuous x are a histogram with automatic binning
+  (numpy's "auto" rule, capped at HISTOGRAM_MAX_BINS), showing the mean of y
+  per bin or the bin counts when x and y are the same column;
+* line charts are drawn through the per-x means when x has few values, and
+  otherwise downsampled with Largest-Triangle-Three-Buckets (LTTB), which
+  keeps the visual shape of the series: peaks, dips and trends.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "200"))
+CHART_MAX_GROUPS = int(os.getenv("CHART_MAX_GROUPS", "30"))
+HISTOGRAM_MAX_BINS = int(os.getenv("HISTOGRAM_MAX_BINS", "50"))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the n_out points Largest-Triangle-Three-Buckets keeps from a
+    series sorted by x. The first and last points are always kept; each
+    bucket in between contributes the point that forms the largest triangle
+    with the previously kept point and the mean of the next bucket.
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _labelled(series: pd.Series, labels: list) -> pd.Series:
+    # Cleaned categoricals are codes; charts show the original categories
+    if not labels:
+        return series
+    return pd.Series(pd.Categorical.from_codes(series.clip(-1, len(labels) - 1).astype(np.int64),
+                                               categories=labels), index=series.index)
+
+
+def _has_few_values(series: pd.Series, limit: int) -> bool:
+    """nunique() <= limit, without hashing every row of a continuous column."""
+    # A prefix that already exceeds the limit settles it cheaply
+    if series.iloc[:100_000].nunique() > limit:
+        return False
+    return series.nunique() <= limit
+
+
+def _plain(values) -> list:
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+def group_by(df: pd.DataFrame, x_key: str, y_key: str, agg: str = "mean",
+             max_groups: int = CHART_MAX_GROUPS) -> list[dict]:
+    """One record per x group (the largest by count): agg of y and the row count, or only the count when y is x."""
+    if x_key == y_key:
+        counts = df[x_key].value_counts(dropna=True).head(max_groups).sort_index()
+        return [{x_key: str(k), "count": int(c)} for k, c in counts.items()]
+    grouped = df.groupby(x_key, observed=True, sort=True)[y_key].agg([agg, "count"])
+    if len(grouped) > max_groups:
+        grouped = grouped.nlargest(max_groups, "count").sort_index()
+    return [
+        {x_key: str(k), y_key: round(float(v), 4), "count": int(c)}
+        for k, v, c in zip(grouped.index, grouped[agg], grouped["count"])
+    ]
+
+
+def histogram(df: pd.DataFrame, x_key: str, y_key: str, max_bins: int = HISTOGRAM_MAX_BINS) -> list[dict]:
+    """Bins x; per bin the mean of y and the row count, or only the count when y is x."""
+    values = df[x_key].to_numpy(dtype=np.float64, na_value=np.nan)
+    present = np.isfinite(values)
+    values = values[present]
+    if values.size == 0:
+        return []
+    low, high = values.min(), values.max()
+    integral = pd.api.types.is_integer_dtype(df[x_key])
+    if integral:
+        # Whole-number bin edges for integer columns, one bar per value when they fit
+        width = max(1, int(np.ceil((high - low + 1) / max_bins)))
+        edges = np.arange(low, high + width + 1, width, dtype=np.float64)
+    else:
+        edges = np.histogram_bin_edges(values, bins="auto")
+        if len(edges) - 1 > max_bins:
+            edges = np.histogram_bin_edges(values, bins=max_bins)
+    # Edges are evenly spaced, so the bin is arithmetic rather than a search
+    bins = np.clip(((values - edges[0]) / (edges[1] - edges[0])).astype(np.int64), 0, len(edges) - 2)
+    counts = np.bincount(bins, minlength=len(edges) - 1)
+    with_y = y_key != x_key
+    if with_y:
+        y = df[y_key].to_numpy(dtype=np.float64, na_value=np.nan)[present]
+        has_y = np.isfinite(y)
+        sums = np.bincount(bins[has_y], weights=y[has_y], minlength=len(counts))
+        y_counts = np.bincount(bins[has_y], minlength=len(counts))
+    records = []
+    for i, count in enumerate(counts):
+        if integral:
+            # Integer bins are inclusive ranges of whole values
+            label = f"{edges[i]:.0f}" if width == 1 else f"{edges[i]:.0f}–{edges[i + 1] - 1:.0f}"
+        else:
+            label = f"{edges[i]:.4g}–{edges[i + 1]:.4g}"
+        record = {x_key: label, "count": int(count)}
+        if with_y:
+            record[y_key] = round(float(sums[i] / y_counts[i]), 4) if y_counts[i] else None
+        records.append(record)
+    return records
+
+
+def line_series(df: pd.DataFrame, x_key: str, y_key: str, max_points: int = CHART_MAX_POINTS) -> list[dict]:
+    """y over x: per-x means when x has few values, otherwise LTTB over the points sorted by x."""
+    data = df[[x_key, y_key]].dropna()
+    if _has_few_values(data[x_key], max_points):
+        means = data.groupby(x_key, sort=True)[y_key].mean()
+        return [{x_key: k, y_key: round(float(v), 4)} for k, v in zip(_plain(means.index), means.to_numpy())]
+    data = data.sort_values(x_key, kind="stable")
+    x = data[x_key].to_numpy(dtype=np.float64)
+    y = data[y_key].to_numpy(dtype=np.float64)
+    keep = lttb(x, y, max_points)
+    return [{x_key: xv, y_key: round(float(yv), 4)} for xv, yv in zip(_plain(x[keep]), y[keep])]
+
+
+def build_chart(df: pd.DataFrame, x_key: str, y_key: str, chart_type: str = "bar_chart", agg: str = "mean",
+                categories: dict = None) -> dict:
+    """
+    Recharts config for y vs x over all rows of df. categories maps columns
+    stored as category codes to their labels (from the cleaner encodings).
+    The config's yKey may become "count" when there is no numeric y to show.
+    """
+    categories = categories or {}
+    agg = agg if agg in ("mean", "sum") else "mean"
+    df = df[list(dict.fromkeys([x_key, y_key]))]
+    x_categorical = x_key in categories or not pd.api.types.is_numeric_dtype(df[x_key])
+    y_numeric = y_key != x_key and y_key not in categories and pd.api.types.is_numeric_dtype(df[y_key])
+    if x_key in categories:
+        df = df.assign(**{x_key: _labelled(df[x_key], categories[x_key])})
+
+    if chart_type == "line_chart" and not x_categorical and y_numeric:
+        data = line_series(df, x_key, y_key)
+        title = f"{y_key} over {x_key}"
+        if not _has_few_values(df[x_key], CHART_MAX_POINTS):
+            title += f" (LTTB, {len(data)} of {len(df)} points)"
+        return {"type": "line_chart", "title": title, "data": data, "xKey": x_key, "yKey": y_key}
+
+    # Without a numeric y (or with y == x) the bars are row counts
+    y_key = y_key if y_numeric else x_key
+    if x_categorical or _has_few_values(df[x_key], CHART_MAX_GROUPS):
+        data = group_by(df, x_key, y_key, agg)
+        if y_numeric:
+            title = f"{agg.capitalize()} {y_key} by {x_key}"
+        else:
+            title = f"Rows per {x_key}"
+    else:
+        data = histogram(df, x_key, y_key)
+        title = f"Mean {y_key} across {x_key} bins" if y_numeric else f"Distribution of {x_key}"
+    return {"type": "bar_chart", "title": title, "data": data, "xKey": x_key, "yKey": y_key if y_numeric else "count"}
@@ -0,0 +1,128 @@
+"""
+Column encodings learned by the CleanerAgent.
+
+An encodings dict records, per column, the imputation value and how the
+column is stored afterwards, so the exact same transformation can be applied
+to another chunk of the file or to new rows at inference time:
+
+    {"columns": {
+        "age":     {"kind": "numeric", "fill": 41.0, "dtype": "int8"},
+        "segment": {"kind": "categorical", "fill": "retail", "categories": ["corporate", "retail"]},
+        "comment": {"kind": "text", "fill": "n/a"},
+    }}
+
+Numeric columns are downcast to the smallest dtype that holds every value
+exactly; text columns with few distinct values become category codes in
+sorted order (the same codes LabelEncoder assigns). Unknown categories map
+to -1.
+"""
+import numpy as np
+import pandas as pd
+
+# Columns with fewer distinct values than this are encoded as categories
+CATEGORICAL_MAX_UNIQUES = 20
+
+_INTEGER_DTYPES = ("int8", "int16", "int32", "int64")
+
+
+def numeric_dtype(low: float, high: float, integral: bool, float32_exact: bool) -> str:
+    """Smallest dtype that stores every value in [low, high] without loss."""
+    if integral:
+        for dtype in _INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return dtype
+    return "float32" if float32_exact else "float64"
+
+
+def value_flags(values: np.ndarray) -> tuple[bool, bool]:
+    """(all integral, all exactly representable as float32) for non-null float values."""
+    with np.errstate(invalid="ignore", over="ignore"):
+        integral = bool(np.all(np.isfinite(values) & (np.mod(values, 1) == 0)))
+        float32_exact = bool(np.all(values.astype(np.float32).astype(np.float64) == values))
+    return integral, float32_exact
+
+
+def numeric_spec(fill: float, low: float, high: float, integral: bool, float32_exact: bool) -> dict:
+    if pd.isna(fill):
+        # Nothing to learn from an all-null column
+        return {"kind": "numeric", "fill": None, "dtype": "float64"}
+    fill_integral, fill_exact = value_flags(np.array([fill], dtype=np.float64))
+    dtype = numeric_dtype(min(low, fill), max(high, fill), integral and fill_integral, float32_exact and fill_exact)
+    return {"kind": "numeric", "fill": float(fill), "dtype": dtype}
+
+
+def text_spec(fill, vocabulary: list) -> dict:
+    """vocabulary is the sorted list of distinct values, or None when there are too many."""
+    if vocabulary is not None and len(vocabulary) < CATEGORICAL_MAX_UNIQUES:
+        return {"kind": "categorical", "fill": fill, "categories": vocabulary}
+    return {"kind": "text", "fill": fill}
+
+
+def fit_encodings(df: pd.DataFrame) -> dict:
+    """Learns median/mode imputation and storage for every column of df."""
+    columns = {}
+    numeric_cols = set(df.select_dtypes(include="number").columns)
+    for col in df.columns:
+        series = df[col]
+        if col in numeric_cols:
+            values = series.dropna().to_numpy(dtype=np.float64)
+            if values.size == 0:
+                columns[col] = numeric_spec(np.nan, 0, 0, False, False)
+                continue
+            columns[col] = numeric_spec(float(np.median(values)), values.min(), values.max(), *value_flags(values))
+        else:
+            modes = series.mode(dropna=True)
+            fill = modes.iloc[0] if not modes.empty else None
+            uniques = series.dropna().astype(str).unique()
+            vocabulary = sorted(uniques) if len(uniques) < CATEGORICAL_MAX_UNIQUES else None
+            columns[col] = text_spec(None if fill is None else _plain(fill), vocabulary)
+    return {"columns": columns}
+
+
+def apply_encodings(df: pd.DataFrame, encodings: dict) -> pd.DataFrame:
+    """Returns a new frame with every known column imputed and stored as in encodings."""
+    out = {}
+    for col in df.columns:
+        spec = encodings["columns"].get(col)
+        series = df[col]
+        if spec is None:
+            out[col] = series
+        elif spec["kind"] == "numeric":
+            if not pd.api.types.is_numeric_dtype(series):
+                series = pd.to_numeric(series)
+            if spec["fill"] is not None:
+                series = series.fillna(spec["fill"])
+            out[col] = _cast_exact(series, spec["dtype"])
+        else:
+            if spec["fill"] is not None:
+                series = series.fillna(spec["fill"])
+            if spec["kind"] == "categorical":
+                codes = pd.Categorical(series.astype(str), categories=spec["categories"]).codes
+                out[col] = pd.Series(codes, index=series.index)
+            else:
+                out[col] = series
+    return pd.DataFrame(out, index=df.index)
+
+
+def categorical_columns(encodings: dict) -> list[str]:
+    return [col for col, spec in encodings["columns"].items() if spec["kind"] == "categorical"]
+
+
+def _cast_exact(series: pd.Series, dtype: str) -> pd.Series:
+    # New data may not fit the dtype learned at fit time; widen instead of wrapping
+    if series.dtype == dtype:
+        return series
+    try:
+        with np.errstate(invalid="ignore", over="ignore"):
+            cast = series.astype(dtype)
+    except (ValueError, OverflowError):
+        return series.astype(np.float64)
+    if (cast.astype(np.float64) == series.astype(np.float64)).all():
+        return cast
+    return series.astype(np.float64)
+
+
+def _plain(value):
+    # numpy scalars are not JSON serialisable; keep the state plain
+    return value.item() if isinstance(value, np.generic) else value
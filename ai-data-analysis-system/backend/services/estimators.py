@@ -0,0 +1,43 @@
+"""
+Scalable stand-ins for candidate models that do not finish on large data.
+
+KNN keeps every training row and compares each query against them, so both
+memory and predict time grow with the dataset. The sampled variants index a
+bounded random subset of the rows instead; the modeler pairs them with a PCA
+projection and a KD-tree, which gives approximate neighbours with
+logarithmic query time.
+"""
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
+
+KNN_MAX_SAMPLES = 50_000
+
+
+class _SampledFitMixin:
+    def fit(self, X, y):
+        X, y = np.asarray(X), np.asarray(y)
+        if len(X) > self.max_samples:
+            rng = np.random.default_rng(self.random_state)
+            keep = np.sort(rng.choice(len(X), self.max_samples, replace=False))
+            X, y = X[keep], y[keep]
+        return super().fit(X, y)
+
+
+class SampledKNeighborsClassifier(_SampledFitMixin, KNeighborsClassifier):
+    def __init__(self, n_neighbors=5, *, max_samples=KNN_MAX_SAMPLES, random_state=None,
+                 weights="uniform", algorithm="auto", leaf_size=30, p=2, metric="minkowski",
+                 metric_params=None, n_jobs=None):
+        super().__init__(n_neighbors=n_neighbors, weights=weights, algorithm=algorithm, leaf_size=leaf_size,
+                         p=p, metric=metric, metric_params=metric_params, n_jobs=n_jobs)
+        self.max_samples = max_samples
+        self.random_state = random_state
+
+
+class SampledKNeighborsRegressor(_SampledFitMixin, KNeighborsRegressor):
+    def __init__(self, n_neighbors=5, *, max_samples=KNN_MAX_SAMPLES, random_state=None,
+                 weights="uniform", algorithm="auto", leaf_size=30, p=2, metric="minkowski",
+                 metric_params=None, n_jobs=None):
+        super().__init__(n_neighbors=n_neighbors, weights=weights, algorithm=algorithm, leaf_size=leaf_size,
+                         p=p, metric=metric, metric_params=metric_params, n_jobs=n_jobs)
+        self.max_samples = max_samples
+        self.random_state = random_state
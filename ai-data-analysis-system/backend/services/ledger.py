@@ -0,0 +1,121 @@
+"""
+Persistent masking ledger for the PrivacyService.
+
+hash -> original value pairs live in a SQLite file so they survive restarts and
+never have to fit in memory. Lookups go through a bounded LRU hot set, so a
+long-running server keeps a flat footprint no matter how much data it masks.
+"""
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+LEDGER_PATH = os.getenv("MASKING_LEDGER_PATH", "uploads/masking_ledger.db")
+LEDGER_HOT_SIZE = int(os.getenv("MASKING_LEDGER_HOT_SIZE", "100000"))
+WRITE_BATCH_SIZE = 10_000
+# SQLite's default limit on host parameters per statement is 999
+READ_BATCH_SIZE = 900
+
+
+class MaskingLedger:
+    def __init__(self, path: str = LEDGER_PATH, hot_size: int = LEDGER_HOT_SIZE):
+        self.path = path
+        self.hot_size = hot_size
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ledger (hash TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()
+        self._hot_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def put_many(self, entries: dict[str, str]):
+        """
+        Persists a batch of hash -> value entries in a single transaction.
+        Existing hashes are left untouched (same hash, same value).
+        """
+        if not entries:
+            return
+        items = list(entries.items())
+        with self._lock:
+            with self._conn:
+                for start in range(0, len(items), WRITE_BATCH_SIZE):
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO ledger (hash, value) VALUES (?, ?)",
+                        items[start:start + WRITE_BATCH_SIZE],
+                    )
+            self.writes += len(items)
+
+    def get(self, hash_val: str, default: str = None) -> str:
+        return self.unmask_many([hash_val]).get(hash_val, default)
+
+    def unmask_many(self, hashes: list[str]) -> dict[str, str]:
+        """
+        Bulk lookup. Returns a dict with an entry for every hash that is known.
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for hash_val in dict.fromkeys(hashes):
+                value = self._hot.get(hash_val)
+                if value is None:
+                    missing.append(hash_val)
+                else:
+                    self._hot.move_to_end(hash_val)
+                    found[hash_val] = value
+            self.hits += len(found)
+            self.misses += len(missing)
+
+            for start in range(0, len(missing), READ_BATCH_SIZE):
+                batch = missing[start:start + READ_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT hash, value FROM ledger WHERE hash IN ({placeholders})", batch
+                ).fetchall()
+                for hash_val, value in rows:
+                    found[hash_val] = value
+                    self._remember(hash_val, value)
+        return found
+
+    def _remember(self, hash_val: str, value: str):
+        self._hot[hash_val] = value
+        self._hot_bytes += sys.getsizeof(hash_val) + sys.getsizeof(value)
+        while len(self._hot) > self.hot_size:
+            old_hash, old_value = self._hot.popitem(last=False)
+            self._hot_bytes -= sys.getsizeof(old_hash) + sys.getsizeof(old_value)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM ledger").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        disk_bytes = sum(
+            os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p)
+        )
+        return {
+            "entries": len(self),
+            "hot_entries": len(self._hot),
+            "hot_capacity": self.hot_size,
+            "hot_bytes": self._hot_bytes,
+            "disk_bytes": disk_bytes,
+            "writes": self.writes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,198 @@
+"""
+Shared Ollama client layer for the agents.
+
+Every agent used to build its own OllamaLLM (and with it a new HTTP
+connection pool) and block on a fresh generation on every run, although the
+target-detection and chart-mapping prompts only depend on the schema and the
+task text. Here:
+
+* one OllamaLLM per (model, format) is shared by all runs, so connections to
+  OLLAMA_BASE_URL are kept alive and reused;
+* responses are cached in a SQLite file keyed by a hash of (model, format,
+  prompt), expiring after LLM_CACHE_TTL_SECONDS and trimmed least recently
+  used past LLM_CACHE_MAX_MB. A format="json" response that does not parse
+  is returned but never cached, so a retry asks the model again;
+* identical prompts already in flight (the pipeline runs independent
+  branches concurrently) share one call, and at most LLM_WORKERS calls reach
+  Ollama at the same time.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from core.tracing import tracer
+
+# None lets the ollama client use OLLAMA_HOST or its localhost default
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL") or None
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:1b")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "uploads/llm_cache.db")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "64"))
+# Concurrent requests to Ollama across all runs
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", "4"))
+
+
+class PromptCache:
+    """Persistent prompt -> response cache with a TTL and a size cap."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use so importing the agents never touches the disk
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL, bytes INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                with conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            with conn:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        size = len(response.encode())
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                             (key, response, now, now, size))
+                conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+                total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    # Least recently used first, until back under the cap
+                    rows = conn.execute("SELECT key, bytes FROM responses ORDER BY accessed").fetchall()
+                    stale = []
+                    for old_key, old_bytes in rows:
+                        if total <= self.max_bytes or old_key == key:
+                            break
+                        stale.append((old_key,))
+                        total -= old_bytes
+                    conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class LLMService:
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL,
+                 cache: PromptCache = None, workers: int = LLM_WORKERS):
+        self.base_url = base_url
+        self.model = model
+        self.cache = cache or PromptCache()
+        self._clients = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers)
+        self.calls = 0
+
+    def client(self, format: str = None):
+        """The shared OllamaLLM for this model and output format."""
+        with self._lock:
+            llm = self._clients.get(format)
+            if llm is None:
+                from langchain_ollama import OllamaLLM
+                llm = self._clients[format] = OllamaLLM(model=self.model, format=format or "",
+                                                        base_url=self.base_url)
+            return llm
+
+    def _key(self, prompt: str, format: str) -> str:
+        # Indentation of the prompt templates does not change the answer
+        normalized = "\n".join(line.strip() for line in prompt.strip().splitlines())
+        return hashlib.sha256(f"{self.model}\0{format or ''}\0{normalized}".encode()).hexdigest()
+
+    @staticmethod
+    def _valid(response: str, format: str) -> bool:
+        if format != "json":
+            return True
+        try:
+            json.loads(response)
+            return True
+        except ValueError:
+            return False
+
+    def _complete(self, key: str, prompt: str, format: str, use_cache: bool) -> str:
+        if use_cache:
+            cached = self.cache.get(key)
+            # Entries written before invalid JSON was kept out are ignored and replaced
+            if cached is not None and self._valid(cached, format):
+                return cached
+        with self._slots, tracer.span("llm_call", model=self.model, format=format):
+            response = self.client(format).invoke(prompt)
+        self.calls += 1
+        if use_cache and self._valid(response, format):
+            self.cache.put(key, response)
+        return response
+
+    def complete(self, prompt: str, format: str = None, use_cache: bool = True) -> str:
+        """The response text for prompt; joins an identical call already in flight."""
+        key = self._key(prompt, format)
+        with self._lock:
+            future = self._in_flight.get(key)
+            joined = future is not None
+            if not joined:
+                future = self._in_flight[key] = Future()
+        if joined:
+            return future.result()
+        try:
+            response = self._complete(key, prompt, format, use_cache)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(response)
+            return response
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"model": self.model, "base_url": self.base_url, "calls": self.calls,
+                "in_flight": len(self._in_flight), "cache": self.cache.stats()}
+
+
+llm_service = LLMService()
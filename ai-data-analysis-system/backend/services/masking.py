@@ -0,0 +1,120 @@
+"""
+Vectorized masking engine used by the PrivacyService.
+
+Each column is factorized first so SHA-256 runs once per distinct value instead
+of once per cell, then the tokens are mapped back onto the rows via the codes.
+The tokens are identical to hashing ``str(value)`` cell by cell.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+MASK_PREFIX = "MASKED_"
+HASH_LENGTH = 12
+
+# Number of processes used to hash distinct values. 1 keeps everything in-process.
+MASKING_WORKERS = int(os.getenv("MASKING_WORKERS", "1"))
+# Below this many distinct values a process pool costs more than it saves.
+PARALLEL_MIN_UNIQUES = 200_000
+HASH_CHUNK_SIZE = 50_000
+
+
+def hash_value(x_str: str) -> str:
+    return hashlib.sha256(x_str.encode()).hexdigest()[:HASH_LENGTH]
+
+
+def _hash_many(values: list[str]) -> list[str]:
+    return [hashlib.sha256(v.encode()).hexdigest()[:HASH_LENGTH] for v in values]
+
+
+def _factorize_as_strings(series: pd.Series) -> tuple[np.ndarray, list[str]]:
+    """
+    Returns factorize codes and the str() of each distinct value, such that
+    str(series[i]) == uniques[codes[i]] for every row.
+    """
+    dtype = series.dtype
+    needs_str = False
+    if dtype == object:
+        # Mixed objects like 1 / 1.0 / True compare equal but print differently
+        needs_str = pd.api.types.infer_dtype(series, skipna=True) != "string"
+    elif pd.api.types.is_float_dtype(dtype):
+        # 0.0 and -0.0 share a hash bucket but not a string form
+        values = series.to_numpy()
+        needs_str = bool(np.any((values == 0) & np.signbit(values)))
+    if needs_str:
+        series = series.map(str)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    uniques = [str(u) for u in uniques.tolist()]
+
+    missing = codes == -1
+    if missing.any():
+        # None, NaN and NaT all factorize to -1 but stringify differently
+        null_codes, null_uniques = pd.factorize(series[missing].map(str))
+        codes = codes.copy()
+        codes[missing] = null_codes + len(uniques)
+        uniques.extend(null_uniques)
+
+    return codes, uniques
+
+
+def mask_series(series: pd.Series) -> tuple[pd.Series, dict[str, str]]:
+    """
+    Masks every value of a column. Returns the masked column and the
+    hash -> original value entries for the ledger.
+    """
+    codes, uniques = _factorize_as_strings(series)
+    hashes = _hash_many(uniques)
+    return _apply_tokens(series, codes, hashes), dict(zip(hashes, uniques))
+
+
+def _apply_tokens(series: pd.Series, codes: np.ndarray, hashes: list[str]) -> pd.Series:
+    tokens = np.array([MASK_PREFIX + h for h in hashes], dtype=object)
+    return pd.Series(tokens[codes], index=series.index, name=series.name)
+
+
+def mask_columns(df: pd.DataFrame, columns: list[str], workers: int = None) -> tuple[pd.DataFrame, dict[str, str]]:
+    """
+    Masks the given columns of a copy of df. With workers > 1 and enough distinct
+    values, the hashing is spread across a process pool; factorizing and
+    mapping the codes back always happens in this process.
+    """
+    workers = MASKING_WORKERS if workers is None else workers
+    masked_df = df.copy()
+    ledger_entries = {}
+    if not columns:
+        return masked_df, ledger_entries
+
+    factorized = {col: _factorize_as_strings(df[col]) for col in columns}
+    total_uniques = sum(len(uniques) for _, uniques in factorized.values())
+
+    if workers > 1 and total_uniques >= PARALLEL_MIN_UNIQUES:
+        hashed = _hash_in_pool(factorized, workers)
+    else:
+        hashed = {col: _hash_many(uniques) for col, (_, uniques) in factorized.items()}
+
+    for col, (codes, uniques) in factorized.items():
+        hashes = hashed[col]
+        masked_df[col] = _apply_tokens(df[col], codes, hashes)
+        ledger_entries.update(zip(hashes, uniques))
+
+    return masked_df, ledger_entries
+
+
+def _hash_in_pool(factorized: dict, workers: int) -> dict[str, list[str]]:
+    # Split every column's distinct values into fixed-size chunks so one very
+    # high-cardinality column still spreads across the pool
+    jobs = []
+    for col, (_, uniques) in factorized.items():
+        for start in range(0, len(uniques), HASH_CHUNK_SIZE):
+            jobs.append((col, uniques[start:start + HASH_CHUNK_SIZE]))
+
+    hashed = {col: [] for col in factorized}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_hash_many, [chunk for _, chunk in jobs])
+        for (col, _), chunk_hashes in zip(jobs, results):
+            hashed[col].extend(chunk_hashes)
+    return hashed
@@ -0,0 +1,130 @@
+"""
+Content-addressed cache of ModelerAgent results.
+
+Re-running the same CSV with a different prompt usually lands on the same
+target column, so the CV benchmark and the refit of the winner are reused.
+An entry is keyed by a hash of the cleaned data (values and dtypes), the
+target column, the task type and the candidate configuration, and holds the
+metrics payload plus the fitted scaler and best model. Entries are joblib
+files under MODEL_CACHE_DIR, evicted least-recently-used (by mtime, touched
+on every hit) once the directory exceeds MODEL_CACHE_MAX_MB.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import joblib
+import pandas as pd
+import sklearn
+
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "uploads/model_cache")
+MODEL_CACHE_MAX_MB = int(os.getenv("MODEL_CACHE_MAX_MB", "1024"))
+CACHE_SUFFIX = ".joblib"
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of the frame's values, column names and dtypes (row order matters)."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def candidate_config(candidates: dict, **settings) -> dict:
+    """Everything about the search that changes its outcome, in a hashable form."""
+    return {
+        "candidates": {name: repr(model) for name, model in candidates.items()},
+        "sklearn": sklearn.__version__,
+        **settings,
+    }
+
+
+class ModelCache:
+    def __init__(self, root: str = MODEL_CACHE_DIR, max_bytes: int = MODEL_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fingerprint: str, target_column: str, task_type: str, config: dict) -> str:
+        payload = json.dumps([fingerprint, target_column, task_type, config], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key + CACHE_SUFFIX)
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            entry = joblib.load(path)
+            # Reading counts as use for LRU eviction
+            os.utime(path)
+        except FileNotFoundError:
+            entry = None
+        except Exception as e:
+            # Truncated or written by an incompatible version
+            print(f"[ModelCache] Dropping unreadable entry {key[:12]}: {e}")
+            self._remove(path)
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict):
+        os.makedirs(self.root, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        joblib.dump(entry, tmp)
+        os.replace(tmp, self._path(key))
+        self._evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            # Oldest first; the entry just written is the newest and goes last
+            for _, size, path in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        entries = self._entries() if os.path.isdir(self.root) else []
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+model_cache = ModelCache()
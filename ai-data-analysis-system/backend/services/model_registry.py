@@ -0,0 +1,322 @@
+"""
+Versioned registry of the ModelerAgent's winning models, and their serving.
+
+A registered model is everything needed to score raw rows the way the
+training data was scored: the sklearn pipeline (scaler + best estimator),
+the cleaner's encodings, the columns the PrivacyAgent masked, and the
+feature columns in training order. Each registration of the same name is a
+new version, stored as one joblib bundle plus a JSON manifest under
+MODEL_REGISTRY_DIR/<model_id>/:
+
+    v3.joblib   {"pipeline", "encodings", "masked_columns", "feature_cols", ...}
+    v3.json     the same metadata without the pipeline, for listings
+
+Registering prunes the model to its newest MODEL_REGISTRY_KEEP_VERSIONS
+versions; a version loaded for serving is kept regardless. The last
+MODEL_REGISTRY_WARM loaded bundles stay in memory. Online
+predictions go through a per-model MicroBatcher, which collects requests for
+PREDICT_BATCH_WINDOW_MS and calls predict once on the concatenated rows.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+
+from services.encoding import apply_encodings
+from services.masking import mask_columns
+
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "uploads/models")
+# Versions kept on disk per model; 0 keeps every version
+MODEL_REGISTRY_KEEP_VERSIONS = int(os.getenv("MODEL_REGISTRY_KEEP_VERSIONS", "10"))
+# Bundles kept loaded for serving
+MODEL_REGISTRY_WARM = int(os.getenv("MODEL_REGISTRY_WARM", "4"))
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5"))
+# A batch is flushed early once it holds this many rows
+PREDICT_MAX_BATCH_ROWS = int(os.getenv("PREDICT_MAX_BATCH_ROWS", "4096"))
+PREDICT_CSV_CHUNK_ROWS = int(os.getenv("PREDICT_CSV_CHUNK_ROWS", "50000"))
+
+
+class ModelNotFound(Exception):
+    pass
+
+
+def model_name(csv_file_path: str, target_column: str) -> str:
+    """Registry name for a dataset/target pair, e.g. 'churn-exited'."""
+    stem = os.path.splitext(os.path.basename(csv_file_path or ""))[0]
+    # Drop the unique prefix safe_filename adds to uploads
+    stem = re.sub(r"^[0-9a-f]{8}_", "", stem) or "dataset"
+    return re.sub(r"[^a-z0-9]+", "-", f"{stem}-{target_column}".lower()).strip("-")
+
+
+def prepare_features(bundle: dict, df: pd.DataFrame) -> np.ndarray:
+    """Masks, imputes and encodes raw rows exactly as in training and returns the feature matrix."""
+    missing = [col for col in bundle["feature_cols"] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+    masked = [col for col in bundle["masked_columns"] if col in df.columns]
+    if masked:
+        # Same deterministic tokens as the PrivacyAgent; nothing goes to the ledger
+        df, _ = mask_columns(df, masked)
+    df = apply_encodings(df[bundle["feature_cols"]], bundle["encodings"])
+    return df.values
+
+
+def predict_frame(bundle: dict, df: pd.DataFrame) -> list:
+    """Predictions for raw rows, with category codes of the target mapped back to labels."""
+    predictions = bundle["pipeline"].predict(prepare_features(bundle, df))
+    labels = bundle.get("target_labels")
+    if labels:
+        codes = predictions.astype(np.int64)
+        return [labels[c] if 0 <= c < len(labels) else None for c in codes]
+    return predictions.tolist()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent predict calls on one model. The first request of a
+    batch starts a window_ms timer; every request that arrives before it
+    fires (or before max_rows rows are pending) is scored by a single
+    predict_fn call on a worker thread.
+    """
+
+    def __init__(self, predict_fn, window_ms: float = PREDICT_BATCH_WINDOW_MS,
+                 max_rows: int = PREDICT_MAX_BATCH_ROWS):
+        self._predict = predict_fn
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self._pending = []
+        self._pending_rows = 0
+        self._timer = None
+        self._tasks = set()
+        self.requests = 0
+        self.batches = 0
+
+    async def submit(self, df: pd.DataFrame) -> list:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((df, future))
+        self._pending_rows += len(df)
+        self.requests += 1
+        if self._pending_rows >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            # The loop only keeps weak references to tasks
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        self.batches += 1
+        try:
+            results = await asyncio.to_thread(self._predict_batch, [df for df, _ in batch])
+        except Exception:
+            # One bad request must not fail the rest of the batch: score them one by one
+            for df, future in batch:
+                try:
+                    result = await asyncio.to_thread(self._predict, df)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    continue
+                if not future.done():
+                    future.set_result(result)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _predict_batch(self, frames: list[pd.DataFrame]) -> list[list]:
+        predictions = self._predict(pd.concat(frames, ignore_index=True))
+        bounds = np.cumsum([len(df) for df in frames])[:-1]
+        return [list(part) for part in np.split(np.asarray(predictions, dtype=object), bounds)]
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_requests": round(self.requests / self.batches, 2) if self.batches else None,
+        }
+
+
+class ModelRegistry:
+    def __init__(self, root: str = MODEL_REGISTRY_DIR, warm: int = MODEL_REGISTRY_WARM,
+                 keep_versions: int = MODEL_REGISTRY_KEEP_VERSIONS):
+        self.root = root
+        self.warm = warm
+        self.keep_versions = keep_versions
+        self._lock = threading.Lock()
+        # (model_id, version) -> bundle, least recently used first
+        self._loaded = OrderedDict()
+        self._batchers = {}
+
+    def _dir(self, model_id: str) -> str:
+        if not re.fullmatch(r"[a-z0-9-]+", model_id):
+            raise ModelNotFound(model_id)
+        return os.path.join(self.root, model_id)
+
+    def versions(self, model_id: str) -> list[dict]:
+        directory = self._dir(model_id)
+        if not os.path.isdir(directory):
+            raise ModelNotFound(model_id)
+        manifests = []
+        for name in os.listdir(directory):
+            if re.fullmatch(r"v\d+\.json", name):
+                with open(os.path.join(directory, name)) as fh:
+                    manifests.append(json.load(fh))
+        return sorted(manifests, key=lambda m: m["version"])
+
+    def list_models(self) -> list[dict]:
+        if not os.path.isdir(self.root):
+            return []
+        models = []
+        for model_id in sorted(os.listdir(self.root)):
+            try:
+                versions = self.versions(model_id)
+            except ModelNotFound:
+                continue
+            if versions:
+                models.append({"model_id": model_id, "versions": len(versions), "latest": versions[-1]})
+        return models
+
+    def register(self, model_id: str, scaler, model, feature_cols: list[str], encodings: dict,
+                 masked_columns: list[str], target_column: str, task_type: str, metrics: dict,
+                 source_key: str = None) -> dict:
+        """
+        Stores a new version of model_id and returns its manifest. If the
+        latest version was built from the same source_key (a model cache
+        key), that version is returned instead of a duplicate.
+        """
+        directory = self._dir(model_id)
+        os.makedirs(directory, exist_ok=True)
+        target_spec = (encodings or {}).get("columns", {}).get(target_column, {})
+        with self._lock:
+            existing = self.versions(model_id)
+            if existing and source_key and existing[-1].get("source_key") == source_key:
+                return existing[-1]
+            version = existing[-1]["version"] + 1 if existing else 1
+            manifest = {
+                "model_id": model_id,
+                "version": version,
+                "created_at": time.time(),
+                "target_column": target_column,
+                "task_type": task_type,
+                "feature_cols": feature_cols,
+                "masked_columns": [c for c in masked_columns if c in feature_cols],
+                "model_name": metrics.get("best_model_name"),
+                "metric_name": metrics.get("metric_name"),
+                "test_score": metrics.get("best_accuracy"),
+                "source_key": source_key,
+            }
+            bundle = {
+                **manifest,
+                "pipeline": Pipeline([("scaler", scaler), ("model", model)]),
+                "encodings": encodings or {"columns": {}},
+                "target_labels": target_spec.get("categories") if target_spec.get("kind") == "categorical" else None,
+            }
+            # Bundle first, manifest last: a version is listed only once it is loadable
+            stem = os.path.join(directory, f"v{version}")
+            tmp = os.path.join(directory, f".{uuid.uuid4().hex}.tmp")
+            joblib.dump(bundle, tmp)
+            os.replace(tmp, stem + ".joblib")
+            with open(tmp, "w") as fh:
+                json.dump(manifest, fh)
+            os.replace(tmp, stem + ".json")
+            # Before the new bundle can push them out of memory
+            serving = {v for loaded_id, v in list(self._loaded) + list(self._batchers) if loaded_id == model_id}
+            self._remember((model_id, version), bundle)
+            pruned = self._prune(model_id, [m["version"] for m in existing] + [version], serving)
+        print(f"[ModelRegistry] Registered {model_id} v{version} ({manifest['model_name']})"
+              + (f", removed v{', v'.join(map(str, pruned))}" if pruned else ""))
+        return manifest
+
+    def _prune(self, model_id: str, versions: list[int], serving: set) -> list[int]:
+        """
+        Deletes all but the newest keep_versions of model_id, except the
+        serving versions (loaded in memory or batching predictions). Called
+        with the lock held.
+        """
+        if self.keep_versions <= 0:
+            return []
+        directory = self._dir(model_id)
+        pruned = []
+        for version in sorted(versions)[:-self.keep_versions]:
+            if version in serving:
+                continue
+            stem = os.path.join(directory, f"v{version}")
+            # Manifest first: a listed version always has its bundle
+            for suffix in (".json", ".joblib"):
+                try:
+                    os.remove(stem + suffix)
+                except FileNotFoundError:
+                    pass
+            pruned.append(version)
+        return pruned
+
+    def load(self, model_id: str, version: int = None) -> dict:
+        if version is None:
+            versions = self.versions(model_id)
+            if not versions:
+                raise ModelNotFound(model_id)
+            version = versions[-1]["version"]
+        key = (model_id, version)
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+        path = os.path.join(self._dir(model_id), f"v{version}.joblib")
+        if not os.path.exists(path):
+            raise ModelNotFound(f"{model_id} v{version}")
+        # Unpickle outside the lock so other models keep serving
+        bundle = joblib.load(path)
+        with self._lock:
+            self._remember(key, bundle)
+        return bundle
+
+    def _remember(self, key: tuple, bundle: dict):
+        self._loaded[key] = bundle
+        self._loaded.move_to_end(key)
+        while len(self._loaded) > self.warm:
+            evicted, _ = self._loaded.popitem(last=False)
+            self._batchers.pop(evicted, None)
+
+    async def predict(self, model_id: str, df: pd.DataFrame, version: int = None) -> tuple[dict, list]:
+        """Micro-batched online prediction; returns (bundle, predictions)."""
+        bundle = await asyncio.to_thread(self.load, model_id, version)
+        key = (bundle["model_id"], bundle["version"])
+        batcher = self._batchers.get(key)
+        if batcher is None:
+            batcher = self._batchers[key] = MicroBatcher(lambda frame: predict_frame(bundle, frame))
+        return bundle, await batcher.submit(df)
+
+    def predict_csv(self, bundle: dict, path: str, chunk_rows: int = PREDICT_CSV_CHUNK_ROWS):
+        """Yields the CSV at path back in chunks, with a 'prediction' column appended."""
+        for i, chunk in enumerate(pd.read_csv(path, chunksize=chunk_rows)):
+            chunk["prediction"] = predict_frame(bundle, chunk)
+            yield chunk.to_csv(index=False, header=i == 0)
+
+    def stats(self) -> dict:
+        return {
+            "warm": [f"{model_id} v{version}" for model_id, version in self._loaded],
+            "batching": {f"{model_id} v{version}": b.stats() for (model_id, version), b in self._batchers.items()},
+        }
+
+
+model_registry = ModelRegistry()
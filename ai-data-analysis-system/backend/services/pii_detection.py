@@ -0,0 +1,160 @@
+"""
+Column-level PII detection planner for the PrivacyService.
+
+Every column goes through the cheapest check that can decide it:
+  1. dtype   - bool / datetime / small numeric columns cannot hold the entities
+  2. cache   - verdicts are remembered by a fingerprint of name, dtype and sample
+  3. regex   - obvious e-mail / phone columns, plus ruling out entities whose
+               tell-tale characters never appear in the sample
+  4. analyzer - the Presidio NLP model, only for the entities still in doubt
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+from core.tracing import tracer
+
+DEFAULT_ENTITIES = ["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"]
+SAMPLE_SIZE = 100
+VERDICT_CACHE_SIZE = 4096
+# Share of sampled values that must match a pattern to skip the analyzer
+REGEX_HIT_RATIO = 0.5
+# Smallest integer part that can still be a (local) phone number
+MIN_PHONE_NUMBER = 1_000_000
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"(?<!\d)(?:\+?\d{1,3}[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)")
+ALPHA_RE = re.compile(r"[^\W\d_]")
+SEVEN_DIGITS_RE = re.compile(r"(?:\d\D{0,2}){7}")
+
+
+class DetectionPlanner:
+    def __init__(self, get_analyzer: Callable, cache_size: int = VERDICT_CACHE_SIZE):
+        # The analyzer is fetched lazily so fully cached / regex-decided scans
+        # never need the NLP model
+        self._get_analyzer = get_analyzer
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scan(self, df: pd.DataFrame, entities: list[str] = None) -> tuple[list[str], list[dict]]:
+        """
+        Returns the PII columns of df and a per-column report with the
+        verdict, the check that decided it and the time spent.
+        """
+        entities = entities or DEFAULT_ENTITIES
+        pii_columns = []
+        report = []
+        for col in df.columns:
+            start = time.perf_counter()
+            found, method = self._scan_column(col, df[col], entities)
+            report.append({
+                "column": col,
+                "dtype": str(df[col].dtype),
+                "pii": bool(found),
+                "entities": found,
+                "method": method,
+                "seconds": round(time.perf_counter() - start, 6),
+            })
+            if found:
+                pii_columns.append(col)
+        return pii_columns, report
+
+    def _scan_column(self, name: str, series: pd.Series, entities: list[str]) -> tuple[list[str], str]:
+        candidates = _entities_for_dtype(series, entities)
+        if not candidates:
+            return [], "dtype"
+
+        sample = series.dropna().astype(str).head(SAMPLE_SIZE).tolist()
+        if not sample:
+            return [], "dtype"
+
+        key = _fingerprint(name, series.dtype, sample, candidates)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key], "cache"
+
+        found, method = self._detect(sample, candidates, numeric=pd.api.types.is_numeric_dtype(series))
+
+        with self._lock:
+            self._cache[key] = found
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return found, method
+
+    def _detect(self, sample: list[str], candidates: list[str], numeric: bool) -> tuple[list[str], str]:
+        found = [
+            entity for entity, pattern in (("EMAIL_ADDRESS", EMAIL_RE), ("PHONE_NUMBER", PHONE_RE))
+            if entity in candidates and _hit_ratio(pattern, sample) >= REGEX_HIT_RATIO
+        ]
+        if found:
+            return found, "regex"
+        if numeric:
+            # Numbers can only ever be phone numbers, which the regex covers
+            return [], "regex"
+
+        text = " ".join(sample)
+        remaining = [
+            entity for entity in candidates
+            if not (entity == "EMAIL_ADDRESS" and "@" not in text)
+            and not (entity == "PHONE_NUMBER" and not SEVEN_DIGITS_RE.search(text))
+            and not (entity == "PERSON" and not ALPHA_RE.search(text))
+        ]
+        if not remaining:
+            return [], "regex"
+
+        with tracer.span("analyze", rows=len(sample)):
+            results = self._get_analyzer().analyze(text=text, entities=remaining, language='en')
+        return sorted({r.entity_type for r in results}), "analyzer"
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def _entities_for_dtype(series: pd.Series, entities: list[str]) -> list[str]:
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype) \
+            or pd.api.types.is_timedelta64_dtype(dtype):
+        return []
+    if pd.api.types.is_numeric_dtype(dtype):
+        if "PHONE_NUMBER" not in entities:
+            return []
+        largest = series.abs().max()
+        return ["PHONE_NUMBER"] if pd.notna(largest) and largest >= MIN_PHONE_NUMBER else []
+    return list(entities)
+
+
+def _fingerprint(name: str, dtype, sample: list[str], entities: list[str]) -> str:
+    digest = hashlib.sha256()
+    for part in (str(name), str(dtype), ",".join(entities)):
+        digest.update(part.encode())
+        digest.update(b"\x1e")
+    for value in sample:
+        digest.update(value.encode())
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def _hit_ratio(pattern: re.Pattern, sample: list[str]) -> float:
+    return sum(1 for value in sample if pattern.search(value)) / len(sample)
+
+
+def summarize_report(report: list[dict]) -> str:
+    """One-line summary of a scan report for logs."""
+    total = sum(r["seconds"] for r in report)
+    methods = {}
+    for r in report:
+        methods[r["method"]] = methods.get(r["method"], 0) + 1
+    breakdown = ", ".join(f"{m}: {n}" for m, n in sorted(methods.items()))
+    slowest = max(report, key=lambda r: r["seconds"], default=None)
+    summary = f"Scanned {len(report)} columns in {total:.3f}s ({breakdown})"
+    if slowest is not None:
+        summary += f"; slowest '{slowest['column']}' {slowest['seconds']:.3f}s via {slowest['method']}"
+    return summary
@@ -1,47 +1,177 @@
-from presidio_analyzer import AnalyzerEngine
-from presidio_anonymizer import AnonymizerEngine
-from presidio_anonymizer.entities import OperatorConfig
+import io
+import threading
+import time
+import numpy as np
 import pandas as pd
-import hashlib
+from services.masking import mask_columns, MASK_PREFIX
+from services.ledger import MaskingLedger
+from services.pii_detection import DetectionPlanner, DEFAULT_ENTITIES, summarize_report
+from core.tracing import tracer
+
+# Rows mask_csv draws from every chunk for the PII scan
+PII_SAMPLE_ROWS_PER_CHUNK = 200
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Text read with dtype=str, typed the way a plain read_csv of the same rows would be"""
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)))
+
+def _file_dtype(a, b):
+    """
+    The dtype read_csv gives a column over two chunks it typed as a and b:
+    int64 and float64 (e.g. a chunk with a gap) make float64, anything else
+    that differs is text
+    """
+    if a is None or a == b:
+        return b
+    numeric = pd.api.types.is_numeric_dtype
+    if numeric(a) and numeric(b) and not pd.api.types.is_bool_dtype(a) and not pd.api.types.is_bool_dtype(b):
+        return np.result_type(a, b)
+    return object
 
 class PrivacyService:
     def __init__(self):
-        self.analyzer = AnalyzerEngine()
-        self.anonymizer = AnonymizerEngine()
-        # Keep a locally stored map to de-mask when responding to trusted frontend
-        self.masking_ledger = {}
+        # Presidio engines load the spaCy model, so they are built on first use
+        # (or by warm_up) instead of at import time
+        self._analyzer = None
+        self._anonymizer = None
+        self._engine_lock = threading.Lock()
+        self.analyzer_load_seconds = None
+        # Keep a locally stored map to de-mask when responding to trusted frontend.
+        # Backed by SQLite with a bounded in-memory hot set.
+        self.masking_ledger = MaskingLedger()
+        # Cheap dtype/regex checks and cached verdicts in front of the analyzer
+        self.detector = DetectionPlanner(lambda: self.analyzer)
+        self.last_scan_report = []
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            self._load_engines()
+        return self._analyzer
+
+    @property
+    def anonymizer(self):
+        if self._anonymizer is None:
+            self._load_engines()
+        return self._anonymizer
+
+    @property
+    def is_ready(self) -> bool:
+        return self._analyzer is not None
 
-    def mask_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _load_engines(self):
+        with self._engine_lock:
+            if self._analyzer is not None:
+                return
+            start = time.perf_counter()
+            from presidio_analyzer import AnalyzerEngine
+            from presidio_anonymizer import AnonymizerEngine
+            self._anonymizer = AnonymizerEngine()
+            # Assigned last: a non-None analyzer is what marks the service ready
+            self._analyzer = AnalyzerEngine()
+            self.analyzer_load_seconds = round(time.perf_counter() - start, 3)
+            print(f"[PrivacyService] Presidio engines loaded in {self.analyzer_load_seconds}s")
+
+    def warm_up(self):
+        """
+        Loads the Presidio engines ahead of the first request
+        """
+        self._load_engines()
+
+    def mask_dataframe(self, df: pd.DataFrame, workers: int = None) -> pd.DataFrame:
         """
         Scans a dataframe column by column for PII and masks it.
         We capture the mapping in self.masking_ledger.
+        Masking hashes each distinct value once; workers > 1 spreads the
+        hashing of wide / high-cardinality frames over a process pool.
+        The per-column scan timings are kept in self.last_scan_report.
         """
-        masked_df = df.copy()
-        for col in masked_df.columns:
-            # We convert everything to strings to analyze
-            sample = " ".join(masked_df[col].dropna().astype(str).head(100).tolist())
-            results = self.analyzer.analyze(text=sample, entities=["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"], language='en')
-            
-            if results:
-                print(f"Masking column: {col}")
-                # Simple implementation: If PII found in column, hash it all and keep a ledger
-                def mask_value(x):
-                    x_str = str(x)
-                    hash_val = hashlib.sha256(x_str.encode()).hexdigest()[:12]
-                    self.masking_ledger[hash_val] = x_str
-                    return f"MASKED_{hash_val}"
-                
-                masked_df[col] = masked_df[col].apply(mask_value)
-                
+        masked_df, self.last_scan_report = self.mask_dataframe_with_report(df, workers)
         return masked_df
 
+    def mask_dataframe_with_report(self, df: pd.DataFrame, workers: int = None) -> tuple[pd.DataFrame, list[dict]]:
+        """
+        Same as mask_dataframe but returns the scan report instead of storing
+        it on the shared service, so concurrent runs don't see each other's.
+        """
+        with tracer.span("pii_scan", rows=len(df)):
+            pii_columns, scan_report = self.detector.scan(df, DEFAULT_ENTITIES)
+        print(f"[PrivacyService] {summarize_report(scan_report)}")
+        for col in pii_columns:
+            print(f"Masking column: {col}")
+
+        # If PII found in column, hash it all and keep a ledger
+        with tracer.span("mask", rows=len(df), columns=len(pii_columns)):
+            masked_df, ledger_entries = mask_columns(df, pii_columns, workers=workers)
+            self.masking_ledger.put_many(ledger_entries)
+        return masked_df, scan_report
+
+    def mask_csv(self, source: str, destination: str, chunk_rows: int, workers: int = None) -> tuple[pd.DataFrame, list[dict]]:
+        """
+        Out-of-core variant of mask_dataframe_with_report, holding one chunk
+        at a time. A first pass draws PII_SAMPLE_ROWS_PER_CHUNK rows from
+        every chunk and scans them, so a column whose PII only shows up late
+        in the file is still found. The second pass masks every chunk and
+        appends it to destination. Returns a preview of the masked data and
+        the scan report.
+
+        The first pass also works out the dtype a plain read_csv of the whole
+        file gives each column. The second reads the numeric PII columns with
+        that dtype and everything else as text, so every chunk hashes the
+        same str(value) as mask_dataframe_with_report: a phone column with
+        one gap is float64 in the whole file, and so in every chunk, even
+        those without a gap.
+        Tolerance: the scan sees a sample, not every value, so a column with
+        PII in only a handful of rows can be missed (the in-memory path
+        samples too, from the head of the column).
+        """
+        with tracer.span("mask_csv") as span:
+            with tracer.span("pii_scan") as scan_span:
+                parts, dtypes = [], {}
+                for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows)):
+                    for col in chunk.columns:
+                        dtypes[col] = _file_dtype(dtypes.get(col), chunk[col].dtype)
+                    parts.append(chunk.sample(n=min(PII_SAMPLE_ROWS_PER_CHUNK, len(chunk)), random_state=i))
+                # Shuffled: the detector looks at the first values of each column
+                sample = pd.concat(parts).sample(frac=1, random_state=0)
+                pii_columns, scan_report = self.detector.scan(sample, DEFAULT_ENTITIES)
+                scan_span.set(rows=len(sample))
+            print(f"[PrivacyService] {summarize_report(scan_report)}")
+            for col in pii_columns:
+                print(f"Masking column: {col}")
+
+            numeric = [col for col in pii_columns
+                       if pd.api.types.is_numeric_dtype(dtypes[col]) and not pd.api.types.is_bool_dtype(dtypes[col])]
+            read_as = {col: dtypes[col] if col in numeric else str for col in dtypes}
+            rows, preview = 0, None
+            for i, chunk in enumerate(pd.read_csv(source, chunksize=chunk_rows, dtype=read_as)):
+                masked_chunk, ledger_entries = mask_columns(chunk, pii_columns, workers=workers)
+                self.masking_ledger.put_many(ledger_entries)
+                masked_chunk.to_csv(destination, mode="w" if i == 0 else "a", header=i == 0, index=False)
+                if preview is None:
+                    preview = _typed(masked_chunk.head())
+                rows += len(chunk)
+            span.set(rows=rows)
+        return preview, scan_report
+
     def unmask_data(self, masked_val: str) -> str:
         """
         Retrieves the original value from the masking ledger
         """
-        if masked_val.startswith("MASKED_"):
-            hash_val = masked_val.replace("MASKED_", "")
+        if masked_val.startswith(MASK_PREFIX):
+            hash_val = masked_val.replace(MASK_PREFIX, "")
             return self.masking_ledger.get(hash_val, masked_val)
         return masked_val
 
+    def unmask_many(self, masked_vals: list[str]) -> list[str]:
+        """
+        Bulk version of unmask_data with a single ledger lookup for all values
+        """
+        hashes = [v[len(MASK_PREFIX):] for v in masked_vals if v.startswith(MASK_PREFIX)]
+        found = self.masking_ledger.unmask_many(hashes)
+        return [
+            found.get(v[len(MASK_PREFIX):], v) if v.startswith(MASK_PREFIX) else v
+            for v in masked_vals
+        ]
+
 privacy_service = PrivacyService()
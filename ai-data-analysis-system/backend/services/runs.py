@@ -0,0 +1,107 @@
+"""
+Run manager for concurrent analyses.
+
+Every analysis gets its own run id and scratch workspace directory, so runs
+never share files. At most MAX_CONCURRENT_RUNS execute at once; further runs
+wait in a bounded queue, and workspaces left behind by crashed runs are swept
+after RUN_RETENTION_SECONDS.
+"""
+import asyncio
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+
+from services.artifacts import ARTIFACT_DIR
+
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "4"))
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", "32"))
+RUN_RETENTION_SECONDS = int(os.getenv("RUN_RETENTION_SECONDS", "3600"))
+
+
+class RunQueueFull(Exception):
+    pass
+
+
+class RunManager:
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_RUNS, max_queued: int = MAX_QUEUED_RUNS,
+                 workspace_root: str = ARTIFACT_DIR, retention_seconds: int = RUN_RETENTION_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.workspace_root = workspace_root
+        self.retention_seconds = retention_seconds
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = {}
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def saturated(self) -> bool:
+        return len(self.active) >= self.max_concurrent
+
+    def workspace(self, run_id: str) -> str:
+        path = os.path.join(self.workspace_root, run_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @asynccontextmanager
+    async def slot(self, run_id: str):
+        """
+        Waits for a free execution slot. Raises RunQueueFull instead of
+        waiting when the queue is already at MAX_QUEUED_RUNS.
+        """
+        if self.saturated and self.waiting >= self.max_queued:
+            raise RunQueueFull(f"{self.waiting} analyses already queued")
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active[run_id] = time.time()
+        try:
+            yield self.workspace(run_id)
+            self.completed += 1
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.active.pop(run_id, None)
+            shutil.rmtree(os.path.join(self.workspace_root, run_id), ignore_errors=True)
+            self._slots.release()
+
+    def cleanup_stale(self) -> int:
+        """Removes workspaces of runs that are no longer active and too old."""
+        if not os.path.isdir(self.workspace_root):
+            return 0
+        cutoff = time.time() - self.retention_seconds
+        removed = 0
+        for run_id in os.listdir(self.workspace_root):
+            path = os.path.join(self.workspace_root, run_id)
+            if run_id in self.active or not os.path.isdir(path):
+                continue
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    async def sweep_forever(self, interval_seconds: int = 600):
+        while True:
+            removed = self.cleanup_stale()
+            if removed:
+                print(f"[RunManager] Removed {removed} stale run workspaces")
+            await asyncio.sleep(interval_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.active),
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+run_manager = RunManager()
@@ -0,0 +1,106 @@
+"""
+Bounded-memory sketches for single-pass statistics over chunked data.
+
+QuantileSketch  - KLL-style compactor for approximate medians / quantiles
+FrequencySketch - exact value counts up to a capacity, Misra-Gries beyond it
+"""
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles in O(k log n) memory. Values are exact while the
+    column holds at most k values; beyond that each compaction halves a level
+    and doubles its weight, keeping the rank error around 1/k per level
+    (well under 0.5% of rank at the default k for any realistic row count).
+    """
+    def __init__(self, k: int = 4096, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self._levels):
+            buf = self._levels[level]
+            if buf.size > self.k:
+                buf = np.sort(buf)
+                # An odd element out stays behind at this level
+                keep = buf[-1:] if buf.size % 2 else buf[:0]
+                buf = buf[:buf.size - keep.size]
+                promoted = buf[self._rng.integers(2)::2]
+                self._levels[level] = keep
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def exact(self) -> bool:
+        return len(self._levels) == 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return np.nan
+        if self.exact:
+            return float(np.quantile(self._levels[0], q))
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(lvl.size, 2.0 ** i) for i, lvl in enumerate(self._levels)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        idx = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        return float(values[order][min(idx, values.size - 1)])
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+
+class FrequencySketch:
+    """
+    Value counts with bounded memory. Counts, distinct counts and the mode are
+    exact until more than `capacity` distinct values are seen; after that only
+    heavy hitters are kept (Misra-Gries) and `overflowed` is set.
+    """
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64")
+        self.overflowed = False
+
+    def update(self, values: pd.Series) -> None:
+        chunk_counts = values.dropna().value_counts(sort=False)
+        chunk_counts.index = chunk_counts.index.astype(object)
+        self.counts = self.counts.add(chunk_counts, fill_value=0).astype("int64")
+        if len(self.counts) > self.capacity:
+            self.overflowed = True
+            # Subtract the (capacity+1)-th largest count from everyone
+            cut = self.counts.nlargest(self.capacity + 1).iloc[-1]
+            self.counts = self.counts[self.counts > cut] - cut
+
+    @property
+    def distinct(self) -> int:
+        """Exact number of distinct values, or a lower bound once overflowed."""
+        return len(self.counts)
+
+    def mode(self):
+        """Most frequent value; ties go to the smallest value, like SimpleImputer."""
+        if self.counts.empty:
+            return None
+        return min(self.counts.index[self.counts == self.counts.max()])
+
+    def vocabulary(self) -> list:
+        return sorted(self.counts.index)
@@ -0,0 +1,298 @@
+"""
+Streaming CSV uploads.
+
+Uploads are written to disk chunk by chunk off the event loop, capped at
+MAX_UPLOAD_MB, and a SchemaSniffer infers the header, column types and row
+count from the bytes as they arrive. The resulting profile is saved next to
+the file (<file>.schema.json) so the orchestrator can plan without re-reading
+the data. Resumable uploads keep their partial file under uploads/.partial.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import re
+import time
+import uuid
+
+UPLOAD_DIR = "uploads"
+PARTIAL_DIR = os.path.join(UPLOAD_DIR, ".partial")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "2048")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+SCHEMA_SAMPLE_ROWS = 1000
+SCHEMA_SUFFIX = ".schema.json"
+
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, expected: int):
+        super().__init__(f"Upload continues at offset {expected}")
+        self.expected = expected
+
+
+def safe_filename(filename: str) -> str:
+    """Never trust the client's name: strip any path and odd characters, add a unique prefix."""
+    name = os.path.basename((filename or "").replace("\\", "/"))
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".") or "upload.csv"
+    return f"{uuid.uuid4().hex[:8]}_{name}"
+
+
+class SchemaSniffer:
+    """
+    Incrementally profiles a CSV byte stream: header, row count and column
+    types inferred from the first SCHEMA_SAMPLE_ROWS records. Quoted fields
+    with embedded newlines are handled by tracking quote parity.
+    """
+    def __init__(self, sample_rows: int = SCHEMA_SAMPLE_ROWS):
+        self.sample_rows = sample_rows
+        self.bytes = 0
+        self.rows = 0
+        self.columns = None
+        self._in_quotes = False
+        self._tail = b""
+        self._record = []
+        self._samples = []
+
+    def feed(self, chunk: bytes):
+        self.bytes += len(chunk)
+        data = self._tail + chunk
+        segments = data.split(b"\n")
+        self._tail = segments.pop()
+
+        if self.columns is not None and len(self._samples) >= self.sample_rows \
+                and not self._in_quotes and b'"' not in data:
+            # Fast path once sampling is done: every non-blank line is a record
+            self.rows += len(segments) - segments.count(b"") - segments.count(b"\r")
+            return
+
+        for segment in segments:
+            if segment.count(b'"') & 1:
+                self._in_quotes = not self._in_quotes
+            self._record.append(segment)
+            if not self._in_quotes:
+                self._end_record(b"\n".join(self._record))
+                self._record = []
+
+    def _end_record(self, raw: bytes):
+        raw = raw.rstrip(b"\r")
+        if self.columns is None:
+            self.columns = self._parse(raw)
+            return
+        if not raw:
+            return
+        self.rows += 1
+        if len(self._samples) < self.sample_rows:
+            self._samples.append(self._parse(raw))
+
+    @staticmethod
+    def _parse(raw: bytes) -> list[str]:
+        text = raw.decode("utf-8", errors="replace")
+        return next(csv.reader(io.StringIO(text)), [])
+
+    def finish(self) -> dict:
+        if self._tail or self._record:
+            self._record.append(self._tail)
+            self._end_record(b"\n".join(self._record))
+            self._tail, self._record = b"", []
+
+        columns = [c.strip() for c in (self.columns or [])]
+        dtypes, nulls = {}, {}
+        for i, col in enumerate(columns):
+            values = [row[i] if i < len(row) else "" for row in self._samples]
+            dtypes[col], nulls[col] = _infer_type(values)
+        return {
+            "columns": columns,
+            "dtypes": dtypes,
+            "sample_nulls": nulls,
+            "sample_rows": len(self._samples),
+            "rows": self.rows,
+            "bytes": self.bytes,
+        }
+
+
+def _infer_type(values: list[str]) -> tuple[str, int]:
+    present = [v.strip() for v in values if v.strip() not in ("", "NA", "NaN", "nan", "null", "NULL")]
+    nulls = len(values) - len(present)
+    if not present:
+        return "object", nulls
+    if all(v.lower() in ("true", "false") for v in present):
+        return "bool", nulls
+    kind = "int64"
+    for v in present:
+        try:
+            int(v)
+            continue
+        except ValueError:
+            pass
+        try:
+            float(v)
+            kind = "float64"
+        except ValueError:
+            return "object", nulls
+    # Missing values turn integer columns into floats in pandas
+    return ("float64" if nulls and kind == "int64" else kind), nulls
+
+
+def save_profile(path: str, profile: dict):
+    with open(path + SCHEMA_SUFFIX, "w") as fh:
+        json.dump(profile, fh)
+
+
+def load_profile(path: str):
+    """Returns the profile recorded at upload time, or None."""
+    try:
+        with open(path + SCHEMA_SUFFIX) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+async def stream_to_disk(chunks, destination: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                         sniffer: SchemaSniffer = None, mode: str = "wb") -> SchemaSniffer:
+    """
+    Writes an async iterator of byte chunks to destination, sniffing as it
+    goes. Raises UploadTooLarge (and removes the file) past max_bytes. A new
+    file ("wb") is also removed when anything else interrupts it, such as a
+    client disconnect; an appended one ("ab") keeps what reached the disk so
+    the upload can resume from there.
+    """
+    sniffer = sniffer or SchemaSniffer()
+    fh = await asyncio.to_thread(open, destination, mode)
+    completed = False
+    too_large = False
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if sniffer.bytes + len(chunk) > max_bytes:
+                too_large = True
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            sniffer.feed(chunk)
+            await asyncio.to_thread(fh.write, chunk)
+        completed = True
+    finally:
+        await asyncio.to_thread(fh.close)
+        if too_large or (not completed and mode == "wb"):
+            try:
+                os.remove(destination)
+            except FileNotFoundError:
+                pass
+    return sniffer
+
+
+async def upload_file_chunks(upload_file, chunk_size: int = UPLOAD_CHUNK_BYTES):
+    while True:
+        chunk = await upload_file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def sniff_file(path: str) -> SchemaSniffer:
+    """Profiles a file already on disk (used when a resumed upload lost its sniffer)."""
+    sniffer = SchemaSniffer()
+    with open(path, "rb") as fh:
+        while True:
+            chunk = await asyncio.to_thread(fh.read, UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            sniffer.feed(chunk)
+    return sniffer
+
+
+class ResumableUploads:
+    """
+    Tracks partial uploads by client-chosen id. Chunks must arrive at the
+    current offset; a client that lost track asks for the offset and resumes.
+    """
+    def __init__(self, partial_dir: str = PARTIAL_DIR):
+        self.partial_dir = partial_dir
+        # upload_id -> SchemaSniffer for uploads fed contiguously in this process
+        self._sniffers = {}
+        self._locks = {}
+
+    def _path(self, upload_id: str) -> str:
+        if not _UPLOAD_ID_RE.match(upload_id):
+            raise ValueError("upload_id must be 8-64 characters of [A-Za-z0-9_-]")
+        return os.path.join(self.partial_dir, upload_id)
+
+    def offset(self, upload_id: str) -> int:
+        path = self._path(upload_id)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _forget(self, upload_id: str):
+        """Drops the in-memory state of an upload; its lock only when no request holds it"""
+        self._sniffers.pop(upload_id, None)
+        lock = self._locks.get(upload_id)
+        if lock is not None and not lock.locked():
+            del self._locks[upload_id]
+
+    async def append(self, upload_id: str, offset: int, chunks, max_bytes: int = MAX_UPLOAD_BYTES) -> int:
+        path = self._path(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        try:
+            async with lock:
+                current = self.offset(upload_id)
+                if offset != current:
+                    raise UploadOffsetMismatch(current)
+                os.makedirs(self.partial_dir, exist_ok=True)
+                sniffer = self._sniffers.get(upload_id)
+                if sniffer is None and current == 0:
+                    sniffer = SchemaSniffer()
+                if sniffer is not None:
+                    self._sniffers[upload_id] = sniffer
+                    try:
+                        await stream_to_disk(chunks, path, max_bytes, sniffer=sniffer, mode="ab")
+                    except Exception:
+                        # The sniffer may be ahead of what reached the disk
+                        self._sniffers.pop(upload_id, None)
+                        raise
+                else:
+                    # Resumed after a restart: only enforce the size limit here and
+                    # profile the whole file on completion
+                    counter = SchemaSniffer(sample_rows=0)
+                    counter.bytes = current
+                    counter.columns = []
+                    await stream_to_disk(chunks, path, max_bytes, sniffer=counter, mode="ab")
+                return self.offset(upload_id)
+        finally:
+            if not os.path.exists(path):
+                # Nothing to resume: rejected before the first byte, or removed past the size limit
+                self._forget(upload_id)
+
+    async def complete(self, upload_id: str, filename: str) -> tuple[str, dict]:
+        path = self._path(upload_id)
+        try:
+            if not os.path.exists(path):
+                raise FileNotFoundError(upload_id)
+            sniffer = self._sniffers.pop(upload_id, None) or await sniff_file(path)
+            destination = os.path.join(UPLOAD_DIR, safe_filename(filename))
+            os.replace(path, destination)
+        finally:
+            # Done, or failed: a retry re-profiles whatever is still on disk
+            self._forget(upload_id)
+        profile = sniffer.finish()
+        await asyncio.to_thread(save_profile, destination, profile)
+        return destination, profile
+
+    def cleanup_stale(self, max_age_seconds: int) -> int:
+        if not os.path.isdir(self.partial_dir):
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                self._forget(name)
+                removed += 1
+        return removed
+
+
+resumable_uploads = ResumableUploads()
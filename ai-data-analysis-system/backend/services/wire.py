@@ -0,0 +1,202 @@
+"""
+Wire formats for the /ws event stream, negotiated per connection through the
+WebSocket subprotocol header.
+
+    (none) or "json"         one JSON text frame per event, as before
+    "analysis.v2+json"       chart data sent column-wise; events larger than
+                             WIRE_COMPRESS_MIN_BYTES go as zlib binary frames
+    "analysis.v2+msgpack"    every event is a binary MessagePack frame, also
+                             column-wise and compressed past the threshold
+                             (offered only when msgpack is installed)
+
+A binary frame is one flags byte followed by the body: FLAG_COMPRESSED means
+the body is zlib-deflated, FLAG_MSGPACK that it is MessagePack rather than
+UTF-8 JSON. In "column-wise" chart configs the list of records in "data" is
+replaced by "columns": {key: [values, ...]}, which drops the repeated keys.
+
+EventSender puts a bounded queue between the analysis and the socket, so a
+slow client never makes the server buffer without limit. An event of a kind
+in COALESCED_EVENTS replaces the one still queued for the same subject (the
+same model's score from an earlier halving round); otherwise, once the
+queue is full, it waits for room like everything else. A send that stalls
+for WIRE_SEND_TIMEOUT_SECONDS closes the connection.
+"""
+import asyncio
+import json
+import os
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # optional: only the msgpack protocol needs it
+    msgpack = None
+
+PROTOCOL_JSON = "json"
+PROTOCOL_V2_JSON = "analysis.v2+json"
+PROTOCOL_V2_MSGPACK = "analysis.v2+msgpack"
+
+FLAG_COMPRESSED = 0x01
+FLAG_MSGPACK = 0x02
+
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))
+WIRE_COMPRESS_LEVEL = int(os.getenv("WIRE_COMPRESS_LEVEL", "6"))
+WIRE_QUEUE_SIZE = int(os.getenv("WIRE_QUEUE_SIZE", "64"))
+WIRE_SEND_TIMEOUT_SECONDS = float(os.getenv("WIRE_SEND_TIMEOUT_SECONDS", "30"))
+
+# Event type -> the field naming its subject: a newer event for the same
+# subject supersedes one not sent yet. Different subjects are never dropped.
+COALESCED_EVENTS = {"model_score": "model"}
+
+
+def supported_protocols() -> list[str]:
+    """Server preference order."""
+    protocols = [PROTOCOL_V2_MSGPACK] if msgpack is not None else []
+    return protocols + [PROTOCOL_V2_JSON, PROTOCOL_JSON]
+
+
+def negotiate(requested: list[str]):
+    """Best protocol the client offered, or None (plain JSON, no header) for old clients."""
+    for protocol in supported_protocols():
+        if protocol in requested:
+            return protocol
+    return None
+
+
+def columnar(event: dict) -> dict:
+    """Chart configs with their records turned into one list per key."""
+    configs = event.get("configs")
+    if not isinstance(configs, list):
+        return event
+    converted = []
+    for config in configs:
+        records = config.get("data")
+        if not isinstance(records, list):
+            converted.append(config)
+            continue
+        keys = list(dict.fromkeys(key for record in records for key in record))
+        columns = {key: [record.get(key) for record in records] for key in keys}
+        converted.append({**{k: v for k, v in config.items() if k != "data"}, "columns": columns})
+    return {**event, "configs": converted}
+
+
+def encode(event: dict, protocol):
+    """The frame for event under protocol: str for a text frame, bytes for a binary one."""
+    if protocol in (None, PROTOCOL_JSON):
+        return json.dumps(event, default=str)
+    event = columnar(event)
+    if protocol == PROTOCOL_V2_MSGPACK:
+        body, flags = msgpack.packb(event, default=str), FLAG_MSGPACK
+    else:
+        text = json.dumps(event, default=str, separators=(",", ":"))
+        if len(text) < WIRE_COMPRESS_MIN_BYTES:
+            return text
+        body, flags = text.encode(), 0
+    if len(body) >= WIRE_COMPRESS_MIN_BYTES:
+        body, flags = zlib.compress(body, WIRE_COMPRESS_LEVEL), flags | FLAG_COMPRESSED
+    return bytes([flags]) + body
+
+
+def decode(frame) -> dict:
+    """Inverse of encode, for Python clients and the benchmark. Chart data stays column-wise."""
+    if isinstance(frame, str):
+        return json.loads(frame)
+    flags, body = frame[0], frame[1:]
+    if flags & FLAG_COMPRESSED:
+        body = zlib.decompress(body)
+    if flags & FLAG_MSGPACK:
+        return msgpack.unpackb(body)
+    return json.loads(body)
+
+
+class SlowClient(Exception):
+    pass
+
+
+class EventSender:
+    def __init__(self, websocket, protocol, queue_size: int = WIRE_QUEUE_SIZE,
+                 send_timeout: float = WIRE_SEND_TIMEOUT_SECONDS):
+        self.websocket = websocket
+        self.protocol = protocol
+        self.send_timeout = send_timeout
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        # (type, subject) -> the queued [frame] it can still be swapped into
+        self._coalescible = {}
+        self._writer = asyncio.create_task(self._write())
+        self.frames = 0
+        self.coalesced = 0
+        self.bytes_sent = 0
+
+    def _raise_if_closed(self):
+        # The writer only stops when it gave up on the client; surface why
+        if self._writer.done():
+            if not self._writer.cancelled() and self._writer.exception() is not None:
+                raise self._writer.exception()
+            raise SlowClient("Connection closed")
+
+    async def send(self, event: dict):
+        self._raise_if_closed()
+        frame = encode(event, self.protocol)
+        key = None
+        if event.get("type") in COALESCED_EVENTS:
+            key = (event["type"], event.get(COALESCED_EVENTS[event["type"]]))
+            queued = self._coalescible.get(key)
+            if queued is not None:
+                queued[0] = frame
+                self.coalesced += 1
+                return
+        entry = [frame, key]
+        if key is not None:
+            self._coalescible[key] = entry
+        if not self._queue.full():
+            self._queue.put_nowait(entry)
+            return
+        # Backpressure: wait for room, unless the writer gives up on the client meanwhile
+        put = asyncio.create_task(self._queue.put(entry))
+        await asyncio.wait({put, self._writer}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self._raise_if_closed()
+
+    async def _write(self):
+        while True:
+            entry = await self._queue.get()
+            frame, key = entry
+            if key is not None and self._coalescible.get(key) is entry:
+                # Being sent: a newer event for the subject goes out after it
+                del self._coalescible[key]
+            try:
+                if isinstance(frame, str):
+                    await asyncio.wait_for(self.websocket.send_text(frame), self.send_timeout)
+                    self.bytes_sent += len(frame.encode())
+                else:
+                    await asyncio.wait_for(self.websocket.send_bytes(frame), self.send_timeout)
+                    self.bytes_sent += len(frame)
+                self.frames += 1
+            except asyncio.TimeoutError:
+                await self.websocket.close(code=1008, reason="Client too slow")
+                raise SlowClient(f"Send stalled for {self.send_timeout}s")
+            finally:
+                self._queue.task_done()
+
+    async def flush(self):
+        """Waits until everything queued so far is on the wire."""
+        if not self._writer.done():
+            join = asyncio.create_task(self._queue.join())
+            await asyncio.wait({join, self._writer}, return_when=asyncio.FIRST_COMPLETED)
+            join.cancel()
+        self._raise_if_closed()
+
+    async def close(self):
+        self._writer.cancel()
+        try:
+            await self._writer
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "protocol": self.protocol or PROTOCOL_JSON,
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "bytes_sent": self.bytes_sent,
+        }
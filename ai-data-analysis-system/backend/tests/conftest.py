@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The backend is run from its own directory (uvicorn main:app), not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ollama_stub import OllamaStub, serve  # noqa: E402
+
+STUB_LATENCY = 0.2
+
+
+@pytest.fixture(scope="session")
+def ollama_stub():
+    """Base URL of an in-process Ollama stub answering every generation after STUB_LATENCY."""
+    server, base_url = serve(latency=STUB_LATENCY)
+    yield base_url
+    server.shutdown()
+
+
+@pytest.fixture
+def stub_requests():
+    """stub_requests(fn) runs fn and returns how many generations reached the stub."""
+    def count(fn):
+        before = OllamaStub.requests
+        fn()
+        return OllamaStub.requests - before
+    return count
@@ -0,0 +1,122 @@
+import threading
+import time
+
+from benchmarks.ollama_stub import OllamaStub
+from services.llm import LLMService, PromptCache
+
+TARGET = """
+    Given a dataset with these columns and types: {"amount": "float64", "label": "int64"}
+    And the user's analysis task: "predict label"
+    Return EXACTLY JSON: {"target": "column_name", "task_type": "classification_or_regression"}
+    """
+CHART = """
+    Task: "predict label"
+    Columns: ['amount', 'label']
+    Return EXACTLY JSON: {"xKey": "col", "yKey": "col", "type": "bar_chart"}
+    """
+SUMMARY = "Write an executive summary for predict label on columns ['amount', 'label']."
+
+
+def target_prompt(column: str) -> str:
+    return TARGET.replace('"amount"', f'"{column}"')
+
+
+def make_service(ollama_stub, tmp_path, **cache_args) -> LLMService:
+    return LLMService(base_url=ollama_stub, cache=PromptCache(str(tmp_path / "llm.db"), **cache_args))
+
+
+def run_concurrently(fn, count: int) -> list:
+    results = [None] * count
+
+    def call(i):
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def raises(fn) -> bool:
+    try:
+        fn()
+    except Exception:
+        return True
+    return False
+
+
+def test_repeat_prompt_is_served_from_cache(ollama_stub, tmp_path, stub_requests):
+    llm = make_service(ollama_stub, tmp_path)
+    first = llm.complete(TARGET, format="json")
+    assert stub_requests(lambda: [llm.complete(TARGET, format="json") for _ in range(2)]) == 0
+    # Indentation doesn't change the key
+    assert llm.complete(TARGET.replace("\n    ", "\n"), format="json") == first
+    stats = llm.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (3, 1, 1)
+
+
+def test_format_is_part_of_the_key(ollama_stub, tmp_path, stub_requests):
+    llm = make_service(ollama_stub, tmp_path)
+    llm.complete(TARGET, format="json")
+    assert stub_requests(lambda: llm.complete(TARGET)) == 1
+
+
+def test_expired_entry_is_a_miss(ollama_stub, tmp_path, stub_requests):
+    llm = make_service(ollama_stub, tmp_path, ttl_seconds=0.5)
+    assert stub_requests(lambda: llm.complete(TARGET, format="json")) == 1
+    assert stub_requests(lambda: llm.complete(TARGET, format="json")) == 0
+    time.sleep(0.6)
+    assert stub_requests(lambda: llm.complete(TARGET, format="json")) == 1
+    assert llm.cache.stats()["entries"] == 1
+
+
+def test_size_cap_evicts_least_recently_used(ollama_stub, tmp_path, stub_requests):
+    prompts = [target_prompt(f"col_{i}") for i in range(3)]
+    entry_bytes = len(make_service(ollama_stub, tmp_path / "probe").complete(prompts[0], format="json").encode())
+    llm = make_service(ollama_stub, tmp_path, max_bytes=2 * entry_bytes)
+    llm.complete(prompts[0], format="json")
+    llm.complete(prompts[1], format="json")
+    # Touch the older entry so the other one becomes least recently used
+    llm.complete(prompts[0], format="json")
+    llm.complete(prompts[2], format="json")
+
+    stats = llm.cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] <= stats["max_bytes"]
+    assert stub_requests(lambda: llm.complete(prompts[0], format="json")) == 0
+    assert stub_requests(lambda: llm.complete(prompts[1], format="json")) == 1
+
+
+def test_only_parseable_json_is_cached(ollama_stub, tmp_path, stub_requests):
+    llm = make_service(ollama_stub, tmp_path)
+    # The stub answers this prompt in plain text
+    assert stub_requests(lambda: [llm.complete(SUMMARY, format="json") for _ in range(2)]) == 2
+    assert llm.cache.stats()["entries"] == 0
+    # Without format="json" the same text is a valid answer
+    assert stub_requests(lambda: [llm.complete(SUMMARY) for _ in range(2)]) == 1
+
+
+def test_identical_prompts_in_flight_share_one_call(ollama_stub, tmp_path, stub_requests):
+    llm = make_service(ollama_stub, tmp_path)
+    responses = []
+    count = stub_requests(lambda: responses.extend(
+        run_concurrently(lambda i: llm.complete(CHART, format="json", use_cache=False), 8)))
+    assert count == 1 and len(set(responses)) == 1
+    assert llm.calls == 1
+    assert not llm._in_flight
+
+
+def test_failed_call_is_not_left_in_flight(tmp_path):
+    # Nothing listens on port 9
+    llm = LLMService(base_url="http://127.0.0.1:9", cache=PromptCache(str(tmp_path / "llm.db")))
+    failures = run_concurrently(lambda i: raises(lambda: llm.complete(TARGET, format="json")), 4)
+    assert all(failures)
+    assert not llm._in_flight
+
+
+def test_workers_cap_concurrent_calls(ollama_stub, tmp_path):
+    llm = LLMService(base_url=ollama_stub, cache=PromptCache(str(tmp_path / "llm.db")), workers=2)
+    start = time.perf_counter()
+    run_concurrently(lambda i: llm.complete(target_prompt(f"col_{i}"), format="json"), 4)
+    assert time.perf_counter() - start >= 2 * OllamaStub.latency
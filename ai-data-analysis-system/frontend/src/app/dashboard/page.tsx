@@ -4,10 +4,11 @@ import { useState, useRef, useEffect } from "react"
 import { CommandLine } from "@/components/chat/command-line"
 import { AgentStep } from "@/components/analysis/agent-step"
 import { DataViz } from "@/components/analysis/data-viz"
-import { ModelReport } from "@/components/analysis/model-report"
+import { ModelReport, type ModelCacheStatus, type ModelRegistryEntry, type ModelSearch, type ModelSubstitution } from "@/components/analysis/model-report"
+import { WS_PROTOCOLS, decodeFrame } from "@/lib/wire"
 import { Sparkles, Activity, ShieldCheck, Database, BrainCircuit, Wrench } from "lucide-react"
 
-type AgentId = "Orchestrator" | "PrivacyAgent" | "CleanerAgent" | "ModelerAgent" | "AnalystAgent" | "VisualizerAgent"
+type AgentId = "Orchestrator" | "PrivacyAgent" | "CleanerAgent" | "ModelerAgent" | "EDAAgent" | "AnalystAgent" | "VisualizerAgent"
 
 interface LogEvent {
     agent: AgentId;
@@ -21,9 +22,14 @@ interface ModelReportData {
     taskType: string;
     metricName: string;
     allModelScores: Record<string, number>;
+    subsampledScores?: Record<string, number>;
     targetColumn: string;
     numFeatures: number;
     numSamples: number;
+    search?: ModelSearch;
+    substitutions?: ModelSubstitution[];
+    cache?: ModelCacheStatus;
+    registry?: ModelRegistryEntry | null;
 }
 
 export default function DashboardPage() {
@@ -33,40 +39,87 @@ export default function DashboardPage() {
   const [modelReport, setModelReport] = useState<ModelReportData | null>(null)
   const [isProcessing, setIsProcessing] = useState(false)
   const wsRef = useRef<WebSocket | null>(null)
+  const decodingRef = useRef<Promise<void>>(Promise.resolve())
+
+  // Optional minimum time each agent step stays on screen, for demos where a
+  // fast run would otherwise flash by. Off (0) by default.
+  const UI_PACING_MS = Number(process.env.NEXT_PUBLIC_UI_PACING_MS ?? 0)
+  const pendingEventsRef = useRef<any[]>([])
+  const drainingRef = useRef(false)
+
+  const handleEvent = (data: any) => {
+    if (data.type === "agent_state") {
+        setLogs(prev => {
+            if (data.status === "processing") {
+                if (prev.find(l => l.agent === data.agent)) return prev
+                return [...prev, { agent: data.agent, status: 'loading', description: `Running ${data.agent} logic...` }]
+            }
+            const seconds = data.duration_ms !== undefined ? ` in ${(data.duration_ms / 1000).toFixed(2)}s` : ""
+            const description = data.status === "failed" ? `Failed${seconds}: ${data.error}` : `Finished${seconds}`
+            return prev.map(log => log.agent === data.agent ? { ...log, status: 'done' as const, description } : log)
+        })
+    } else if (data.type === "model_score") {
+        const score = data.error ? "failed" : `${data.metric_name} ${data.score}`
+        setLogs(prev => prev.map(log => log.agent === "ModelerAgent" && log.status === 'loading'
+            ? { ...log, description: `Scored ${data.model}: ${score}` } : log))
+    } else if (data.type === "model_report") {
+        setModelReport({
+            bestModelName: data.best_model_name,
+            bestAccuracy: data.best_accuracy,
+            taskType: data.task_type,
+            metricName: data.metric_name,
+            allModelScores: data.all_model_scores,
+            subsampledScores: data.subsampled_scores,
+            targetColumn: data.target_column,
+            numFeatures: data.num_features,
+            numSamples: data.num_samples,
+            search: data.search,
+            substitutions: data.substitutions,
+            cache: data.cache,
+            registry: data.registry,
+        })
+    } else if (data.type === "visualization_array") {
+        // The EDA and model branches each stream their own charts
+        setVizConfigs(prev => [...prev, ...data.configs])
+    } else if (data.type === "conclusion") {
+        setConclusion(data.text)
+    } else if (data.type === "timeline") {
+        setLogs(prev => prev.map(log => data.critical_path.includes(log.agent)
+            ? { ...log, description: `${log.description} · critical path` } : log))
+    } else if (data.type === "done") {
+        setLogs(prev => prev.map(log => ({ ...log, status: 'done' as const })))
+        setIsProcessing(false)
+    }
+  }
+
+  const drainPacedEvents = async () => {
+    if (drainingRef.current) return
+    drainingRef.current = true
+    while (pendingEventsRef.current.length > 0) {
+        const data = pendingEventsRef.current.shift()
+        handleEvent(data)
+        if (data.type === "agent_state" && data.status === "processing") {
+            await new Promise(resolve => setTimeout(resolve, UI_PACING_MS))
+        }
+    }
+    drainingRef.current = false
+  }
 
   const connectWebSocket = () => {
     if (!wsRef.current) {
-      wsRef.current = new WebSocket("ws://localhost:8000/ws")
+      wsRef.current = new WebSocket("ws://localhost:8000/ws", WS_PROTOCOLS)
+      wsRef.current.binaryType = "arraybuffer"
       wsRef.current.onmessage = (event) => {
-        const data = JSON.parse(event.data)
-        
-        if (data.type === "agent_state") {
-            setLogs(prev => {
-                const newLogs: LogEvent[] = prev.map(log => ({ ...log, status: 'done' }))
-                if (!newLogs.find(l => l.agent === data.agent)) {
-                    newLogs.push({ agent: data.agent, status: 'loading', description: `Running ${data.agent} logic...` })
-                }
-                return newLogs
-            })
-        } else if (data.type === "model_report") {
-            setModelReport({
-                bestModelName: data.best_model_name,
-                bestAccuracy: data.best_accuracy,
-                taskType: data.task_type,
-                metricName: data.metric_name,
-                allModelScores: data.all_model_scores,
-                targetColumn: data.target_column,
-                numFeatures: data.num_features,
-                numSamples: data.num_samples,
-            })
-        } else if (data.type === "visualization_array") {
-            setVizConfigs(data.configs)
-        } else if (data.type === "conclusion") {
-            setConclusion(data.text)
-        } else if (data.type === "done") {
-            setLogs(prev => prev.map(log => ({ ...log, status: 'done' as const })))
-            setIsProcessing(false)
-        }
+        // Compressed frames decode asynchronously; chain them to keep event order
+        decodingRef.current = decodingRef.current.then(async () => {
+          const data = await decodeFrame(event.data)
+          if (UI_PACING_MS > 0) {
+              pendingEventsRef.current.push(data)
+              drainPacedEvents()
+          } else {
+              handleEvent(data)
+          }
+        }).catch((err) => console.error("Failed to decode event", err))
       }
     }
   }
@@ -174,9 +227,14 @@ export default function DashboardPage() {
                             taskType={modelReport.taskType}
                             metricName={modelReport.metricName}
                             allModelScores={modelReport.allModelScores}
+                            subsampledScores={modelReport.subsampledScores}
                             targetColumn={modelReport.targetColumn}
                             numFeatures={modelReport.numFeatures}
                             numSamples={modelReport.numSamples}
+                            search={modelReport.search}
+                            substitutions={modelReport.substitutions}
+                            cache={modelReport.cache}
+                            registry={modelReport.registry}
                         />
                     )}
 
@@ -1,4 +1,4 @@
-import { CheckCircle2, Loader2, ShieldCheck, Download, CodeIcon, Search, Wrench, BrainCircuit } from "lucide-react"
+import { CheckCircle2, Loader2, ShieldCheck, Download, CodeIcon, Search, Wrench, BrainCircuit, BarChart3 } from "lucide-react"
 import { Badge } from "@/components/ui/badge"
 
 export function AgentStep({ status, agentName, description }: { status: 'loading' | 'done', agentName: string, description: string }) {
@@ -9,6 +9,7 @@ export function AgentStep({ status, agentName, description }: { status: 'loading
           case 'PrivacyAgent': return <ShieldCheck className="w-4 h-4 text-amber-500" />;
           case 'CleanerAgent': return <Wrench className="w-4 h-4 text-cyan-400" />;
           case 'ModelerAgent': return <BrainCircuit className="w-4 h-4 text-rose-400" />;
+          case 'EDAAgent': return <BarChart3 className="w-4 h-4 text-sky-400" />;
           case 'AnalystAgent': return <CodeIcon className="w-4 h-4 text-purple-500" />;
           case 'VisualizerAgent': return <Download className="w-4 h-4 text-emerald-500" />;
           default: return <Loader2 className="w-4 h-4 text-muted-foreground animate-spin" />;
@@ -12,15 +12,46 @@ import {
   Cell,
 } from "recharts";
 
+export interface ModelSearch {
+  mode: "full" | "halving";
+  rounds: { rows: number; candidates: string[]; seconds: number }[];
+  seconds: number;
+  budget_exhausted: boolean;
+  skipped: string[];
+}
+
+export interface ModelCacheStatus {
+  status: "hit" | "miss";
+  seconds: number;
+  original_seconds?: number;
+}
+
+export interface ModelRegistryEntry {
+  model_id: string;
+  version: number;
+}
+
+export interface ModelSubstitution {
+  original: string;
+  substitute: string;
+  reason: string;
+}
+
 interface ModelReportProps {
   bestModelName: string;
   bestAccuracy: number;
   taskType: string;
   metricName: string;
   allModelScores: Record<string, number>;
+  // Models halving eliminated early, with the rows they were scored on
+  subsampledScores?: Record<string, number>;
   targetColumn: string;
   numFeatures: number;
   numSamples: number;
+  search?: ModelSearch;
+  substitutions?: ModelSubstitution[];
+  cache?: ModelCacheStatus;
+  registry?: ModelRegistryEntry | null;
 }
 
 export function ModelReport({
@@ -29,9 +60,14 @@ export function ModelReport({
   taskType,
   metricName,
   allModelScores,
+  subsampledScores = {},
   targetColumn,
   numFeatures,
   numSamples,
+  search,
+  substitutions = [],
+  cache,
+  registry,
 }: ModelReportProps) {
   // Prepare chart data sorted by score descending
   const chartData = Object.entries(allModelScores)
@@ -40,6 +76,7 @@ export function ModelReport({
       fullName: name,
       score: Number((score * 100).toFixed(2)),
       isBest: name === bestModelName,
+      subsampleRows: subsampledScores[name],
     }))
     .sort((a, b) => b.score - a.score);
 
@@ -121,7 +158,42 @@ export function ModelReport({
             <b className="text-foreground">{Object.keys(allModelScores).length}</b> models
             compared
           </span>
+          {search && (
+            <span>
+              {search.mode === "halving"
+                ? `Successive halving, ${search.rounds.length} rounds`
+                : "Full cross-validation"}{" "}
+              in <b className="text-foreground">{search.seconds}s</b>
+              {search.budget_exhausted && " (time budget reached)"}
+            </span>
+          )}
+          {cache?.status === "hit" && (
+            <span>
+              Reused cached models in <b className="text-foreground">{cache.seconds}s</b>
+              {cache.original_seconds !== undefined && ` (first run took ${cache.original_seconds}s)`}
+            </span>
+          )}
+          {registry && (
+            <span>
+              Serving as{" "}
+              <b className="text-foreground">
+                {registry.model_id} v{registry.version}
+              </b>
+            </span>
+          )}
         </div>
+
+        {/* Candidates swapped for scalable equivalents on large data */}
+        {substitutions.length > 0 && (
+          <ul className="relative mt-3 space-y-1 text-xs text-muted-foreground">
+            {substitutions.map((sub) => (
+              <li key={sub.original}>
+                <b className="text-foreground">{sub.substitute}</b> ran instead of {sub.original}{" "}
+                <span className="opacity-70">({sub.reason})</span>
+              </li>
+            ))}
+          </ul>
+        )}
       </div>
 
       {/* Model Comparison Chart */}
@@ -176,7 +248,11 @@ export function ModelReport({
                     fontSize: "12px",
                   }}
                   formatter={(value: any, _name: any, props: any) => [
-                    `${value}% ${props.payload.isBest ? "🏆 BEST" : ""}`,
+                    `${value}% ${props.payload.isBest ? "🏆 BEST" : ""}${
+                      props.payload.subsampleRows !== undefined
+                        ? `(scored on ${props.payload.subsampleRows} rows${props.payload.isBest ? "" : ", eliminated early"})`
+                        : ""
+                    }`,
                     props.payload.fullName,
                   ]}
                 />
@@ -194,6 +270,7 @@ export function ModelReport({
                           ? "url(#bestGradient)"
                           : "hsl(var(--muted-foreground)/0.25)"
                       }
+                      fillOpacity={entry.subsampleRows !== undefined ? 0.5 : 1}
                     />
                   ))}
                 </Bar>
@@ -0,0 +1,36 @@
+// Client side of backend/services/wire.py: decodes /ws frames in the
+// "analysis.v2+json" protocol (or plain JSON when the server picked none).
+// Under backpressure the server never drops an event; it may only skip a
+// model_score superseded by a newer one for the same model (COALESCED_EVENTS),
+// so the last score received per model is current.
+
+export const WS_PROTOCOLS = ["analysis.v2+json", "json"]
+
+const FLAG_COMPRESSED = 0x01
+
+async function inflate(body: Uint8Array): Promise<string> {
+  const stream = new Blob([body as BlobPart]).stream().pipeThrough(new DecompressionStream("deflate"))
+  return new Response(stream).text()
+}
+
+// Chart configs arrive column-wise; Recharts wants one record per point
+function rowwise(event: any): any {
+  if (!Array.isArray(event?.configs)) return event
+  const configs = event.configs.map((config: any) => {
+    if (!config?.columns) return config
+    const { columns, ...rest } = config
+    const keys = Object.keys(columns)
+    const length = keys.length ? columns[keys[0]].length : 0
+    const data = Array.from({ length }, (_, i) => Object.fromEntries(keys.map((k) => [k, columns[k][i]])))
+    return { ...rest, data }
+  })
+  return { ...event, configs }
+}
+
+export async function decodeFrame(frame: string | ArrayBuffer): Promise<any> {
+  if (typeof frame === "string") return rowwise(JSON.parse(frame))
+  const bytes = new Uint8Array(frame)
+  const body = bytes.subarray(1)
+  const text = bytes[0] & FLAG_COMPRESSED ? await inflate(body) : new TextDecoder().decode(body)
+  return rowwise(JSON.parse(text))
+}
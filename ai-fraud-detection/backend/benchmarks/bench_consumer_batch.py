@@ -0,0 +1,177 @@
+"""
+Consumer throughput at different batch sizes. Kafka is replaced by an
+in-process fake that hands out pre-serialized transactions; scoring,
+velocity tracking and publishing run for real against the Redis at
+REDIS_HOST:REDIS_PORT (the docker-compose one, or any local redis-server).
+
+It first checks that a batch Redis fails to publish is not committed: the
+partitions are rewound and every transaction ends up published exactly once.
+
+Run from ai-fraud-detection/backend:
+    python -m benchmarks.bench_consumer_batch --messages 20000
+"""
+import argparse
+import json
+import time
+
+import redis
+from confluent_kafka import TopicPartition
+
+from streaming import consumer as fraud_consumer
+from streaming.producer import generate_transaction
+
+
+class FakeMessage:
+    def __init__(self, value: bytes, partition: int, offset: int):
+        self._value = value
+        self._partition = partition
+        self._offset = offset
+
+    def error(self):
+        return None
+
+    def value(self):
+        return self._value
+
+    def topic(self):
+        return fraud_consumer.TOPIC
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+
+class FakeConsumer:
+    """
+    Serves a fixed list of messages through consume() and records commits,
+    assignments and positions, like a consumer of a broker holding only them.
+    """
+
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.cursor = 0
+        self.commits = 0
+        self.committed_offsets = {}
+        self.assigned = []
+        self.positions = {}
+        self.high_watermarks = {}
+        for msg in messages:
+            self.high_watermarks[(msg.topic(), msg.partition())] = msg.offset() + 1
+
+    def consume(self, num_messages=1, timeout=-1):
+        batch = self.messages[self.cursor:self.cursor + num_messages]
+        self.cursor += len(batch)
+        if not batch and timeout > 0:
+            # Like a poll of a drained topic
+            time.sleep(timeout)
+        for msg in batch:
+            self.positions[(msg.topic(), msg.partition())] = msg.offset() + 1
+        return batch
+
+    def commit(self, offsets=None, asynchronous=True):
+        self.commits += 1
+        for tp in offsets or []:
+            self.committed_offsets[(tp.topic, tp.partition)] = tp.offset
+
+    def committed(self, partitions, timeout=None):
+        return [TopicPartition(tp.topic, tp.partition, self.committed_offsets.get((tp.topic, tp.partition), -1001))
+                for tp in partitions]
+
+    def assign(self, partitions):
+        self.assigned = list(partitions)
+
+    def assignment(self):
+        return list(self.assigned)
+
+    def position(self, partitions):
+        return [TopicPartition(tp.topic, tp.partition, self.positions.get((tp.topic, tp.partition), -1001))
+                for tp in partitions]
+
+    def get_watermark_offsets(self, partition, timeout=None, cached=False):
+        return 0, self.high_watermarks.get((partition.topic, partition.partition), 0)
+
+    def seek(self, partition):
+        # Hands out the partition's messages from partition.offset again
+        key = (partition.topic, partition.partition)
+        done, rest = self.messages[:self.cursor], self.messages[self.cursor:]
+        again = [msg for msg in done if (msg.topic(), msg.partition()) == key and msg.offset() >= partition.offset]
+        self.messages = done + again + rest
+        self.positions[key] = partition.offset
+
+    def close(self):
+        pass
+
+
+def make_messages(count: int, partitions: int = 4) -> list:
+    messages = []
+    for i in range(count):
+        tx = generate_transaction()
+        messages.append(FakeMessage(json.dumps(tx).encode("utf-8"), i % partitions, i // partitions))
+    return messages
+
+
+def check_unpublished_not_committed():
+    messages = make_messages(200, partitions=2)
+    fake = FakeConsumer(messages)
+    published = []
+    publish_results = fraud_consumer.publish_results
+    retry_seconds = fraud_consumer.PUBLISH_RETRY_SECONDS
+
+    def redis_down(txs):
+        raise redis.ConnectionError("Redis is down")
+
+    def counted(txs):
+        publish_results(txs)
+        published.extend(tx["transaction_id"] for tx in txs)
+
+    fraud_consumer.PUBLISH_RETRY_SECONDS = 0
+    try:
+        fraud_consumer.publish_results = redis_down
+        fraud_consumer.handle_batch(fake.consume(num_messages=100), kafka_consumer=fake)
+        assert all(offset == 0 for offset in fake.committed_offsets.values()), fake.committed_offsets
+        if fraud_consumer.feature_store is not None:
+            assert all(w.offset == 0 for w in fraud_consumer.feature_store.partitions.values())
+        fraud_consumer.publish_results = counted
+        while fake.cursor < len(fake.messages):
+            fraud_consumer.handle_batch(fake.consume(num_messages=100), kafka_consumer=fake)
+    finally:
+        fraud_consumer.publish_results = publish_results
+        fraud_consumer.PUBLISH_RETRY_SECONDS = retry_seconds
+    assert sorted(published) == sorted(json.loads(m.value())["transaction_id"] for m in messages), \
+        "transactions lost or published twice"
+    assert fake.committed_offsets == {(fraud_consumer.TOPIC, 0): 100, (fraud_consumer.TOPIC, 1): 100}
+    print("check passed: a batch that failed to publish was rewound, not committed")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--batch-sizes", default="1,10,100,500,2000")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    fraud_consumer.connect()
+    fraud_consumer.r.flushdb()
+    check_unpublished_not_committed()
+    fraud_consumer.r.flushdb()
+    if fraud_consumer.feature_store is not None:
+        fraud_consumer.feature_store.partitions.clear()
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        # Batch size 1 is the old poll-one-message loop
+        count = args.messages if batch_size > 1 else min(args.messages, 2_000)
+        fake = FakeConsumer(messages[:count])
+        start = time.perf_counter()
+        while fake.cursor < count:
+            fraud_consumer.handle_batch(fake.consume(num_messages=batch_size), kafka_consumer=fake)
+        elapsed = time.perf_counter() - start
+        print(f"batch {batch_size:>5}: {count / elapsed:8.0f} tx/s "
+              f"({elapsed / count * 1e6:7.1f} us/tx, {fake.commits} commits)")
+        fraud_consumer.r.flushdb()
+        if fraud_consumer.feature_store is not None:
+            fraud_consumer.feature_store.partitions.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Velocity lookups from the in-process feature store against the Redis
+velocity script, and the store's behaviour across a rebalance.
+
+  1. parity: both give the same (late, counts) for a stream with
+     out-of-order, late and redelivered transactions
+  2. per-event velocity latency: the script per tx, the script pipelined
+     per batch of 500, and the local store, also with two heavy users
+     (thousands of events each in their hour window)
+  3. consumer throughput through handle_batch with either store (the
+     results are still published to Redis in one pipeline per batch)
+  4. rebalance: a partition handed over cleanly (on_revoke, then on_assign
+     in a new store) and one whose owner died between checkpoints (replayed
+     from the checkpoint); both must end with the same windows as a store
+     that kept the partition all along
+
+Needs the redis-server at REDIS_HOST:REDIS_PORT.
+
+Run from ai-fraud-detection/backend:
+    python -m benchmarks.bench_feature_store --events 20000
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import redis
+from confluent_kafka import TopicPartition
+
+from benchmarks.bench_consumer_batch import FakeConsumer, FakeMessage
+from streaming import consumer as fraud_consumer
+from streaming.feature_store import FeatureStore
+from streaming.producer import generate_transaction
+
+fraud_consumer.connect()
+r = fraud_consumer.r
+TOPIC = fraud_consumer.TOPIC
+PARTITIONS = 4
+
+
+def new_store() -> FeatureStore:
+    return FeatureStore(redis.Redis(host=fraud_consumer.REDIS_HOST, port=fraud_consumer.REDIS_PORT),
+                        fraud_consumer.VELOCITY_WINDOWS, fraud_consumer.ALLOWED_LATENESS_SECONDS,
+                        fraud_consumer.VELOCITY_RETENTION_SECONDS, checkpoint_seconds=0.5)
+
+
+def make_stream(count: int, users: int = 200) -> list:
+    """Transactions over about two hours of event time, some out of order, late or redelivered."""
+    start = datetime(2026, 1, 1)
+    txs = []
+    for i in range(count):
+        tx = generate_transaction()
+        tx["user_id"] = f"user_{random.randint(1, users)}"
+        jitter = random.choice([0, 0, 0, 0, -5, -30, -120])
+        tx["timestamp"] = (start + timedelta(seconds=i * 7200 / count + jitter)).isoformat()
+        txs.append(tx)
+        if random.random() < 0.02:
+            txs.append(dict(tx))
+    return txs
+
+
+def partition_of(tx) -> int:
+    # Not the broker's murmur2, only stable per user like it
+    return zlib.crc32(tx["user_id"].encode()) % PARTITIONS
+
+
+def check_parity(txs: list):
+    r.flushdb()
+    store = new_store()
+    script = fraud_consumer.update_velocities(txs)
+    local = [store.update(TOPIC, partition_of(tx), tx["user_id"], fraud_consumer.event_time_ms(tx),
+                          fraud_consumer.compact_member(tx)) for tx in txs]
+    assert script == local, "local store and velocity script disagree"
+    late = sum(l for l, _ in local)
+    print(f"parity: {len(txs)} events ({late} late) give identical counts from both stores")
+
+
+def velocity_latency(txs: list):
+    def report(label, per_event):
+        p50, p99 = np.percentile(per_event, [50, 99]) * 1e6
+        print(f"{label:<28} p50 {p50:8.2f} us  p99 {p99:8.2f} us  ({1 / np.mean(per_event):9.0f} events/s)")
+
+    r.flushdb()
+    latencies = []
+    for tx in txs[:5000]:
+        t0 = time.perf_counter()
+        fraud_consumer.update_velocities([tx])
+        latencies.append(time.perf_counter() - t0)
+    report("script, per tx", latencies)
+
+    r.flushdb()
+    latencies = []
+    for i in range(0, len(txs), 500):
+        batch = txs[i:i + 500]
+        t0 = time.perf_counter()
+        fraud_consumer.update_velocities(batch)
+        latencies += [(time.perf_counter() - t0) / len(batch)] * len(batch)
+    report("script, pipelined per 500", latencies)
+
+    store = new_store()
+    latencies = []
+    for tx in txs:
+        t0 = time.perf_counter()
+        store.update(TOPIC, partition_of(tx), tx["user_id"], fraud_consumer.event_time_ms(tx),
+                     fraud_consumer.compact_member(tx))
+        latencies.append(time.perf_counter() - t0)
+    report("local feature store", latencies)
+
+    heavy = make_stream(len(txs), users=2)
+    store = new_store()
+    latencies = []
+    for tx in heavy:
+        t0 = time.perf_counter()
+        store.update(TOPIC, partition_of(tx), tx["user_id"], fraud_consumer.event_time_ms(tx),
+                     fraud_consumer.compact_member(tx))
+        latencies.append(time.perf_counter() - t0)
+    report("local store, 2 heavy users", latencies)
+
+
+def make_messages(txs: list) -> list:
+    offsets = [0] * PARTITIONS
+    messages = []
+    for tx in txs:
+        partition = partition_of(tx)
+        messages.append(FakeMessage(json.dumps(tx).encode("utf-8"), partition, offsets[partition]))
+        offsets[partition] += 1
+    return messages
+
+
+def consumer_throughput(txs: list):
+    messages = make_messages(txs)
+    local_store = fraud_consumer.feature_store or new_store()
+    for label, store in (("script + pipeline", None), ("local feature store", local_store)):
+        r.flushdb()
+        fraud_consumer.feature_store = store
+        fake = FakeConsumer(messages)
+        start = time.perf_counter()
+        while fake.cursor < len(messages):
+            fraud_consumer.handle_batch(fake.consume(num_messages=500), kafka_consumer=fake)
+        elapsed = time.perf_counter() - start
+        print(f"handle_batch, {label:<21} {len(messages) / elapsed:8.0f} tx/s")
+    fraud_consumer.feature_store = local_store
+    if local_store is not None:
+        local_store.flush()
+
+
+def consume_all(store: FeatureStore, fake: FakeConsumer, messages: list):
+    """handle_batch's bookkeeping for the store, without scoring or publishing."""
+    for msg in messages:
+        source = (msg.topic(), msg.partition())
+        tx = json.loads(msg.value())
+        if not store.replaying(*source, msg.offset()):
+            fake.committed_offsets[source] = msg.offset() + 1
+        store.update(*source, tx["user_id"], fraud_consumer.event_time_ms(tx), fraud_consumer.compact_member(tx))
+        store.advance(*source, msg.offset() + 1)
+
+
+def windows_of(store: FeatureStore, partition: int) -> dict:
+    return {user: (list(w.times), list(w.members)) for user, w in store.partitions[(TOPIC, partition)].users.items()}
+
+
+def check_rebalance(txs: list):
+    messages = [m for m in make_messages(txs) if m.partition() == 0]
+    tp = [TopicPartition(TOPIC, 0)]
+    half = len(messages) // 2
+
+    reference = new_store()
+    consume_all(reference, FakeConsumer([]), messages)
+    expected = windows_of(reference, 0)
+
+    # Clean handover: the old owner checkpoints on revocation
+    r.flushdb()
+    fake = FakeConsumer([])
+    old = new_store()
+    old.on_assign(fake, [TopicPartition(TOPIC, 0)])
+    consume_all(old, fake, messages[:half])
+    t0 = time.perf_counter()
+    old.on_revoke(fake, tp)
+    revoke = time.perf_counter() - t0
+    new = new_store()
+    t0 = time.perf_counter()
+    new.on_assign(fake, [TopicPartition(TOPIC, 0)])
+    assign = time.perf_counter() - t0
+    assert fake.assigned[0].offset < 0, "a clean handover should not replay"
+    consume_all(new, fake, messages[half:])
+    assert windows_of(new, 0) == expected, "windows differ after a clean handover"
+    print(f"clean handover: {len(expected)} users, "
+          f"revoke (checkpoint + commit) {revoke * 1e3:.1f} ms, assign (restore) {assign * 1e3:.1f} ms, "
+          f"windows match")
+
+    # The owner checkpoints at a quarter, keeps going, and dies at a half
+    r.flushdb()
+    fake = FakeConsumer([])
+    dead = new_store()
+    dead.on_assign(fake, [TopicPartition(TOPIC, 0)])
+    consume_all(dead, fake, messages[:half // 2])
+    dead.checkpoint()
+    dead.flush()
+    consume_all(dead, fake, messages[half // 2:half])
+    new = new_store()
+    new.on_assign(fake, [TopicPartition(TOPIC, 0)])
+    rewound = fake.assigned[0].offset
+    assert rewound == half // 2, f"expected a rewind to {half // 2}, got {rewound}"
+    replayed = sum(new.replaying(TOPIC, 0, m.offset()) for m in messages[rewound:])
+    consume_all(new, fake, messages[rewound:])
+    assert windows_of(new, 0) == expected, "windows differ after replaying a dead owner's gap"
+    assert fake.committed_offsets[(TOPIC, 0)] == len(messages)
+    print(f"dead owner: rewound to offset {rewound}, replayed {replayed} messages into the windows, windows match")
+    r.flushdb()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20_000)
+    args = parser.parse_args()
+
+    random.seed(7)
+    txs = make_stream(args.events)
+    check_parity(txs)
+    velocity_latency(txs)
+    consumer_throughput(txs)
+    check_rebalance(txs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Redis cost of velocity tracking and publishing per transaction: the old
+sequential calls (zadd, zremrangebyscore, expire, zcard, then publish,
+lpush, ltrim, ...) against the velocity script plus one pipeline per batch.
+
+Reports per-event latency for single transactions (p50 / p99), and batched
+throughput with the Redis commands it takes per second, read from
+INFO's total_commands_processed. Needs the redis-server at
+REDIS_HOST:REDIS_PORT.
+
+Run from ai-fraud-detection/backend:
+    python -m benchmarks.bench_redis_pipeline --events 5000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from streaming import consumer as fraud_consumer
+from streaming.producer import generate_transaction
+
+fraud_consumer.connect()
+r = fraud_consumer.r
+
+
+def legacy_process(tx):
+    """The per-transaction Redis traffic before batching, with the score left out."""
+    current_time = time.time()
+    redis_key = f"user_tx_history:{tx['user_id']}"
+    r.zadd(redis_key, {json.dumps(tx): current_time})
+    r.zremrangebyscore(redis_key, 0, current_time - 600)
+    r.expire(redis_key, 600)
+    tx['velocity'] = r.zcard(redis_key)
+    tx['is_fraud'] = tx['amount'] > 3000
+    r.publish('fraud_alerts_channel', json.dumps(tx))
+    r.lpush('recent_transactions', json.dumps(tx))
+    r.ltrim('recent_transactions', 0, 99)
+    if tx['is_fraud']:
+        r.lpush('recent_alerts', json.dumps(tx))
+        r.ltrim('recent_alerts', 0, 99)
+
+
+def pipelined_process(txs):
+    windows = fraud_consumer.update_velocities(txs)
+    for tx, (_, counts) in zip(txs, windows):
+        tx['velocity'] = counts[fraud_consumer.MODEL_WINDOW]
+        tx['is_fraud'] = tx['amount'] > 3000
+    fraud_consumer.publish_results(txs)
+
+
+def commands_processed() -> int:
+    return r.info("stats")["total_commands_processed"]
+
+
+def run(label: str, events: list, batch_size: int, process):
+    r.flushdb()
+    latencies = []
+    commands = commands_processed()
+    start = time.perf_counter()
+    for i in range(0, len(events), batch_size):
+        batch = [dict(tx) for tx in events[i:i + batch_size]]
+        t0 = time.perf_counter()
+        process(batch)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    # Minus the INFO call itself
+    commands = commands_processed() - commands - 1
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    print(f"{label:<28} batch {batch_size:>4}: {len(events) / elapsed:8.0f} tx/s, "
+          f"{commands / elapsed:8.0f} Redis ops/s, {commands / len(events):5.2f} ops/tx, "
+          f"batch latency p50 {p50:7.0f} us p99 {p99:7.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=5_000)
+    args = parser.parse_args()
+
+    events = [generate_transaction() for _ in range(args.events)]
+    fraud_consumer.r.script_flush()
+    run("sequential calls", events, 1, lambda batch: legacy_process(batch[0]))
+    for batch_size in (1, 10, 100, 500):
+        run("script + pipeline", events, batch_size, pipelined_process)
+    r.flushdb()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Consumer throughput as streaming/runner.py goes from 1 to 16 worker
+processes.
+
+The broker stand-in is 16 partitions of pre-serialized transactions, keyed
+by user like the producer keys them. The partitions are split between the
+workers the way Kafka's range assignor would, and each worker reads its
+own through the FakeConsumer of bench_consumer_batch. Scoring, the feature
+store and publishing run for real, against the Redis at
+REDIS_HOST:REDIS_PORT, so one redis-server is shared by all workers.
+
+Also shows how much memory each worker has to itself (private pages, from
+/proc/<pid>/smaps_rollup) next to the runner's RSS: the model and the
+stand-in's messages are shared copy-on-write.
+
+Run from ai-fraud-detection/backend:
+    python -m benchmarks.bench_runner_scaling --messages 100000
+"""
+import argparse
+import json
+import os
+import time
+import zlib
+
+from confluent_kafka import TopicPartition
+
+from benchmarks.bench_consumer_batch import FakeConsumer, FakeMessage
+from streaming import consumer as fraud_consumer
+from streaming.producer import generate_transaction
+from streaming.runner import Runner
+
+PARTITIONS = 16
+
+# Built before the workers fork; they read it copy-on-write
+partition_messages = {}
+worker_count = 1
+
+
+def make_partitions(count: int) -> dict:
+    partitions = {p: [] for p in range(PARTITIONS)}
+    for _ in range(count):
+        tx = generate_transaction()
+        partition = zlib.crc32(tx["user_id"].encode()) % PARTITIONS
+        partitions[partition].append(FakeMessage(json.dumps(tx).encode("utf-8"), partition,
+                                                 len(partitions[partition])))
+    return partitions
+
+
+def assigned_partitions(index: int, workers: int) -> list:
+    """The range assignor's share of worker index; empty for workers beyond the partition count."""
+    return list(range(index * PARTITIONS // workers, (index + 1) * PARTITIONS // workers))
+
+
+def stand_in_consumer(index: int) -> FakeConsumer:
+    partitions = assigned_partitions(index, worker_count)
+    # Interleaved, as a consumer fetching from several partitions sees them
+    queues = [partition_messages[p] for p in partitions]
+    messages = [msg for group in zip(*queues) for msg in group]
+    shortest = min((len(q) for q in queues), default=0)
+    messages += [msg for q in queues for msg in q[shortest:]]
+    fake = FakeConsumer(messages)
+    tps = [TopicPartition(fraud_consumer.TOPIC, p) for p in partitions]
+    if fraud_consumer.feature_store is not None:
+        fraud_consumer.feature_store.on_assign(fake, tps)
+    else:
+        fake.assign(tps)
+    return fake
+
+
+def private_mib(pid: int):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as fh:
+            fields = dict(line.split(":", 1) for line in fh if ":" in line)
+    except OSError:
+        return None
+    kb = sum(int(fields[k].split()[0]) for k in ("Private_Clean", "Private_Dirty") if k in fields)
+    return kb / 1024
+
+
+def rss_mib() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def main():
+    global partition_messages, worker_count
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--workers", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    partition_messages = make_partitions(args.messages)
+    fraud_consumer.connect()
+    print(f"{os.cpu_count()} CPUs, {PARTITIONS} partitions, {args.messages} messages, "
+          f"runner RSS {rss_mib():.0f} MiB")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        fraud_consumer.r.flushdb()
+        worker_count = workers
+        runner = Runner(workers, report_seconds=0.2, consumer_factory=stand_in_consumer, verbose=False)
+        start = time.perf_counter()
+        runner.start()
+        processed = 0
+        while processed < args.messages and time.perf_counter() - start < 600:
+            runner.collect(0.05)
+            processed = sum(report["processed"] for report in runner.health.values())
+        elapsed = time.perf_counter() - start
+        private = [private_mib(process.pid) for process in runner.workers.values()]
+        runner.shutdown()
+        rate = processed / elapsed
+        baseline = baseline or rate
+        memory = f", {max(private):5.1f} MiB private per worker" if None not in private else ""
+        print(f"{workers:>2} workers: {rate:8.0f} tx/s ({rate / baseline:4.2f}x){memory}")
+    fraud_consumer.r.flushdb()
+
+
+if __name__ == "__main__":
+    main()
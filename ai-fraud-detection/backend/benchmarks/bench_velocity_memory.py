@@ -0,0 +1,87 @@
+"""
+Redis memory of the velocity windows per 100k active users: the old layout
+(the full transaction JSON as Sorted Set member, 10-minute window) against
+the 8-byte members and millisecond scores the velocity script keeps
+(1-hour retention for the 1m / 10m / 1h windows plus the allowed lateness).
+
+Every user makes --rate transactions per 10 minutes. The new layout is
+shown both for the same events (member size alone) and at steady state,
+where it holds six times as many of them. Keys are written with plain
+ZADDs of the same shape the consumer produces, which is much faster than
+running the script per event. Needs the redis-server at
+REDIS_HOST:REDIS_PORT; it is flushed.
+
+Run from ai-fraud-detection/backend:
+    python -m benchmarks.bench_velocity_memory --users 100000 --rate 5
+"""
+import argparse
+import json
+import time
+
+from streaming import consumer as fraud_consumer
+from streaming.producer import generate_transaction
+
+fraud_consumer.connect()
+r = fraud_consumer.r
+
+
+def used_memory() -> int:
+    return r.info("memory")["used_memory"]
+
+
+def old_layout(tx, now):
+    return json.dumps(tx), now
+
+
+def new_layout(tx, now):
+    return fraud_consumer.compact_member(tx), int(now * 1000)
+
+
+def load(users: int, events_per_user: int, span_seconds: float, layout, ttl: int) -> int:
+    """Bytes used by users Sorted Sets of events_per_user members spread over span_seconds."""
+    r.flushdb()
+    before = used_memory()
+    now = time.time()
+    pipe = r.pipeline(transaction=False)
+    for u in range(users):
+        mapping = {}
+        for i in range(events_per_user):
+            tx = generate_transaction()
+            tx["user_id"] = f"user_{u}"
+            member, score = layout(tx, now - span_seconds * i / events_per_user)
+            mapping[member] = score
+        key = f"user_tx_history:user_{u}"
+        pipe.zadd(key, mapping)
+        pipe.expire(key, ttl)
+        if u % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+    used = used_memory() - before
+    r.flushdb()
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--rate", type=int, default=5, help="transactions per user per 10 minutes")
+    args = parser.parse_args()
+
+    scale = 100_000 / args.users
+    hours = fraud_consumer.VELOCITY_RETENTION_SECONDS / 600
+    layouts = [
+        ("old: JSON members, 10m", args.rate, 600, old_layout, 600),
+        ("new: same events", args.rate, 600, new_layout, fraud_consumer.VELOCITY_RETENTION_SECONDS),
+        ("new: 1h steady state", int(args.rate * hours), fraud_consumer.VELOCITY_RETENTION_SECONDS,
+         new_layout, fraud_consumer.VELOCITY_RETENTION_SECONDS),
+    ]
+    baseline = None
+    for label, events, span, member, ttl in layouts:
+        used = load(args.users, events, span, member, ttl) * scale
+        baseline = baseline or used
+        print(f"{label:<24} {events:3d} events/user: {used / 2**20:8.1f} MiB per 100k users "
+              f"({used / baseline:5.1%}), {used / 100_000 / events:5.1f} B/event")
+
+
+if __name__ == "__main__":
+    main()
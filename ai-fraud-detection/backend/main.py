@@ -57,6 +57,16 @@ async def get_stats():
             "alerts_last_100": 0
         }
 
+@app.get("/api/consumers")
+async def get_consumers():
+    """Health and lag of each consumer worker, as last reported to the runner"""
+    try:
+        workers = await redis_client.hgetall('consumer_workers')
+        return sorted((json.loads(w) for w in workers.values()), key=lambda w: w['worker'])
+    except Exception as e:
+        print(f"Redis error: {e}")
+        return []
+
 @app.websocket("/ws/stream")
 async def websocket_stream(websocket: WebSocket):
     await websocket.accept()
@@ -1,19 +1,78 @@
+import hashlib
 import json
 import time
 import os
+from datetime import datetime, timezone
 import joblib
+import numpy as np
 import pandas as pd
 import redis
-from confluent_kafka import Consumer, KafkaError
+from confluent_kafka import Consumer, KafkaError, KafkaException, TopicPartition
+
+try:
+    from streaming.feature_store import FeatureStore
+except ImportError:  # run as a script from the streaming directory
+    from feature_store import FeatureStore
 
 KAFKA_BROKER = 'localhost:9092'
 TOPIC = 'transactions'
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 
-r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+# Messages scored together, and how long to wait for a batch to fill up
+BATCH_SIZE = int(os.getenv('CONSUMER_BATCH_SIZE', '500'))
+BATCH_LINGER_MS = float(os.getenv('CONSUMER_BATCH_LINGER_MS', '50'))
+# Pause before a batch that could not be published is consumed again
+PUBLISH_RETRY_SECONDS = float(os.getenv('CONSUMER_PUBLISH_RETRY_SECONDS', '1'))
+
+# Velocity = transactions of the user within each window before the
+# transaction's own timestamp (event time, not arrival time)
+VELOCITY_WINDOWS = {'1m': 60, '10m': 600, '1h': 3600}
+# The window the model was trained on
+MODEL_WINDOW = '10m'
+# How far behind the user's newest transaction an event may arrive and still be counted
+ALLOWED_LATENESS_SECONDS = int(os.getenv('VELOCITY_ALLOWED_LATENESS_SECONDS', '60'))
+VELOCITY_RETENTION_SECONDS = max(VELOCITY_WINDOWS.values()) + ALLOWED_LATENESS_SECONDS
+
+# One atomic round-trip per tx on the user's Sorted Set of compact
+# transaction ids scored by event time in milliseconds (integer scores and
+# short members keep small sets in Redis' compact listpack encoding):
+#   - adds the tx, unless it is later than the allowed lateness (then it is
+#     only scored, and flagged late)
+#   - drops ids older than the retention behind the newest event, renews the expiry
+#   - returns {late, count per window}, each window ending at the tx's own time
+VELOCITY_SCRIPT = """
+local ts = tonumber(ARGV[1])
+local lateness = tonumber(ARGV[3])
+local retention = tonumber(ARGV[4])
+local newest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')[2]
+newest = newest and tonumber(newest) or ts
+local late = 0
+-- Counted on top of the set when it is not in there
+local self = 0
+if ts < newest - lateness then
+    late = 1
+    if not redis.call('ZSCORE', KEYS[1], ARGV[2]) then
+        self = 1
+    end
+else
+    redis.call('ZADD', KEYS[1], ts, ARGV[2])
+    newest = math.max(newest, ts)
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. (newest - retention))
+    redis.call('PEXPIRE', KEYS[1], retention)
+end
+local result = {late}
+for i = 5, #ARGV do
+    result[#result + 1] = redis.call('ZCOUNT', KEYS[1], '(' .. (ts - tonumber(ARGV[i])), ts) + self
+end
+return result
+"""
+
+# "local" counts velocities in the consumer's memory, per owned partition,
+# with Redis only as the checkpoint; "redis" runs the script for every tx
+VELOCITY_STORE = os.getenv('VELOCITY_STORE', 'local')
 
-# Load Model
+# Load Model (at import: the runner loads it once and its forked workers share it)
 model_path = os.path.join(os.path.dirname(__file__), '../ml/isolation_forest.pkl')
 try:
     model = joblib.load(model_path)
@@ -22,85 +81,260 @@ except FileNotFoundError:
     print(f"Warning: Model not found at {model_path}. Please run train_model.py first.")
     model = None
 
-# Initialize Kafka Consumer
+# Kafka Consumer settings
 conf = {
     'bootstrap.servers': KAFKA_BROKER,
     'group.id': 'fraud_detection_group',
-    'auto.offset.reset': 'latest'
+    'auto.offset.reset': 'latest',
+    # Offsets are committed once a batch's results are published
+    'enable.auto.commit': False
 }
-consumer = Consumer(**conf)
-consumer.subscribe([TOPIC])
 
-def process_transaction(tx):
-    user_id = tx['user_id']
-    amount = tx['amount']
-    timestamp = tx['timestamp']
-    
-    # Use Redis to keep track of user transaction velocity in the last 10 minutes (600 seconds)
-    # We use a Sorted Set where score is timestamp
-    current_time = time.time()
-    redis_key = f"user_tx_history:{user_id}"
-    
-    # Add current tx
-    r.zadd(redis_key, {json.dumps(tx): current_time})
-    # Remove older than 10 minutes
-    r.zremrangebyscore(redis_key, 0, current_time - 600)
-    # Set expiry on key to 10 mins so we don't leak memory
-    r.expire(redis_key, 600)
-    
-    # Get velocity
-    velocity = r.zcard(redis_key)
-    
-    is_fraud = False
-    
-    if model:
-        # Prepare features
-        X = pd.DataFrame({'amount': [amount], 'velocity': [velocity]})
-        # predict returns 1 for inliers, -1 for outliers
-        prediction = model.predict(X)[0]
-        if prediction == -1:
-            is_fraud = True
-            
-    # Add score and fraud status to tx
-    tx['velocity'] = velocity
-    tx['is_fraud'] = is_fraud
-    
-    publish_result(tx)
+# Per process, from connect() and create_consumer(): neither connections
+# nor librdkafka's threads survive a fork
+r = None
+velocity_script = None
+feature_store = None
+consumer = None
+
+def connect(velocity_store=VELOCITY_STORE):
+    """Creates this process's Redis client and, for the local velocity store, its feature store"""
+    global r, velocity_script, feature_store
+    r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    velocity_script = r.register_script(VELOCITY_SCRIPT)
+    if velocity_store == 'local':
+        # Checkpoints are binary, so this client doesn't decode responses
+        feature_store = FeatureStore(redis.Redis(host=REDIS_HOST, port=REDIS_PORT), VELOCITY_WINDOWS,
+                                     ALLOWED_LATENESS_SECONDS, VELOCITY_RETENTION_SECONDS)
+    else:
+        feature_store = None
+
+def create_consumer(**overrides):
+    """Joins the consumer group; overrides are extra Kafka settings"""
+    global consumer
+    consumer = Consumer(**{**conf, **overrides})
+    if feature_store is not None:
+        # The windows follow the partitions: restored on assignment, checkpointed on revocation
+        consumer.subscribe([TOPIC], on_assign=feature_store.on_assign, on_revoke=feature_store.on_revoke,
+                           on_lost=feature_store.on_lost)
+    else:
+        consumer.subscribe([TOPIC])
+    return consumer
+
+def close_consumer():
+    """
+    Leaves the group, checkpointing the windows and committing the offsets
+    of the owned partitions first so their next owner picks up exactly there
+    """
+    global consumer
+    if consumer is None:
+        return
+    try:
+        if feature_store is not None:
+            feature_store.on_revoke(consumer, consumer.assignment())
+    finally:
+        consumer.close()
+        consumer = None
+
+def event_time_ms(tx):
+    """The tx's own timestamp in epoch milliseconds, or now if it has none"""
+    try:
+        ts = datetime.fromisoformat(tx['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        return int(time.time() * 1000)
+    if ts.tzinfo is None:
+        # The producer writes naive UTC timestamps
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1000)
+
+def compact_member(tx):
+    """
+    8 bytes standing for the tx in its user's window: plenty to tell the
+    window's events apart, and a redelivered tx maps to the same member so
+    it is not counted twice
+    """
+    tx_id = tx.get('transaction_id')
+    if not tx_id:
+        return os.urandom(8)
+    return hashlib.blake2b(str(tx_id).encode(), digest_size=8).digest()
+
+def update_velocities(txs, sources=None):
+    """
+    (late, {window: count}) for each tx. sources are the (topic, partition)
+    each tx was read from: with them and the local feature store, no network
+    is involved; otherwise it's one pipeline of velocity scripts for the
+    whole batch.
+    """
+    if feature_store is not None and sources is not None:
+        return [feature_store.update(topic, partition, tx['user_id'], event_time_ms(tx), compact_member(tx))
+                for tx, (topic, partition) in zip(txs, sources)]
+    pipe = r.pipeline(transaction=False)
+    for tx in txs:
+        velocity_script(keys=[f"user_tx_history:{tx['user_id']}"],
+                        args=[event_time_ms(tx), compact_member(tx), ALLOWED_LATENESS_SECONDS * 1000,
+                              VELOCITY_RETENTION_SECONDS * 1000, *(w * 1000 for w in VELOCITY_WINDOWS.values())],
+                        client=pipe)
+    return [(bool(result[0]), dict(zip(VELOCITY_WINDOWS, result[1:]))) for result in pipe.execute()]
+
+def score_batch(amounts, velocities):
+    """Fraud flags for a batch, from one predict call over all of its rows"""
+    if not model:
+        return np.zeros(len(amounts), dtype=bool)
+    # The named columns the model was fitted on: about 1 ms more than an array per 500 rows
+    X = pd.DataFrame({'amount': np.asarray(amounts, dtype=np.float64),
+                      'velocity': np.asarray(velocities, dtype=np.float64)})
+    # predict returns 1 for inliers, -1 for outliers
+    return model.predict(X) == -1
+
+def process_batch(txs, sources=None):
+    windows = update_velocities(txs, sources)
+    flags = score_batch([tx['amount'] for tx in txs], [counts[MODEL_WINDOW] for _, counts in windows])
     
-def publish_result(tx):
-    # Publish to Redis PubSub for FastAPI Websocket
-    r.publish('fraud_alerts_channel', json.dumps(tx))
+    # Add score and fraud status to each tx
+    for tx, (late, counts), is_fraud in zip(txs, windows, flags):
+        tx['velocity'] = counts[MODEL_WINDOW]
+        for label, count in counts.items():
+            tx[f'velocity_{label}'] = count
+        if late:
+            tx['late'] = True
+        tx['is_fraud'] = bool(is_fraud)
+    publish_results(txs)
+
+def process_transaction(tx, source=None):
+    process_batch([tx], None if source is None else [source])
     
-    # Also keep a list of the last 100 transactions for initial page load
-    r.lpush('recent_transactions', json.dumps(tx))
-    r.ltrim('recent_transactions', 0, 99)
+def publish_results(txs):
+    """Publishes a scored batch in one pipeline"""
+    pipe = r.pipeline(transaction=False)
+    payloads = []
+    alerts = []
+    for tx in txs:
+        payload = json.dumps(tx)
+        # Publish to Redis PubSub for FastAPI Websocket
+        pipe.publish('fraud_alerts_channel', payload)
+        payloads.append(payload)
+        if tx['is_fraud']:
+            print(f"🚨 FRAUD DETECTED: {tx['amount']} from {tx['user_id']}")
+            alerts.append(payload)
     
-    if tx['is_fraud']:
-        print(f"🚨 FRAUD DETECTED: {tx['amount']} from {tx['user_id']}")
-        r.lpush('recent_alerts', json.dumps(tx))
-        r.ltrim('recent_alerts', 0, 99)
-
-def run_consumer():
-    print(f"Starting consumer, listening to '{TOPIC}'...")
-    while True:
-        msg = consumer.poll(1.0)
-        
-        if msg is None:
-            continue
+    # Also keep a list of the last 100 transactions for initial page load.
+    # One LPUSH of many values leaves the newest at the head, like one per tx.
+    pipe.lpush('recent_transactions', *payloads[-100:])
+    pipe.ltrim('recent_transactions', 0, 99)
+    if alerts:
+        pipe.lpush('recent_alerts', *alerts[-100:])
+        pipe.ltrim('recent_alerts', 0, 99)
+    pipe.execute()
+
+def handle_batch(messages, kafka_consumer=None):
+    """
+    Scores and publishes a batch of polled messages, then commits their
+    offsets. Returns False when the consumer hit a fatal error.
+
+    Offsets are only committed for published transactions. When Redis
+    fails, each partition is committed (and its windows advanced) up to its
+    first unpublished transaction and rewound there, so that transaction and
+    the ones after it are consumed again. Messages that can't be processed
+    at all (bad JSON, missing fields) are skipped, or they would block their
+    partition forever.
+    """
+    kafka_consumer = kafka_consumer or consumer
+    healthy = True
+    txs = []
+    sources = []
+    tx_offsets = []
+    offsets = {}
+    # Next offset per partition, including messages only replayed into the windows
+    positions = {}
+    for msg in messages:
         if msg.error():
-            if msg.error().code() == KafkaError._PARTITION_EOF:
-                continue
-            else:
+            if msg.error().code() != KafkaError._PARTITION_EOF:
                 print(msg.error())
-                break
-                
+                healthy = False
+            continue
+        source = (msg.topic(), msg.partition())
+        positions[source] = msg.offset() + 1
+        replay = feature_store is not None and feature_store.replaying(*source, msg.offset())
+        if not replay:
+            offsets[source] = msg.offset() + 1
+        
         # Parse message
-        raw_val = msg.value().decode('utf-8')
         try:
-            tx = json.loads(raw_val)
-            process_transaction(tx)
+            tx = json.loads(msg.value().decode('utf-8'))
+            if replay:
+                # Scored and published by the partition's previous owner
+                feature_store.update(*source, tx['user_id'], event_time_ms(tx), compact_member(tx))
+                continue
         except Exception as e:
             print(f"Error processing message: {e}")
+            continue
+        txs.append(tx)
+        sources.append(source)
+        tx_offsets.append(msg.offset())
+    
+    # First unpublished offset per partition
+    unpublished = {}
+    if txs:
+        try:
+            process_batch(txs, sources)
+        except Exception as e:
+            # Retry one by one so a single bad transaction doesn't sink the batch
+            print(f"Error processing batch of {len(txs)}, retrying one by one: {e}")
+            for tx, source, offset in zip(txs, sources, tx_offsets):
+                if source in unpublished:
+                    # Consumed again from an earlier offset anyway
+                    continue
+                try:
+                    process_transaction(tx, source)
+                except redis.RedisError as e:
+                    print(f"Could not publish offset {offset} of partition {source[1]}, will retry: {e}")
+                    unpublished[source] = offset
+                except Exception as e:
+                    print(f"Error processing message: {e}")
+    
+    for source, offset in unpublished.items():
+        positions[source] = offsets[source] = offset
+        try:
+            # Redelivered transactions are not counted twice: their windows dedupe by member
+            kafka_consumer.seek(TopicPartition(source[0], source[1], offset))
+        except KafkaException as e:
+            # Revoked meanwhile: the next owner starts from the commit below
+            print(f"Could not rewind partition {source[1]}: {e}")
+    
+    if feature_store is not None:
+        for (topic, partition), offset in positions.items():
+            feature_store.advance(topic, partition, offset)
+        feature_store.maybe_checkpoint()
+    if offsets:
+        kafka_consumer.commit(offsets=[TopicPartition(topic, partition, offset)
+                                       for (topic, partition), offset in offsets.items()],
+                              asynchronous=True)
+    if unpublished:
+        time.sleep(PUBLISH_RETRY_SECONDS)
+    return healthy
+
+def run_consumer(batch_size=BATCH_SIZE, linger_ms=BATCH_LINGER_MS, stop=None, on_batch=None):
+    """
+    Consumes until a fatal error or until stop (an Event) is set, then
+    leaves the group. on_batch(messages) runs after every poll, even an
+    empty one. Returns False after a fatal error.
+    """
+    if r is None:
+        connect()
+    if consumer is None:
+        create_consumer()
+    print(f"Starting consumer, listening to '{TOPIC}' (batches of up to {batch_size}, {linger_ms:g} ms linger)...")
+    try:
+        while stop is None or not stop.is_set():
+            # Returns once batch_size messages are in or the linger time is up
+            messages = consumer.consume(num_messages=batch_size, timeout=linger_ms / 1000)
+            if messages and not handle_batch(messages):
+                return False
+            if on_batch is not None:
+                on_batch(messages)
+    finally:
+        close_consumer()
+    return True
 
 if __name__ == "__main__":
     run_consumer()
@@ -0,0 +1,357 @@
+"""
+Velocity windows held in the consumer's own memory, one store per Kafka
+partition it owns.
+
+The producer keys transactions by user_id, so all of a user's transactions
+land on one partition and the consumer owning it sees every one of them.
+Counting them locally gives the same answers as the Redis velocity script
+(same event-time windows, lateness and retention, and the same 8-byte
+members, so a redelivered tx is not counted twice) without a network call.
+
+Per user, the window is two array('q') columns sorted by event time: the
+event times in milliseconds and the members, 16 bytes per transaction.
+Window counts are bisections over the times. This replaces the time-bucketed
+ring buffers first planned: buckets would blur the window edges, and the
+counts must match the script's exactly. Finding a redelivered member
+scans the members column until the window holds INDEX_MIN_EVENTS; past
+that, a member -> time dict makes it O(1), so a heavy user's hour-long
+window costs only the memmove of inserting into (and trimming) the arrays.
+
+Redis is the backing store. Dirty users are serialized between batches and
+written in the background, at most every FEATURE_STORE_CHECKPOINT_SECONDS,
+into one hash per partition (feature_store:<topic>:<partition>) along with
+the next offset they account for. On rebalance:
+
+  - on_revoke checkpoints the revoked partitions synchronously and commits
+    their offsets, so the next owner starts from exactly that state
+  - on_assign loads each partition's checkpoint. When the checkpoint is
+    behind the group's committed offset (the previous owner died between
+    checkpoints), the partition is rewound to the checkpoint and the gap is
+    replayed into the windows only: replaying() tells the consumer which
+    messages not to score and publish again
+  - on_lost drops the partitions without writing: another member may
+    already own them
+"""
+import bisect
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+
+from confluent_kafka import KafkaException, TopicPartition
+
+FEATURE_STORE_CHECKPOINT_SECONDS = float(os.getenv('FEATURE_STORE_CHECKPOINT_SECONDS', '5'))
+
+# Hash field holding the offset; user ids are never empty
+OFFSET_FIELD = b''
+# Window length from which members are indexed instead of scanned
+INDEX_MIN_EVENTS = 64
+
+
+def checkpoint_key(topic, partition):
+    return f'feature_store:{topic}:{partition}'
+
+
+class UserWindow:
+    __slots__ = ('times', 'members', 'index')
+
+    def __init__(self):
+        self.times = array('q')
+        self.members = array('q')
+        # member -> time, for windows of INDEX_MIN_EVENTS and more
+        self.index = None
+
+    def position(self, member):
+        """Where member is in the window, or -1"""
+        if self.index is None:
+            try:
+                return self.members.index(member)
+            except ValueError:
+                return -1
+        ts = self.index.get(member)
+        if ts is None:
+            return -1
+        i = bisect.bisect_left(self.times, ts)
+        while self.members[i] != member:
+            i += 1
+        return i
+
+    def insert(self, ts, member):
+        i = bisect.bisect_right(self.times, ts)
+        self.times.insert(i, ts)
+        self.members.insert(i, member)
+        if self.index is not None:
+            self.index[member] = ts
+        elif len(self.members) >= INDEX_MIN_EVENTS:
+            self.index = dict(zip(self.members, self.times))
+
+    def remove(self, i):
+        if self.index is not None:
+            del self.index[self.members[i]]
+        del self.times[i]
+        del self.members[i]
+
+    def trim(self, count):
+        """Drops the count oldest events"""
+        if self.index is not None:
+            if len(self.members) - count < INDEX_MIN_EVENTS // 2:
+                self.index = None
+            else:
+                for member in self.members[:count]:
+                    del self.index[member]
+        del self.times[:count]
+        del self.members[:count]
+
+    def to_bytes(self):
+        times, members = self.times, self.members
+        if sys.byteorder == 'big':
+            # Checkpoints are little-endian
+            times, members = array('q', times), array('q', members)
+            times.byteswap()
+            members.byteswap()
+        return times.tobytes() + members.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        window = cls()
+        half = len(data) // 2
+        window.times.frombytes(data[:half])
+        window.members.frombytes(data[half:])
+        if sys.byteorder == 'big':
+            window.times.byteswap()
+            window.members.byteswap()
+        return window
+
+
+class PartitionWindows:
+    """The windows of the users whose transactions land on one partition"""
+
+    def __init__(self, offset=None):
+        self.users = {}
+        # Next offset not yet in the windows
+        self.offset = offset
+        # Offsets below this are replayed into the windows, not scored
+        self.replay_until = None
+        # Newest event time seen, for evicting idle users
+        self.newest = 0
+        self.dirty = set()
+        self.removed = set()
+        # Set when a checkpoint failed: the next one writes every user
+        self.full = False
+        self.checkpointed_offset = offset
+
+    def update(self, user_id, ts, member, windows, lateness, retention):
+        window = self.users.get(user_id)
+        if window is None:
+            window = self.users[user_id] = UserWindow()
+        times = window.times
+        newest = times[-1] if times else ts
+        # Counted on top of the window when it is not in there
+        own = 0
+        if ts < newest - lateness:
+            late = True
+            if window.position(member) < 0:
+                own = 1
+        else:
+            late = False
+            i = window.position(member)
+            if i >= 0:
+                window.remove(i)
+            window.insert(ts, member)
+            stale = bisect.bisect_left(times, times[-1] - retention)
+            if stale:
+                window.trim(stale)
+            self.dirty.add(user_id)
+            self.removed.discard(user_id)
+            if ts > self.newest:
+                self.newest = ts
+        end = bisect.bisect_right(times, ts)
+        return late, [end - bisect.bisect_right(times, ts - w) + own for w in windows]
+
+    def evict_idle(self, retention):
+        """Forgets users with nothing left in their window"""
+        horizon = self.newest - retention
+        idle = [user_id for user_id, window in self.users.items() if not window.times or window.times[-1] < horizon]
+        for user_id in idle:
+            del self.users[user_id]
+            self.dirty.discard(user_id)
+            self.removed.add(user_id)
+
+    def snapshot(self, retention):
+        """(fields to write, fields to delete) since the last snapshot"""
+        self.evict_idle(retention)
+        if self.full:
+            users, self.full = list(self.users), False
+        else:
+            users = self.dirty
+        fields = {user_id: self.users[user_id].to_bytes() for user_id in users}
+        removed = list(self.removed)
+        self.dirty = set()
+        self.removed = set()
+        return fields, removed
+
+    @classmethod
+    def restore(cls, checkpoint):
+        offset = checkpoint.pop(OFFSET_FIELD, None)
+        windows = cls(int(offset) if offset is not None else None)
+        for user_id, data in checkpoint.items():
+            window = UserWindow.from_bytes(data)
+            if window.times:
+                windows.users[user_id.decode()] = window
+                windows.newest = max(windows.newest, window.times[-1])
+        return windows
+
+
+class FeatureStore:
+    def __init__(self, client, windows, lateness_seconds, retention_seconds,
+                 checkpoint_seconds=FEATURE_STORE_CHECKPOINT_SECONDS):
+        """
+        client must return bytes (decode_responses=False). windows maps each
+        window's label to its length in seconds.
+        """
+        self.redis = client
+        self.labels = list(windows)
+        self.windows_ms = [w * 1000 for w in windows.values()]
+        self.lateness_ms = lateness_seconds * 1000
+        self.retention_ms = retention_seconds * 1000
+        self.checkpoint_seconds = checkpoint_seconds
+        self.partitions = {}
+        self._writes = queue.Queue()
+        self._writer = None
+        self._last_checkpoint = time.monotonic()
+        self.checkpoints = 0
+        self.checkpoint_errors = 0
+
+    def update(self, topic, partition, user_id, ts, member):
+        """(late, {window: count}) for a tx at event time ts (ms), member being its 8-byte id"""
+        windows = self.partitions.get((topic, partition))
+        if windows is None:
+            windows = self.partitions[(topic, partition)] = PartitionWindows()
+        late, counts = windows.update(user_id, ts, int.from_bytes(member, 'little', signed=True),
+                                      self.windows_ms, self.lateness_ms, self.retention_ms)
+        return late, dict(zip(self.labels, counts))
+
+    def replaying(self, topic, partition, offset):
+        """Whether the message at offset was already scored by the partition's previous owner"""
+        windows = self.partitions.get((topic, partition))
+        return windows is not None and windows.replay_until is not None and offset < windows.replay_until
+
+    def advance(self, topic, partition, offset):
+        """Records that the windows account for everything before offset"""
+        windows = self.partitions.get((topic, partition))
+        if windows is None:
+            return
+        windows.offset = offset
+        if windows.replay_until is not None and offset >= windows.replay_until:
+            windows.replay_until = None
+
+    def maybe_checkpoint(self):
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds:
+            self.checkpoint()
+
+    def checkpoint(self, keys=None):
+        """
+        Queues the changes of the given partitions (all by default) for the
+        background writer. Serializing happens here, on the consumer's
+        thread, so the windows are never read while they change.
+        """
+        self._last_checkpoint = time.monotonic()
+        for key in list(self.partitions) if keys is None else keys:
+            windows = self.partitions.get(key)
+            if windows is None or windows.offset is None:
+                continue
+            fields, removed = windows.snapshot(self.retention_ms)
+            if not fields and not removed and windows.offset == windows.checkpointed_offset:
+                continue
+            windows.checkpointed_offset = windows.offset
+            self._writes.put((key, fields, removed, windows.offset))
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write, name='feature-store-checkpoint', daemon=True)
+            self._writer.start()
+
+    def flush(self):
+        """Waits until every queued checkpoint is written"""
+        self._writes.join()
+
+    def _write(self):
+        while True:
+            key, fields, removed, offset = self._writes.get()
+            try:
+                # Dropped while queued (lost partition): the new owner's checkpoint wins
+                if key not in self.partitions:
+                    continue
+                redis_key = checkpoint_key(*key)
+                pipe = self.redis.pipeline(transaction=True)
+                if fields:
+                    pipe.hset(redis_key, mapping=fields)
+                if removed:
+                    pipe.hdel(redis_key, *removed)
+                pipe.hset(redis_key, OFFSET_FIELD, offset)
+                # Nothing in it is worth restoring once the longest window has passed
+                pipe.pexpire(redis_key, self.retention_ms)
+                pipe.execute()
+                self.checkpoints += 1
+            except Exception as e:
+                self.checkpoint_errors += 1
+                print(f"Feature store checkpoint of partition {key[1]} failed: {e}")
+                windows = self.partitions.get(key)
+                if windows is not None:
+                    windows.full = True
+            finally:
+                self._writes.task_done()
+
+    def restore(self, topic, partition):
+        try:
+            return PartitionWindows.restore(self.redis.hgetall(checkpoint_key(topic, partition)))
+        except Exception as e:
+            print(f"Could not restore the feature store of partition {partition}, starting empty: {e}")
+            return PartitionWindows()
+
+    def on_assign(self, consumer, partitions):
+        try:
+            committed = {(tp.topic, tp.partition): tp.offset for tp in consumer.committed(partitions, timeout=10)}
+        except KafkaException as e:
+            print(f"Could not read committed offsets, not replaying: {e}")
+            committed = {}
+        for tp in partitions:
+            key = (tp.topic, tp.partition)
+            windows = self.partitions[key] = self.restore(*key)
+            group_offset = committed.get(key, -1)
+            if windows.offset is not None and 0 <= windows.offset < group_offset:
+                # The checkpoint is behind the group: replay the gap into the windows
+                tp.offset = windows.offset
+                windows.replay_until = group_offset
+            replay = f", replaying {group_offset - windows.offset} messages" if windows.replay_until else ""
+            print(f"Feature store: restored {len(windows.users)} users of partition {tp.partition}{replay}")
+        consumer.assign(partitions)
+
+    def on_revoke(self, consumer, partitions):
+        keys = [(tp.topic, tp.partition) for tp in partitions if (tp.topic, tp.partition) in self.partitions]
+        self.checkpoint(keys)
+        self.flush()
+        offsets = [TopicPartition(topic, partition, self.partitions[(topic, partition)].offset)
+                   for topic, partition in keys
+                   if self.partitions[(topic, partition)].offset is not None
+                   and self.partitions[(topic, partition)].replay_until is None]
+        if offsets:
+            try:
+                consumer.commit(offsets=offsets, asynchronous=False)
+            except KafkaException as e:
+                print(f"Could not commit the offsets of revoked partitions: {e}")
+        for key in keys:
+            del self.partitions[key]
+
+    def on_lost(self, consumer, partitions):
+        for tp in partitions:
+            self.partitions.pop((tp.topic, tp.partition), None)
+
+    def stats(self):
+        return {
+            'partitions': len(self.partitions),
+            'users': sum(len(w.users) for w in self.partitions.values()),
+            'events': sum(len(u.times) for w in self.partitions.values() for u in w.users.values()),
+            'checkpoints': self.checkpoints,
+            'checkpoint_errors': self.checkpoint_errors,
+        }
@@ -0,0 +1,248 @@
+"""
+Runs the fraud consumer as N worker processes in fraud_detection_group:
+
+    python backend/streaming/runner.py --workers 4
+
+The model is loaded once, here, before the workers are forked, and they
+share its memory copy-on-write (gc.freeze keeps the garbage collector from
+writing to, and so copying, the objects it is made of). Each worker then
+creates its own Redis clients, feature store and Kafka consumer, joins the
+group and is assigned a share of the topic's partitions. Workers beyond the
+partition count stay idle, ready to take over partitions on a rebalance.
+
+Every CONSUMER_REPORT_SECONDS each worker reports its partitions, the
+messages it processed and its lag (high watermark minus position, per
+partition). The runner prints the reports, keeps them in the Redis hash
+consumer_workers (served on /api/consumers), flags workers that stopped
+reporting as stalled, and restarts workers that died. Until a dead worker's
+replacement joins, its partitions move to the others, which rebuild their
+windows from the feature store checkpoint.
+
+SIGINT and SIGTERM stop the workers gracefully. Each one finishes its batch,
+checkpoints its windows, commits and leaves the group. Workers still running
+after CONSUMER_SHUTDOWN_SECONDS are killed.
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+import redis
+
+try:
+    from streaming import consumer as fraud_consumer
+except ImportError:  # run as a script from the streaming directory
+    import consumer as fraud_consumer
+
+CONSUMER_WORKERS = int(os.getenv('CONSUMER_WORKERS', str(os.cpu_count() or 1)))
+CONSUMER_REPORT_SECONDS = float(os.getenv('CONSUMER_REPORT_SECONDS', '10'))
+CONSUMER_SHUTDOWN_SECONDS = float(os.getenv('CONSUMER_SHUTDOWN_SECONDS', '30'))
+# Reports older than this many intervals mean the worker is stuck
+STALLED_AFTER_REPORTS = 3
+HEALTH_KEY = 'consumer_workers'
+
+
+def consumer_lag(kafka_consumer):
+    """
+    {partition: messages behind the high watermark}, from the watermarks the
+    consumer cached while fetching (no broker round-trip). Partitions that
+    have not been fetched yet are left out.
+    """
+    assignment = kafka_consumer.assignment()
+    if not assignment:
+        return {}
+    lag = {}
+    for tp in kafka_consumer.position(assignment):
+        _, high = kafka_consumer.get_watermark_offsets(tp, cached=True)
+        if tp.offset >= 0 and high >= 0:
+            lag[tp.partition] = max(high - tp.offset, 0)
+    return lag
+
+
+def worker_main(index, stop, reports, batch_size, linger_ms, report_seconds, consumer_factory=None):
+    # Ctrl-C reaches the whole process group; the runner decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    fraud_consumer.connect()
+    if consumer_factory is not None:
+        # Stand-in consumers for the benchmark
+        fraud_consumer.consumer = consumer_factory(index)
+
+    runner_pid = os.getppid()
+    started = last_report = time.monotonic()
+    processed = processed_at_report = 0
+
+    def report(state):
+        nonlocal last_report, processed_at_report
+        now = time.monotonic()
+        kafka_consumer = fraud_consumer.consumer
+        reports.put({
+            'worker': index,
+            'pid': os.getpid(),
+            'state': state,
+            'time': time.time(),
+            'uptime': round(now - started, 1),
+            'partitions': sorted(tp.partition for tp in kafka_consumer.assignment()) if kafka_consumer else [],
+            'processed': processed,
+            'rate': round((processed - processed_at_report) / max(now - last_report, 1e-9), 1),
+            'lag': consumer_lag(kafka_consumer) if kafka_consumer else {},
+            'feature_store': fraud_consumer.feature_store.stats() if fraud_consumer.feature_store else None,
+        })
+        last_report, processed_at_report = now, processed
+
+    def on_batch(messages):
+        nonlocal processed
+        processed += len(messages)
+        if os.getppid() != runner_pid:
+            # Orphaned: the runner was killed without stopping us
+            stop.set()
+        if time.monotonic() - last_report >= report_seconds:
+            report('running')
+
+    healthy = False
+    try:
+        healthy = fraud_consumer.run_consumer(batch_size, linger_ms, stop, on_batch)
+    finally:
+        report('stopped' if healthy else 'failed')
+    # Non-zero makes the runner restart it
+    raise SystemExit(0 if healthy else 1)
+
+
+class Runner:
+    def __init__(self, workers=CONSUMER_WORKERS, batch_size=fraud_consumer.BATCH_SIZE,
+                 linger_ms=fraud_consumer.BATCH_LINGER_MS, report_seconds=CONSUMER_REPORT_SECONDS,
+                 consumer_factory=None, verbose=True):
+        # fork shares the loaded model; elsewhere every worker loads its own copy
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self.count = workers
+        self.batch_size = batch_size
+        self.linger_ms = linger_ms
+        self.report_seconds = report_seconds
+        self.consumer_factory = consumer_factory
+        self.verbose = verbose
+        self.stop = self.context.Event()
+        self.reports = self.context.Queue()
+        self.workers = {}
+        self.health = {}
+        self.restarts = 0
+        self.redis = redis.Redis(host=fraud_consumer.REDIS_HOST, port=fraud_consumer.REDIS_PORT,
+                                 decode_responses=True)
+
+    def start_worker(self, index):
+        process = self.context.Process(
+            target=worker_main, name=f'fraud-worker-{index}',
+            args=(index, self.stop, self.reports, self.batch_size, self.linger_ms, self.report_seconds,
+                  self.consumer_factory))
+        process.start()
+        self.workers[index] = process
+
+    def start(self):
+        if fraud_consumer.model is None:
+            print("Warning: starting workers without a model, nothing will be flagged")
+        # Everything allocated so far, the model included, is left alone by the
+        # collector from now on, so the workers' copies of it stay shared
+        gc.freeze()
+        for index in range(self.count):
+            self.start_worker(index)
+        print(f"Started {self.count} consumer workers in group '{fraud_consumer.conf['group.id']}'")
+
+    def collect(self, timeout):
+        """Takes in the workers' reports for up to timeout seconds, then restarts dead workers"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # Short waits, so a stop request is seen promptly
+                report = self.reports.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                if self.stop.is_set():
+                    break
+                continue
+            self.health[report['worker']] = report
+        if self.stop.is_set():
+            return
+        for index, process in list(self.workers.items()):
+            if not process.is_alive():
+                print(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}, restarting it")
+                self.restarts += 1
+                self.start_worker(index)
+
+    def status(self):
+        """The latest report of every worker, marked stalled when it is overdue"""
+        now = time.time()
+        status = []
+        for index in sorted(self.workers):
+            report = dict(self.health.get(index) or {'worker': index, 'state': 'starting', 'time': now})
+            report['alive'] = self.workers[index].is_alive()
+            report['stalled'] = report['alive'] and now - report['time'] > STALLED_AFTER_REPORTS * self.report_seconds
+            report['total_lag'] = sum((report.get('lag') or {}).values())
+            status.append(report)
+        return status
+
+    def publish_health(self, status):
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.delete(HEALTH_KEY)
+            pipe.hset(HEALTH_KEY, mapping={report['worker']: json.dumps(report) for report in status})
+            # Gone soon after the runner itself
+            pipe.expire(HEALTH_KEY, int(STALLED_AFTER_REPORTS * self.report_seconds) + 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Could not publish worker health: {e}")
+
+    def print_status(self, status):
+        for report in status:
+            flag = ' STALLED' if report['stalled'] else '' if report['alive'] or report['state'] == 'stopped' else ' DOWN'
+            print(f"[worker {report['worker']}] {report['state']}{flag} "
+                  f"partitions={report.get('partitions', [])} processed={report.get('processed', 0)} "
+                  f"rate={report.get('rate', 0)}/s lag={report['total_lag']}")
+
+    def shutdown(self):
+        self.stop.set()
+        deadline = time.monotonic() + CONSUMER_SHUTDOWN_SECONDS
+        while any(p.is_alive() for p in self.workers.values()) and time.monotonic() < deadline:
+            # Draining the reports meanwhile: a worker can't exit with some stuck in its pipe
+            self.collect(0.2)
+        for index, process in self.workers.items():
+            if process.is_alive():
+                print(f"Worker {index} did not stop within {CONSUMER_SHUTDOWN_SECONDS:g}s, killing it")
+                process.kill()
+            process.join()
+        # Final reports
+        self.collect(0.1)
+        try:
+            self.redis.delete(HEALTH_KEY)
+        except redis.RedisError:
+            pass
+
+    def run(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stop.set())
+        self.start()
+        try:
+            while not self.stop.is_set():
+                self.collect(self.report_seconds)
+                status = self.status()
+                self.publish_health(status)
+                if self.verbose:
+                    self.print_status(status)
+        finally:
+            print("Stopping consumer workers...")
+            self.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=CONSUMER_WORKERS,
+                        help="worker processes; more than the topic's partitions only adds standbys")
+    parser.add_argument('--batch-size', type=int, default=fraud_consumer.BATCH_SIZE)
+    parser.add_argument('--linger-ms', type=float, default=fraud_consumer.BATCH_LINGER_MS)
+    args = parser.parse_args()
+    Runner(args.workers, args.batch_size, args.linger_ms).run()